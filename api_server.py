@@ -0,0 +1,241 @@
+"""
+Read-only HTTP API over the stored bars, screener snapshot and watchlist.
+
+Responses are Arrow IPC streams (application/vnd.apache.arrow.stream),
+written record batch by record batch straight from DuckDB, or JSON records
+with ?format=json (or an Accept: application/json header). Every response
+carries an ETag derived from the data generation (last write time and row
+count of the tables it reads), so a client that sends If-None-Match gets a
+304 without the query running.
+
+The database is opened read-only and only while requests are in flight,
+so the batch job can take the writer lock between them (a request that
+lands while the writer holds the file gets 503 with Retry-After).
+
+  python api_server.py [--host 127.0.0.1] [--port 8765]
+
+  GET /health
+  GET /watchlist
+  GET /snapshot[?tickers=ITC,TCS]
+  GET /history?tickers=ITC,TCS[&start=2024-01-01][&end=...][&columns=close,rsi][&adjusted=0]
+
+  import pyarrow as pa, requests
+  table = pa.ipc.open_stream(requests.get("http://127.0.0.1:8765/history?tickers=ITC").content).read_all()
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+os.environ["STOCK_APP_DB_READ_ONLY"] = "1" # Before utils.db is imported
+
+import duckdb
+import pyarrow as pa
+from utils.constants import API_PORT, API_MAX_CONNECTIONS, API_BATCH_ROWS
+from utils.db import get_connection
+from utils.symbols import resolve_symbols
+from utils.tracing import span
+
+ARROW_TYPE = "application/vnd.apache.arrow.stream"
+HISTORY_COLUMNS = ['open', 'high', 'low', 'close', 'volume', 'rsi', 'ma50', 'ma200', 'supertrend']
+SNAPSHOT_COLUMNS = [
+    'ticker', 'date', 'close', 'prev_close', 'day_change_pct', 'rsi', 'ma50', 'ma200', 'supertrend',
+    'supertrend_bullish', 'high_52w', 'low_52w', 'pct_from_high'
+]
+
+_slots = threading.BoundedSemaphore(API_MAX_CONNECTIONS)
+
+def _param(params, name, default=None):
+    values = params.get(name)
+    return values[0] if values else default
+
+def _tickers(params):
+    raw = _param(params, 'tickers')
+    if not raw:
+        return None
+    return list(dict.fromkeys(resolve_symbols([t.strip() for t in raw.split(',') if t.strip()])))
+
+# Each route returns (query, query params, generation query, generation params)
+
+def history_query(params):
+    columns = _param(params, 'columns')
+    columns = [c.strip() for c in columns.split(',')] if columns else HISTORY_COLUMNS
+    unknown = set(columns) - set(HISTORY_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(sorted(unknown))}")
+    source = "historical_data" if _param(params, 'adjusted', '1') == '0' else "adjusted_history"
+    tickers = _tickers(params)
+    window = """
+        (CAST($tickers AS VARCHAR[]) IS NULL OR ticker IN (SELECT UNNEST($tickers)))
+    """
+    query = f"""
+        SELECT ticker, date, {', '.join(columns)} FROM {source}
+        WHERE {window}
+          AND (CAST($start AS TIMESTAMP) IS NULL OR date >= CAST($start AS TIMESTAMP))
+          AND (CAST($end AS TIMESTAMP) IS NULL OR date <= CAST($end AS TIMESTAMP))
+        ORDER BY ticker, date
+    """
+    generation = f"""
+        SELECT (SELECT MAX(updated_at) FROM historical_data WHERE {window}),
+               (SELECT COUNT(*) FROM historical_data WHERE {window}),
+               (SELECT COUNT(*) FROM adjustment_factors WHERE {window})
+    """
+    args = {'tickers': tickers, 'start': _param(params, 'start'), 'end': _param(params, 'end')}
+    return query, args, generation, {'tickers': tickers}
+
+def snapshot_query(params):
+    tickers = _tickers(params)
+    query = f"""
+        SELECT {', '.join(SNAPSHOT_COLUMNS)} FROM latest_snapshot
+        WHERE CAST($tickers AS VARCHAR[]) IS NULL OR ticker IN (SELECT UNNEST($tickers))
+        ORDER BY ticker
+    """
+    generation = "SELECT MAX(updated_at), COUNT(*) FROM latest_snapshot"
+    return query, {'tickers': tickers}, generation, {}
+
+def watchlist_query(params):
+    return (
+        "SELECT ticker, created_at FROM watchlist ORDER BY ticker", {},
+        "SELECT MAX(created_at), COUNT(*) FROM watchlist", {}
+    )
+
+ROUTES = {
+    '/history': history_query,
+    '/snapshot': snapshot_query,
+    '/watchlist': watchlist_query,
+}
+
+def negotiate(params, accept):
+    """'arrow' or 'json' from ?format=, then the Accept header (Arrow by default)"""
+    fmt = _param(params, 'format')
+    if fmt in ('arrow', 'json'):
+        return fmt
+    if fmt:
+        raise ValueError("format must be arrow or json")
+    if 'application/json' in accept and ARROW_TYPE not in accept:
+        return 'json'
+    return 'arrow'
+
+def make_etag(path, query_string, fmt, generation):
+    digest = hashlib.sha1(f"{path}?{query_string}|{fmt}|{generation}".encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+class DataAPIHandler(BaseHTTPRequestHandler):
+    server_version = "StockDataAPI/1.0"
+
+    def log_message(self, format, *args):
+        pass # Spans record every request; the default logger writes to stderr per hit
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status, message, headers=None):
+        self._send_json(status, {'error': message}, headers)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/health':
+            return self._send_json(200, {'status': 'ok'})
+
+        route = ROUTES.get(url.path)
+        if route is None:
+            return self._send_error(404, f"No route {url.path}; try /history, /snapshot or /watchlist")
+
+        params = parse_qs(url.query)
+        try:
+            fmt = negotiate(params, self.headers.get('Accept', ''))
+        except ValueError as e:
+            return self._send_error(400, str(e))
+
+        with _slots, span(f"api{url.path}") as record:
+            try:
+                # Resolving tickers may load the symbol master, so it opens the database too
+                query, args, generation_query, generation_args = route(params)
+                conn = get_connection()
+            except ValueError as e:
+                return self._send_error(400, str(e))
+            except duckdb.Error as e:
+                # The batch job holds the writer lock
+                return self._send_error(503, f"Database busy: {e}", {"Retry-After": "5"})
+            try:
+                generation = conn.execute(generation_query, generation_args).fetchone()
+                etag = make_etag(url.path, url.query, fmt, generation)
+                if etag in self.headers.get('If-None-Match', ''):
+                    record['cache_hits'], record['cache_misses'] = 1, 0
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                record['cache_hits'], record['cache_misses'] = 0, 1
+
+                result = conn.execute(query, args)
+                if fmt == 'json':
+                    frame = result.fetchdf()
+                    record['rows'] = len(frame)
+                    body = frame.to_json(orient='records', date_format='iso').encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.send_header("ETag", etag)
+                    self.send_header("Cache-Control", "no-cache")
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+
+                # Batches go out as DuckDB produces them; the stream ends with the connection
+                reader = result.to_arrow_reader(API_BATCH_ROWS)
+                self.send_response(200)
+                self.send_header("Content-Type", ARROW_TYPE)
+                self.send_header("ETag", etag)
+                self.send_header("Cache-Control", "no-cache")
+                self.end_headers()
+                record['rows'] = 0
+                with pa.ipc.new_stream(self.wfile, reader.schema) as writer:
+                    for batch in reader:
+                        writer.write_batch(batch)
+                        record['rows'] += batch.num_rows
+            except duckdb.Error as e:
+                if record.get('rows') is None: # Nothing sent yet
+                    self._send_error(500, str(e))
+                else:
+                    print(f"Error streaming {url.path}: {e}")
+            finally:
+                conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Read-only Arrow / JSON API over the stored market data")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=API_PORT)
+    args = parser.parse_args()
+
+    # The schema is created by the app and the batch job; a read-only reader cannot create it
+    conn = get_connection()
+    try:
+        tables = set(conn.execute("SELECT table_name FROM duckdb_tables() UNION SELECT view_name FROM duckdb_views()").fetchdf()['table_name'])
+    finally:
+        conn.close()
+    missing = {'historical_data', 'adjusted_history', 'adjustment_factors', 'latest_snapshot', 'watchlist'} - tables
+    if missing:
+        raise SystemExit(f"Missing {', '.join(sorted(missing))}; run the batch job once to create the schema.")
+
+    server = ThreadingHTTPServer((args.host, args.port), DataAPIHandler)
+    print(f"Serving http://{args.host}:{args.port} (read-only)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
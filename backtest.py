@@ -0,0 +1,57 @@
+"""
+Backtest the Watchlist signals over stored history.
+
+Sweeps SuperTrend (period, multiplier) and RSI (period, buy-below,
+sell-above) rules across every stored ticker (or --tickers), spreading the
+parameter grid over a process pool. Prints the best parameter sets by
+Sharpe ratio; --out / --equity-out save the full results and equity curves.
+
+Usage: python backtest.py [--period 5y] [--workers N] [--cost-bps 10] [--tickers A B ...]
+"""
+import argparse
+import time
+from utils.db import init_db
+from utils.history import period_start
+from utils.backtest import load_panel, run_sweep, default_grid
+from utils.constants import BACKTEST_COST_BPS
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep SuperTrend / RSI rules over stored history")
+    parser.add_argument("--tickers", nargs="*", help="Tickers to include (default: every stored ticker)")
+    parser.add_argument("--period", default="5y", help="History to test over (1y, 2y, 5y)")
+    parser.add_argument("--workers", type=int, help="Processes (default: CPU count)")
+    parser.add_argument("--cost-bps", type=float, default=BACKTEST_COST_BPS, help="Cost per position change")
+    parser.add_argument("--top", type=int, default=15, help="Parameter sets to print")
+    parser.add_argument("--out", help="CSV file for the results of every parameter set")
+    parser.add_argument("--equity-out", help="CSV file for the equity curves")
+    args = parser.parse_args()
+
+    init_db()
+    panel = load_panel(args.tickers, period_start(args.period))
+    if not panel:
+        print("No stored history. Run the batch job first.")
+        return
+
+    grid = default_grid()
+    dates, tickers = panel['close'].shape
+    print(f"Backtesting {len(grid)} parameter sets over {tickers} tickers x {dates} bars...")
+    started = time.perf_counter()
+    results, equity = run_sweep(panel, grid, workers=args.workers, cost_bps=args.cost_bps)
+    print(f"Done in {time.perf_counter() - started:.1f}s\n")
+
+    best = results.sort_values('sharpe', ascending=False).head(args.top)
+    print(best.to_string(formatters={
+        'total_return': '{:.1%}'.format, 'cagr': '{:.1%}'.format, 'volatility': '{:.1%}'.format,
+        'max_drawdown': '{:.1%}'.format, 'sharpe': '{:.2f}'.format, 'hit_rate': '{:.1%}'.format,
+        'avg_trade': '{:.2%}'.format, 'exposure': '{:.0%}'.format,
+    }))
+
+    if args.out:
+        results.to_csv(args.out)
+        print(f"\nResults saved to {args.out}")
+    if args.equity_out:
+        equity.to_csv(args.equity_out)
+        print(f"Equity curves saved to {args.equity_out}")
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,16 @@
-import pandas as pd
-import yfinance as yf
 from tqdm import tqdm
 import time
-from utils.db import init_db, get_watchlist, get_portfolio_db, save_historical_data
-from utils.indicators import calculate_all_indicators
-from utils.market_data import format_ticker
+from utils.db import init_db, get_watchlist, get_portfolio_db, get_history_frame, canonicalize_stored_tickers, refresh_latest_snapshot, refresh_portfolio_nav
+from utils.history import sync_history, period_start
+from utils.intraday import sync_intraday
+from utils.alerts import evaluate_stored_alerts, get_alert_engine
+from utils.market_data import format_ticker, quote_from_closes
+from utils.constituents import refresh_all_indices
+from utils.quote_cache import get_quote_cache
+from utils.tracing import span, traced, persist_spans
 
 def get_all_tickers():
-    """Get unique tickers from Watchlist and Portfolio"""
+    """Get unique tickers from Watchlist, Portfolio and alert rules"""
     watchlist_df = get_watchlist()
     portfolio_df = get_portfolio_db()
     
@@ -19,49 +22,28 @@ def get_all_tickers():
     if not portfolio_df.empty:
         tickers.update(portfolio_df['ticker'].tolist())
         
+    # Rules can name any ticker; their RSI and stored-bar checks need its bars synced
+    tickers.update(get_alert_engine().tickers())
+        
     return list(tickers)
 
+@traced("batch.fetch_and_process")
 def fetch_and_process(ticker):
-    """Fetch data, calculate indicators, and save to DB"""
+    """Bring stored history up to date, recalculate indicators, and save to DB"""
     try:
         formatted_ticker = format_ticker(ticker)
         print(f"Processing {ticker} ({formatted_ticker})...")
         
-        # Fetch Data (1 Year)
-        # Using auto_adjust=True to get adjusted close as 'Close'
-        df = yf.download(formatted_ticker, period="1y", interval="1d", auto_adjust=True, progress=False)
-        
-        if df.empty:
+        # Incremental: only bars after the last stored date are downloaded
+        # (a full year is fetched for new tickers)
+        if not sync_history([formatted_ticker], period="1y", force=True):
             print(f"No data found for {ticker}")
             return False
             
-        # Ensure flat columns if MultiIndex
-        if isinstance(df.columns, pd.MultiIndex):
-            df.columns = df.columns.get_level_values(0)
-            
-        # Calculate Indicators
-        indicators = calculate_all_indicators(df)
-        
-        # Add indicators to DataFrame
-        # calculate_all_indicators returns dict of Series and latest values
-        # We need the Series for historical storage
-        
-        if 'rsi_series' in indicators:
-            df['rsi'] = indicators['rsi_series']
-            
-        if 'ma50_series' in indicators:
-            df['ma50'] = indicators['ma50_series']
-            
-        if 'ma200_series' in indicators:
-            df['ma200'] = indicators['ma200_series']
-            
-        # For SuperTrend, implementation returns a list, make it a Series
-        if 'st_10_3' in indicators:
-            df['supertrend'] = pd.Series(indicators['st_10_3'], index=df.index)
-            
-        # Save to DB
-        success = save_historical_data(ticker, df)
-        return success
+        # Share the latest close with the app's quote cache
+        recent = get_history_frame([formatted_ticker], period_start("1mo"))
+        get_quote_cache().put_many({formatted_ticker: quote_from_closes(recent['close'])})
+        return True
         
     except Exception as e:
         print(f"Failed to process {ticker}: {e}")
@@ -73,6 +55,13 @@ def main():
     # Initialize DB to ensure table exists
     init_db()
     
+    # Refresh index lists (and the symbol master) and merge duplicate spellings (ITC / ITC.NS)
+    with span("batch.refresh_indices"):
+        print(f"Index lists: {refresh_all_indices()} changed since last run.")
+    merged = canonicalize_stored_tickers()
+    if merged:
+        print(f"Canonicalized {merged} stored tickers.")
+    
     tickers = get_all_tickers()
     print(f"Found {len(tickers)} unique tickers.")
     
@@ -80,15 +69,29 @@ def main():
         print("No tickers found in DB. Add stocks to Watchlist or Portfolio first.")
         return
 
-    success_count = 0
+    updated = []
     with tqdm(total=len(tickers)) as pbar:
         for ticker in tickers:
             if fetch_and_process(ticker):
-                success_count += 1
+                updated.append(ticker)
             pbar.update(1)
             time.sleep(0.5) # Slight delay to be nice to API
             
-    print(f"✅ Batch Job Completed. Uploaded {success_count}/{len(tickers)} tickers.")
+    # 1m / 5m bars for every ticker in one request per interval; old partitions are pruned
+    with span("batch.sync_intraday"):
+        print(f"Intraday bars: {sync_intraday(tickers)} stored.")
+    
+    # History writes keep their own rows current; a full pass also drops stale spellings
+    print(f"Screener snapshot: {refresh_latest_snapshot()} tickers.")
+    # Rules on the tickers that synced, against their last two stored bars
+    with span("batch.evaluate_alerts"):
+        print(f"Alerts: {len(evaluate_stored_alerts(updated))} fired.")
+    # Extends the stored series from its last bars (rebuilt in full after an upload)
+    print(f"Portfolio NAV: {refresh_portfolio_nav()} days written.")
+    print(f"✅ Batch Job Completed. Uploaded {len(updated)}/{len(tickers)} tickers.")
+    
+    # This process's spans are only visible to the Diagnostics page once stored
+    print(f"Trace spans: {persist_spans()} saved.")
 
 if __name__ == "__main__":
     main()
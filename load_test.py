@@ -0,0 +1,258 @@
+"""
+Load test: drive N concurrent simulated sessions through the app's pages.
+
+Sessions are Streamlit AppTest instances in one process, like browser tabs
+on one server: they share st.cache_data, the quote cache and poller, and the
+DuckDB file. AppTest swaps process-global runtime state on every run, so
+sessions take turns on one thread; latencies therefore exclude contention
+between script runs (background threads such as the quote poller still run
+concurrently). Provider calls are answered from a replay directory, so runs
+are repeatable and never touch the network.
+
+  python load_test.py record --replay-dir replay [--period 2y] [--synthetic]
+  python load_test.py run --replay-dir replay --sessions 10 --iterations 3
+
+`record` captures bars for every tracked ticker, index member and benchmark
+(or generates random walks with --synthetic, for offline machines). `run`
+works on a copy of data/ and reports per-page render latency percentiles,
+provider call counts and memory growth per session.
+"""
+import argparse
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ENTRYPOINT = "streamlit_app.py"
+PAGES = { # page -> st.title it renders (a page missing from st.navigation would render Home instead)
+    "pages/0_Home.py": "🚀 Stock Market Command Center",
+    "pages/1_Portfolio.py": "💼 Portfolio Review",
+    "pages/2_Watchlist.py": "🔍 Watchlist & Research",
+    "pages/3_Compare.py": "🚀 Compare Performance",
+    "pages/4_Dashboard.py": "🕵️ Deep Dive Analysis",
+}
+RECORD_BATCH_SIZE = 100 # Symbols per provider request while recording
+SYNTHETIC_INDEX_SIZE = 50 # Members per index list when --synthetic has no stored list to copy
+
+def _rss_bytes():
+    """Current resident set size of this process"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 # Peak, not current
+
+# --- record -------------------------------------------------------------------
+
+def _synthetic_bars(symbol, period):
+    """Random-walk daily OHLCV (no corporate actions), seeded by the symbol so reruns match"""
+    days = {'1y': 260, '2y': 520, '5y': 1300}.get(period, 520)
+    rng = np.random.default_rng(zlib.crc32(symbol.encode()))
+    index = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=days, name='Date')
+    close = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.015, days)))
+    spread = np.abs(rng.normal(0, 0.01, days))
+    return pd.DataFrame({
+        'Open': close * (1 + rng.normal(0, 0.005, days)),
+        'High': close * (1 + spread),
+        'Low': close * (1 - spread),
+        'Close': close,
+        'Volume': rng.integers(100_000, 5_000_000, days).astype(float),
+    }, index=index)
+
+def record(args):
+    os.environ.pop("STOCK_APP_REPLAY_DIR", None) # Recording talks to the real provider
+    from utils import provider
+    from utils.constants import NSE_INDICES_URLS, BENCHMARK_TICKER, GOLD_PROXY, USD_INR_TICKER
+    from utils.constituents import HEADERS, parse_constituents_csv
+    from utils.db import init_db, get_index_members
+    from utils.quote_poller import get_tracked_tickers
+
+    replay_dir = os.path.abspath(args.replay_dir)
+    os.makedirs(os.path.join(replay_dir, "bars"), exist_ok=True)
+    os.makedirs(os.path.join(replay_dir, "http"), exist_ok=True)
+    init_db()
+
+    symbols = get_tracked_tickers() + [BENCHMARK_TICKER, GOLD_PROXY, USD_INR_TICKER]
+
+    # Index lists first; their members are part of the universe to record
+    for index_name, urls in NSE_INDICES_URLS.items():
+        for url in urls:
+            if args.synthetic:
+                members = get_index_members(index_name)
+                if members.empty:
+                    # Tracked NSE tickers, padded with made-up symbols to a realistic size
+                    bases = list(dict.fromkeys(s[:-3] for s in symbols if s.endswith('.NS')))
+                    bases += [f"SYNTH{i:03d}" for i in range(max(SYNTHETIC_INDEX_SIZE - len(bases), 0))]
+                    members = pd.DataFrame({'symbol': bases, 'company_name': bases, 'industry': None, 'isin': None})
+                content = members.rename(columns={
+                    'company_name': 'Company Name', 'industry': 'Industry', 'symbol': 'Symbol', 'isin': 'ISIN Code'
+                })[['Company Name', 'Industry', 'Symbol', 'ISIN Code']].to_csv(index=False).encode('utf-8')
+            else:
+                response = provider.http_get(url, headers=HEADERS)
+                if response.status_code != 200:
+                    print(f"Could not record {url}: HTTP {response.status_code}")
+                    continue
+                content = response.content
+            with open(provider.replay_http_path(url, replay_dir), 'wb') as f:
+                f.write(content)
+            members = parse_constituents_csv(content.decode('utf-8'))
+            symbols += [f"{s}.NS" for s in members['symbol']]
+
+    symbols = list(dict.fromkeys(symbols))
+    print(f"Recording {len(symbols)} symbols ({args.period}) into {replay_dir}")
+
+    saved = 0
+    for i in range(0, len(symbols), RECORD_BATCH_SIZE):
+        batch = symbols[i:i + RECORD_BATCH_SIZE]
+        if args.synthetic:
+            frames = {sym: _synthetic_bars(sym, args.period) for sym in batch}
+        else:
+            data = provider.download(batch, period=args.period, interval="1d", auto_adjust=False,
+                                     actions=True, progress=False, group_by='ticker')
+            frames = {}
+            for sym in batch:
+                if isinstance(data.columns, pd.MultiIndex) and sym in data.columns.get_level_values(0):
+                    bars = data[sym].dropna(subset=['Close'])
+                    if not bars.empty:
+                        frames[sym] = bars.drop(columns=['Adj Close'], errors='ignore')
+        for sym, bars in frames.items():
+            bars.index = pd.DatetimeIndex(bars.index).tz_localize(None)
+            bars.to_parquet(provider.replay_bars_path(sym, replay_dir))
+            saved += 1
+
+    print(f"Recorded {saved}/{len(symbols)} symbols.")
+
+# --- run ----------------------------------------------------------------------
+
+def _copy_data_dir():
+    """Scratch copy of data/ (minus the shared quote cache) so runs start cold and leave data/ alone"""
+    scratch = tempfile.mkdtemp(prefix="stock_load_")
+    shutil.copytree(
+        os.path.join(BASE_DIR, "data"), scratch, dirs_exist_ok=True,
+        ignore=shutil.ignore_patterns("quote_cache.sqlite*")
+    )
+    return scratch
+
+def _navigation_pages():
+    """Page paths registered with st.Page() in the entrypoint's st.navigation"""
+    with open(os.path.join(BASE_DIR, ENTRYPOINT)) as f:
+        return set(re.findall(r'st\.Page\(\s*"([^"]+)"', f.read()))
+
+def _click(at, label):
+    """Press the first button with this label, if the page rendered one"""
+    for button in at.button:
+        if button.label == label:
+            button.click()
+            return True
+    return False
+
+def visit(at, page):
+    """Render one page in a session. Returns (label, seconds) timings and error messages"""
+    timings, errors = [], []
+    started = time.perf_counter()
+    at.switch_page(page).run()
+    timings.append((page, time.perf_counter() - started))
+    errors += [f"{page}: {e.value}" for e in at.exception]
+    titles = [t.value for t in at.title]
+    if page in PAGES and PAGES[page] not in titles:
+        errors.append(f"{page}: rendered {titles or 'no title'} instead of {PAGES[page]!r}")
+
+    # Compare renders nothing heavy until asked to
+    if page.endswith("3_Compare.py") and _click(at, "Compare"):
+        started = time.perf_counter()
+        at.run()
+        timings.append((f"{page} (compare)", time.perf_counter() - started))
+        errors += [f"{page}: {e.value}" for e in at.exception]
+
+    return timings, errors
+
+def run(args):
+    replay_dir = os.path.abspath(args.replay_dir)
+    if not os.path.isdir(os.path.join(replay_dir, "bars")):
+        sys.exit(f"No recorded bars in {replay_dir}; run `python load_test.py record` first.")
+
+    data_dir = args.data_dir or _copy_data_dir()
+    os.environ["STOCK_APP_DATA_DIR"] = data_dir
+    os.environ["STOCK_APP_REPLAY_DIR"] = replay_dir
+    os.chdir(BASE_DIR)
+    sys.path.insert(0, BASE_DIR)
+
+    from streamlit.testing.v1 import AppTest
+    from utils.provider import get_provider_stats, reset_provider_stats
+
+    pages = args.pages or list(PAGES)
+    # AppTest.switch_page() renders any file, but users only reach registered pages
+    unregistered = [p for p in pages if p not in _navigation_pages()]
+    if unregistered:
+        sys.exit(f"Not registered in {ENTRYPOINT}: {', '.join(unregistered)}")
+    reset_provider_stats()
+    rss_before = _rss_bytes()
+    started = time.perf_counter()
+
+    # Sessions stay alive for the whole run (their state is what memory per session measures)
+    sessions = [AppTest.from_file(ENTRYPOINT, default_timeout=args.timeout) for _ in range(args.sessions)]
+    timings, errors = [], []
+    for _ in range(args.iterations):
+        for page in pages:
+            for at in sessions:
+                page_timings, page_errors = visit(at, page)
+                timings += page_timings
+                errors += page_errors
+
+    elapsed = time.perf_counter() - started
+    rss_after = _rss_bytes()
+    timings = pd.DataFrame(timings, columns=['page', 'seconds'])
+
+    print(f"\n{args.sessions} sessions x {args.iterations} iterations in {elapsed:.1f}s (data: {data_dir})\n")
+    summary = timings.groupby('page', sort=False)['seconds'].describe(percentiles=[0.5, 0.9, 0.99])
+    print("Render latency (s)")
+    print(summary[['count', 'mean', '50%', '90%', '99%', 'max']].round(3).to_string())
+
+    print("\nProvider calls")
+    stats = get_provider_stats()
+    if stats:
+        print(pd.DataFrame(stats).T.round(3).to_string())
+    else:
+        print("none")
+
+    print(f"\nMemory: {rss_before / 1e6:.0f} MB -> {rss_after / 1e6:.0f} MB "
+          f"({(rss_after - rss_before) / args.sessions / 1e6:.1f} MB per session)")
+
+    if errors:
+        print(f"\n{len(errors)} page exceptions, e.g.:")
+        for error in list(dict.fromkeys(errors))[:5]:
+            print(f"  {error[:200]}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-session load test for the Streamlit pages")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    rec = sub.add_parser("record", help="Capture provider data for offline replay")
+    rec.add_argument("--replay-dir", default="replay")
+    rec.add_argument("--period", default="2y")
+    rec.add_argument("--synthetic", action="store_true", help="Generate random-walk bars instead of downloading")
+
+    go = sub.add_parser("run", help="Drive concurrent sessions against the replay data")
+    go.add_argument("--replay-dir", default="replay")
+    go.add_argument("--sessions", type=int, default=5)
+    go.add_argument("--iterations", type=int, default=2)
+    go.add_argument("--timeout", type=float, default=120, help="Per-run AppTest timeout (s)")
+    go.add_argument("--data-dir", help="Use this data directory instead of a scratch copy of data/")
+    go.add_argument("pages", nargs="*", help=f"Pages to visit (default: {', '.join(PAGES)})")
+
+    args = parser.parse_args()
+    if args.command == "record":
+        record(args)
+    else:
+        run(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Measure cold-start cost of the Streamlit pages.
+
+Each page runs in a fresh interpreter so module imports are paid again:
+  - first:    time-to-first-render of the page script (AppTest, cold process)
+  - rerun:    a second run in the same process (what every widget interaction costs)
+
+Each page is measured --runs times and the median is reported.
+
+Usage: python measure_startup.py [--runs N] [page.py ...]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PAGES = [
+    "pages/0_Home.py",
+    "pages/1_Portfolio.py",
+    "pages/2_Watchlist.py",
+    "pages/3_Compare.py",
+    "pages/4_Dashboard.py",
+    "pages/5_Screener.py",
+]
+
+RUNNER = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+
+at = AppTest.from_file(sys.argv[1], default_timeout=120)
+t = time.perf_counter()
+at.run()
+first = time.perf_counter() - t
+
+t = time.perf_counter()
+at.run()
+rerun = time.perf_counter() - t
+
+print(json.dumps({
+    'first': first,
+    'rerun': rerun,
+    'exceptions': len(at.exception),
+}))
+"""
+
+def measure_page(page):
+    """Time one page in a fresh interpreter"""
+    result = subprocess.run(
+        [sys.executable, "-c", RUNNER, page],
+        cwd=BASE_DIR, capture_output=True, text=True
+    )
+    lines = [l for l in result.stdout.splitlines() if l.startswith('{')]
+    if not lines:
+        print(f"{page}: failed\n{result.stderr[-2000:]}")
+        return None
+    return json.loads(lines[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure page cold start and rerun times")
+    parser.add_argument("pages", nargs="*", default=DEFAULT_PAGES)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'page':<24}{'first (s)':>12}{'rerun (s)':>12}{'errors':>8}")
+    for page in args.pages:
+        runs = [stats for stats in (measure_page(page) for _ in range(args.runs)) if stats]
+        if runs:
+            first = statistics.median(r['first'] for r in runs)
+            rerun = statistics.median(r['rerun'] for r in runs)
+            print(f"{page:<24}{first:>12.2f}{rerun:>12.2f}{runs[-1]['exceptions']:>8}")
+
+if __name__ == "__main__":
+    main()
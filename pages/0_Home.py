@@ -1,20 +1,19 @@
 import streamlit as st
 import pandas as pd
-import requests
-from streamlit_lottie import st_lottie
-from streamlit_autorefresh import st_autorefresh
-from utils.constants import GLOBAL_INDICES
-from utils.market_data import get_live_price, get_live_prices_bulk, format_ticker
+from utils.constants import GLOBAL_INDICES, QUOTE_POLL_INTERVAL_SECONDS, LOTTIE_CACHE_FILE
+from utils.market_data import format_ticker
+from utils.quote_poller import get_quote_poller
+from utils.alerts import get_alert_engine
+from utils.ui_components import load_cached_json, render_tradingview_ticker
 
 # Page Config
 st.set_page_config(page_title="Stock Dashboard", page_icon="📈", layout="wide")
 
-# Helper: Load Lottie
+# Helper: Load Lottie (kept in data/ after the first download; a failed
+# download is remembered for the process instead of retried on every load)
+@st.cache_resource(show_spinner=False)
 def load_lottieurl(url: str):
-    r = requests.get(url)
-    if r.status_code != 200:
-        return None
-    return r.json()
+    return load_cached_json(url, LOTTIE_CACHE_FILE)
 
 # Load Assets
 lottie_stock = load_lottieurl("https://assets5.lottiefiles.com/packages/lf20_hcipoqvc.json")
@@ -27,6 +26,7 @@ col1, col2 = st.columns([1, 2])
 
 with col1:
     if lottie_stock:
+        from streamlit_lottie import st_lottie
         st_lottie(lottie_stock, height=300, key="stock_anim")
     else:
         st.image("https://cdn-icons-png.flaticon.com/512/3310/3310748.png", width=200)
@@ -43,13 +43,15 @@ st.divider()
 # DETAILED MARKET PULSE (Python - Cached)
 # ------------------------------------------------------------------------------
 st.subheader("📊 Detailed Market Pulse (Cached)")
-st.caption("Data fetched via Yahoo Finance (15-min delayed for some indices). Refreshes every 5 seconds.")
+st.caption(f"Data fetched via Yahoo Finance (15-min delayed for some indices) by a shared background poller every {QUOTE_POLL_INTERVAL_SECONDS}s.")
 
 @st.fragment(run_every=5)
 def render_market_pulse():
-    # Fetch Data for Indices in Bulk
+    # Read the shared snapshot; the poller does all the fetching
+    poller = get_quote_poller()
+    poller.wait_ready(timeout=5) # Only blocks on the very first render after startup
     tickers = list(GLOBAL_INDICES.values())
-    bulk_data = get_live_prices_bulk(tickers)
+    bulk_data = poller.get_quotes(tickers)
     
     metrics = []
     for name, ticker in GLOBAL_INDICES.items():
@@ -94,13 +96,18 @@ def render_market_pulse():
             else:
                 st.metric(metric['Index'], "Loading...")
 
+    if poller.updated_at:
+        st.caption(f"Snapshot as of {pd.Timestamp.fromtimestamp(poller.updated_at).strftime('%H:%M:%S')}")
+    
+    # Fired by the poller's quote updates; read from memory, not the database
+    recent_alerts = list(get_alert_engine().recent)[:5]
+    for alert in recent_alerts:
+        st.warning(f"🔔 {alert['message']}")
+
 render_market_pulse()
 
 st.divider()
 
-import streamlit.components.v1 as components
-from utils.ui_components import render_tradingview_ticker
-
 # ------------------------------------------------------------------------------
 # TRADINGVIEW WIDGETS (Real-time Streaming)
 # ------------------------------------------------------------------------------
@@ -1,9 +1,14 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-from utils.data_handler import parse_holdings_csv
-from utils.market_data import get_live_price, get_gold_metrics, format_ticker
-from utils.db import init_db, save_portfolio_db, get_portfolio_db
+from utils.market_data import get_gold_metrics, invalidate_quotes
+from utils.portfolio import value_portfolio, summarize_portfolio
+from utils.db import (
+    init_db, save_portfolio_db, get_portfolio_db, save_tradebook, get_realized_trades,
+    refresh_portfolio_nav, get_portfolio_nav
+)
+from utils.risk import portfolio_risk
+from utils.memory import clear_budgeted_caches
+from utils.constants import GOLD_PROXY, USD_INR_TICKER
 
 # Initialize DB
 init_db()
@@ -13,20 +18,69 @@ st.title("💼 Portfolio Review")
 # Load existing portfolio from DB
 portfolio_df = get_portfolio_db()
 
-tab1, tab2, tab3 = st.tabs(["📁 Upload Holdings", "📊 Performance View", "🥇 SGB vs Gold"])
+tab1, tab2, tab3, tab4 = st.tabs(["📁 Upload Holdings", "📊 Performance View", "🥇 SGB vs Gold", "⚠️ Risk"])
 
 # --- TAB 1: UPLOAD ---
 with tab1:
     st.header("Upload Holdings CSV")
-    st.markdown("Upload your broker's holdings CSV file (e.g., from Zerodha/Groww).")
+    upload_type = st.radio("File Type", ["Holdings snapshot", "Tradebook"], horizontal=True)
+    if upload_type == "Holdings snapshot":
+        st.markdown("Upload your broker's holdings CSV file (e.g., from Zerodha/Groww).")
+    else:
+        st.markdown("Upload your broker's tradebook CSV. Buys and sells are matched FIFO into open lots and realized P&L.")
     
     uploaded_file = st.file_uploader("Choose CSV file", type=['csv'])
     
-    if uploaded_file:
+    if uploaded_file and upload_type == "Tradebook":
+        # Parsers pull in pyarrow; only import them once there is a file
+        from utils.tradebook import parse_tradebook_csv, fifo_match, holdings_from_lots
+        try:
+            trades = parse_tradebook_csv(uploaded_file)
+        except Exception as e:
+            st.error(f"Failed to parse tradebook: {e}")
+            trades = pd.DataFrame()
+        
+        if not trades.empty:
+            open_lots, realized, unmatched = fifo_match(trades)
+            holdings = holdings_from_lots(open_lots)
+            
+            st.success(f"Matched {len(trades):,} trades into {len(holdings)} holdings and {len(realized):,} realized lots.")
+            c1, c2, c3 = st.columns(3)
+            c1.metric("Trades", f"{len(trades):,}")
+            c2.metric("Open Lots", f"{len(open_lots):,}")
+            c3.metric("Realized P&L", f"₹{realized['pnl'].sum():,.0f}")
+            
+            if not unmatched.empty:
+                st.warning(
+                    f"{len(unmatched)} tickers were sold beyond the buys in this tradebook "
+                    f"(e.g. {', '.join(unmatched['ticker'].head(5))}); those quantities are ignored."
+                )
+            st.dataframe(holdings, use_container_width=True)
+            
+            if st.button("💾 Save to Portfolio"):
+                if save_tradebook(holdings, open_lots, realized):
+                    st.success("Portfolio and realized trades saved to Database!")
+                    st.rerun()
+        else:
+            st.error("No valid trades found. Please check the format.")
+    
+    elif uploaded_file:
+        from utils.data_handler import parse_holdings_csv
         parsed_df = parse_holdings_csv(uploaded_file)
         
         if not parsed_df.empty:
             st.success(f"Successfully parsed {len(parsed_df)} holdings.")
+            stats = parsed_df.attrs.get('ingest_stats')
+            if stats:
+                # bytes_read needs a seekable upload; rows_per_sec is None for an instant read
+                size = f" ({stats['bytes_read'] / 1e6:.1f} MB)" if stats['bytes_read'] is not None else ""
+                rate = f" · {stats['rows_per_sec']:,.0f} rows/s" if stats['rows_per_sec'] is not None else ""
+                st.caption(
+                    f"Read {stats['rows_read']:,} rows{size} in {stats['seconds']:.2f}s"
+                    f"{rate} · peak Arrow memory {stats['peak_arrow_bytes'] / 1e6:.1f} MB "
+                    f"· frame {stats['dataframe_bytes'] / 1e6:.1f} MB"
+                    + (" · staged and aggregated in DuckDB" if stats.get('staged') else "")
+                )
             st.dataframe(parsed_df.head())
             
             if st.button("💾 Save to Portfolio"):
@@ -37,6 +91,9 @@ with tab1:
             st.error("Failed to parse CSV. Please check the format.")
 
 # --- TAB 2: PORTFOLIO VIEW ---
+# Value every holding once; both the Performance and SGB tabs read this result
+valued_df = value_portfolio(portfolio_df) if not portfolio_df.empty else pd.DataFrame()
+
 with tab2:
     if portfolio_df.empty:
         st.info("Please upload a holdings file in Tab 1.")
@@ -45,72 +102,91 @@ with tab2:
         
         if st.button("🔄 Refresh Prices"):
             st.cache_data.clear()
+            clear_budgeted_caches()
+            # Only this portfolio's quotes; the shared tier serves every session
+            invalidate_quotes(portfolio_df['ticker'].astype(str).tolist() + [GOLD_PROXY, USD_INR_TICKER])
             st.rerun()
             
-        # Processing
-        df = portfolio_df.copy()
-        
-        # Show progress for fetching prices
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-        
-        live_prices = []
-        for i, ticker in enumerate(df['ticker']):
-            status_text.text(f"Fetching price for {ticker}...")
-            price = get_live_price(ticker)
-            live_prices.append(price)
-            progress_bar.progress((i + 1) / len(df))
-            
-        df['live_price'] = live_prices
-        status_text.empty()
-        progress_bar.empty()
-        
-        # Calculations
-        df['current_value'] = df['shares'] * df['live_price'].fillna(0)
-        df['invested_value'] = df['shares'] * df['buy_price']
-        df['pnl'] = df['current_value'] - df['invested_value']
-        df['pnl_pct'] = (df['pnl'] / df['invested_value'] * 100).fillna(0)
-        
-        # Metrics
-        total_invested = df['invested_value'].sum()
-        total_current = df['current_value'].sum()
-        total_pnl = df['pnl'].sum()
-        total_pnl_pct = (total_pnl / total_invested * 100) if total_invested > 0 else 0
+        df = valued_df
+        totals = summarize_portfolio(df)
         
-        col1, col2, col3 = st.columns(3)
-        col1.metric("Total Invested", f"₹{total_invested:,.0f}")
-        col2.metric("Current Value", f"₹{total_current:,.0f}")
-        col3.metric("Total P&L", f"₹{total_pnl:,.0f}", f"{total_pnl_pct:.2f}%")
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Total Invested", f"₹{totals['invested']:,.0f}")
+        col2.metric("Current Value", f"₹{totals['current']:,.0f}")
+        col3.metric("Total P&L", f"₹{totals['pnl']:,.0f}", f"{totals['pnl_pct']:.2f}%")
+        col4.metric("Day Change", f"₹{totals['day_change']:,.0f}", f"{totals['day_change_pct']:.2f}%")
         
         # Table
         st.dataframe(
-            df[['ticker', 'shares', 'buy_price', 'live_price', 'current_value', 'pnl_pct']],
+            df[['ticker', 'shares', 'buy_price', 'live_price', 'day_change_pct', 'current_value', 'pnl_pct', 'weight']],
             column_config={
                 "live_price": st.column_config.NumberColumn("Price", format="₹%.2f"),
+                "day_change_pct": st.column_config.NumberColumn("Day %", format="%+.2f%%"),
                 "current_value": st.column_config.NumberColumn("Value", format="₹%.0f"),
                 "pnl_pct": st.column_config.NumberColumn("P&L %", format="%.2f%%"),
+                "weight": st.column_config.NumberColumn("Weight", format="%.1f%%"),
             },
             use_container_width=True
         )
         
         # Chart
+        import plotly.express as px # Deferred: plotly.express costs ~75 ms to import
         st.subheader("Asset Allocation")
         fig = px.pie(df, values='current_value', names='ticker', title='Portfolio Allocation')
         st.plotly_chart(fig)
+        
+        # NAV history, materialized by the batch job (rebuilt here right after an upload)
+        nav_df = get_portfolio_nav()
+        if nav_df.empty and refresh_portfolio_nav():
+            nav_df = get_portfolio_nav()
+        if not nav_df.empty:
+            st.subheader("Portfolio History")
+            latest = nav_df.iloc[-1]
+            c1, c2, c3 = st.columns(3)
+            c1.metric("NAV (100 at start)", f"{latest['nav']:,.1f}", f"{(latest['nav'] / 100 - 1) * 100:+.1f}% since {nav_df['date'].iloc[0]:%b %Y}")
+            c2.metric("Drawdown", f"{latest['drawdown'] * 100:.1f}%", f"max {nav_df['drawdown'].min() * 100:.1f}%", delta_color="off")
+            c3.metric("Realized to Date", f"₹{latest['realized_pnl']:,.0f}")
+            
+            fig_value = px.line(nav_df, x='date', y=['value', 'invested'], title='Market Value vs Invested Capital')
+            fig_value.update_layout(yaxis_title="₹", legend_title=None)
+            st.plotly_chart(fig_value, use_container_width=True)
+            
+            fig_dd = px.area(nav_df.assign(drawdown=nav_df['drawdown'] * 100), x='date', y='drawdown', title='Drawdown of NAV (%)')
+            fig_dd.update_traces(line_color='#d62728')
+            st.plotly_chart(fig_dd, use_container_width=True)
+            st.caption("NAV chains daily returns net of buys and sells, at raw closes with lot sizes adjusted for splits and bonuses; positions without stored history are left out.")
+        
+        # Realized P&L from the last tradebook upload
+        realized_df = get_realized_trades()
+        if not realized_df.empty:
+            st.subheader("Realized P&L")
+            by_ticker = realized_df.groupby('ticker', as_index=False).agg(
+                quantity=('quantity', 'sum'), pnl=('pnl', 'sum'), avg_holding_days=('holding_days', 'mean')
+            ).sort_values('pnl', ascending=False)
+            st.metric("Total Realized", f"₹{by_ticker['pnl'].sum():,.0f}")
+            st.dataframe(
+                by_ticker,
+                column_config={
+                    "pnl": st.column_config.NumberColumn("Realized P&L", format="₹%.0f"),
+                    "avg_holding_days": st.column_config.NumberColumn("Avg Days Held", format="%.0f"),
+                },
+                hide_index=True,
+                use_container_width=True
+            )
 
 # --- TAB 3: SGB ANALYSIS ---
 with tab3:
     if portfolio_df.empty:
         st.info("Upload portfolio first.")
     else:
-        sgb_df = portfolio_df[portfolio_df['asset_type'] == 'SGB'].copy()
+        sgb_df = valued_df[valued_df['asset_type'] == 'SGB']
         
         if sgb_df.empty:
             st.warning("No SGB holdings found in your portfolio.")
         else:
             st.header("🥇 Sovereign Gold Bond Analysis")
             
-            # Get Benchmarks
+            # Get Benchmarks (already in the quote cache from the valuation)
             metrics = get_gold_metrics()
             
             if metrics:
@@ -121,14 +197,8 @@ with tab3:
                 
                 # SGB Computations
                 total_grams = sgb_df['shares'].sum()
-                theoretical_value = total_grams * metrics['inr_gram']
-                
-                # For SGBs, we might not get live prices easily if they are illiquid, 
-                # but let's assume we fetched them in Tab 2 logic (or re-fetch here if needed).
-                # For now, let's reuse logic:
-                sgb_df['live_price'] = sgb_df['ticker'].apply(get_live_price)
-                sgb_df['market_value'] = sgb_df['shares'] * sgb_df['live_price'].fillna(0)
-                actual_value = sgb_df['market_value'].sum()
+                theoretical_value = sgb_df['gold_value'].sum()
+                actual_value = sgb_df['current_value'].sum()
                 
                 premium = actual_value - theoretical_value
                 premium_pct = (premium / theoretical_value * 100) if theoretical_value > 0 else 0
@@ -141,5 +211,62 @@ with tab3:
                 
                 st.info(f"Market Gap: ₹{premium:,.0f} ({'Premium' if premium > 0 else 'Discount'})")
                 
+                st.dataframe(
+                    sgb_df[['ticker', 'shares', 'live_price', 'current_value', 'gold_value', 'gold_premium_pct']],
+                    column_config={
+                        "live_price": st.column_config.NumberColumn("Price", format="₹%.2f"),
+                        "current_value": st.column_config.NumberColumn("Market Value", format="₹%.0f"),
+                        "gold_value": st.column_config.NumberColumn("Gold Value", format="₹%.0f"),
+                        "gold_premium_pct": st.column_config.NumberColumn("vs Gold", format="%+.1f%%"),
+                    },
+                    use_container_width=True
+                )
+                
             else:
                 st.warning("Could not fetch gold benchmark data (GC=F / INR=X).")
+
+# --- TAB 4: RISK ---
+with tab4:
+    if portfolio_df.empty:
+        st.info("Upload portfolio first.")
+    else:
+        st.header("⚠️ Portfolio Risk")
+        confidence = st.radio("VaR Confidence", [0.95, 0.99], format_func=lambda c: f"{c:.0%}", horizontal=True)
+        risk = portfolio_risk(valued_df, confidence)
+        
+        if risk is None:
+            st.warning("Not enough stored price history for these holdings. Run the batch job first.")
+        else:
+            st.caption(
+                f"Daily returns over the last {risk['bars']} sessions (to {pd.Timestamp(risk['as_of']):%Y-%m-%d}); "
+                f"₹{risk['covered_value']:,.0f} of ₹{risk['value']:,.0f} has price history."
+            )
+            c1, c2, c3, c4 = st.columns(4)
+            c1.metric("Volatility (ann.)", f"{risk['volatility']:.1f}%")
+            c2.metric("1-Day VaR (parametric)", f"₹{risk['var_parametric']:,.0f}")
+            c3.metric("1-Day VaR (historical)", f"₹{risk['var_historical']:,.0f}")
+            c4.metric("Expected Shortfall", f"₹{risk['cvar_historical']:,.0f}")
+            
+            st.subheader("Contribution to Risk")
+            st.dataframe(
+                risk['holdings'],
+                column_config={
+                    "value": st.column_config.NumberColumn("Value", format="₹%.0f"),
+                    "weight": st.column_config.NumberColumn("Weight", format="%.1f%%"),
+                    "volatility": st.column_config.NumberColumn("Volatility", format="%.1f%%"),
+                    "mcr": st.column_config.NumberColumn("Marginal Risk", format="%.1f%%",
+                                                         help="Change in portfolio volatility per unit of weight"),
+                    "contribution_pct": st.column_config.NumberColumn("% of Risk", format="%.1f%%"),
+                },
+                use_container_width=True
+            )
+            
+            col_vol, col_corr = st.columns(2)
+            with col_vol:
+                st.subheader("Rolling Volatility")
+                st.line_chart(risk['rolling_volatility'].rename("Volatility % (ann.)"))
+            with col_corr:
+                st.subheader("Correlation")
+                import plotly.express as px
+                fig = px.imshow(risk['correlation'], zmin=-1, zmax=1, color_continuous_scale="RdBu_r")
+                st.plotly_chart(fig, use_container_width=True)
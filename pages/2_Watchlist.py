@@ -1,10 +1,18 @@
 import streamlit as st
 import pandas as pd
-import plotly.graph_objects as go
-from utils.data_handler import parse_watchlist_csv
-from utils.market_data import format_ticker, get_live_price, get_historical_data
+from utils.market_data import format_ticker, get_live_prices_bulk, invalidate_quotes
+from utils.quote_poller import get_quote_poller
 from utils.indicators import calculate_all_indicators
-from utils.db import init_db, get_watchlist, add_ticker, remove_ticker
+from utils.history import get_ohlcv
+from utils.charting import downsample_ohlc, line_trace
+from utils.constants import CHART_MAX_CANDLES
+from utils.ui_components import render_date_window, render_paginated_table
+from utils.db import (
+    init_db, get_watchlist, add_ticker, remove_ticker, get_history_page,
+    add_alert_rule, remove_alert_rule, get_alert_rules, get_alert_log
+)
+from utils.alerts import RULE_PRESETS, describe_rule, get_alert_engine
+from utils.memory import clear_budgeted_caches
 
 # Initialize DB
 init_db()
@@ -14,7 +22,7 @@ st.title("🔍 Watchlist & Research")
 # Load existing watchlist
 watchlist_df = get_watchlist()
 
-tab1, tab2, tab3 = st.tabs(["📁 Manage Watchlist", "📊 Live Metrics", "📈 Technical Analysis"])
+tab1, tab2, tab3, tab4 = st.tabs(["📁 Manage Watchlist", "📊 Live Metrics", "📈 Technical Analysis", "🔔 Alerts"])
 
 # --- TAB 1: MANAGE WATCHLIST ---
 with tab1:
@@ -35,6 +43,7 @@ with tab1:
         st.header("Upload CSV")
         uploaded_file = st.file_uploader("Upload simple CSV (one ticker per line)", type=['csv'])
         if uploaded_file:
+            from utils.data_handler import parse_watchlist_csv # Deferred: pulls in pyarrow
             parsed_df = parse_watchlist_csv(uploaded_file)
             if not parsed_df.empty:
                 count = 0
@@ -63,26 +72,32 @@ with tab2:
     else:
         if st.button("Refresh Data", key='refresh_wl'):
              st.cache_data.clear()
+             clear_budgeted_caches()
+             # Only this watchlist's quotes; the shared tier serves every session
+             invalidate_quotes(watchlist_df['ticker'].tolist())
              st.rerun()
              
-        st.write("Fetching live prices...")
-        
+        # Served from the background poller's snapshot; only tickers it has
+        # not picked up yet (e.g. just added) are looked up directly
+        tickers = watchlist_df['ticker'].tolist()
+        quotes = get_quote_poller().get_quotes(tickers)
+        unpolled = [t for t in tickers if quotes.get(format_ticker(t)) is None]
+        if unpolled:
+            with st.spinner("Fetching live prices..."):
+                quotes.update(get_live_prices_bulk(unpolled))
+
         results = []
-        progress = st.progress(0)
-        
-        for i, row in watchlist_df.iterrows():
-             ticker = row['ticker']
-             price = get_live_price(ticker)
-             results.append({'Ticker': ticker, 'Price': price})
-             progress.progress((i+1)/len(watchlist_df))
-             
-        progress.empty()
+        for ticker in watchlist_df['ticker']:
+             quote = quotes.get(format_ticker(ticker)) or {}
+             results.append({'Ticker': ticker, 'Price': quote.get('price'), 'Change %': quote.get('pct')})
+
         res_df = pd.DataFrame(results)
         
         st.dataframe(
             res_df, 
             column_config={
-                "Price": st.column_config.NumberColumn("Price", format="₹%.2f")
+                "Price": st.column_config.NumberColumn("Price", format="₹%.2f"),
+                "Change %": st.column_config.NumberColumn("Change %", format="%+.2f%%")
             },
             use_container_width=True
         )
@@ -98,12 +113,10 @@ with tab3:
             formatted_ticker = format_ticker(selected_ticker)
             st.markdown(f"**Analyzing {formatted_ticker}...**")
             
-            # Fetch History
+            # Load History (local store first; only missing bars are downloaded)
             try:
-                # Need YF Ticker object for indicators usually, but our market_data wrapper returns simple data
                 # We need O/H/L/C for SuperTrend
-                import yfinance as yf
-                full_hist = yf.Ticker(formatted_ticker).history(period="2y") # Increased history for EMA/MA
+                full_hist = get_ohlcv(formatted_ticker, period="2y") # Increased history for EMA/MA
                 
                 if not full_hist.empty:
                     indicators = calculate_all_indicators(full_hist)
@@ -135,6 +148,17 @@ with tab3:
                             trend = "Bullish 🐂" if cur_price > st_val else "Bearish 🐻"
                             st.metric("SuperTrend (10,3)", trend, f"Level: {st_val:.2f}")
 
+                    # Zooming re-slices the full-resolution history to the window
+                    window_start, window_end = render_date_window(
+                        full_hist.index.min(), full_hist.index.max(), key=f"ta_window_{formatted_ticker}"
+                    )
+                    in_window = (full_hist.index >= window_start) & (full_hist.index <= window_end)
+                    window_hist = full_hist[in_window]
+                    candles = downsample_ohlc(
+                        window_hist, CHART_MAX_CANDLES, date_col='Date',
+                        columns=('Open', 'High', 'Low', 'Close', 'Volume')
+                    )
+
                     # 3. Interactive Chart & Data Table Layout
                     col_chart, col_data = st.columns([3, 1])
 
@@ -142,15 +166,16 @@ with tab3:
                         # Charting
                         st.subheader("Interactive Chart")
                         
+                        import plotly.graph_objects as go # Deferred with the other chart-only imports
                         fig = go.Figure()
                         
-                        # Candlestick
+                        # Candlestick (consecutive bars merged once past the candle budget)
                         fig.add_trace(go.Candlestick(
-                            x=full_hist.index,
-                            open=full_hist['Open'],
-                            high=full_hist['High'],
-                            low=full_hist['Low'],
-                            close=full_hist['Close'],
+                            x=candles.index,
+                            open=candles['Open'],
+                            high=candles['High'],
+                            low=candles['Low'],
+                            close=candles['Close'],
                             name='Price'
                         ))
                         
@@ -158,25 +183,24 @@ with tab3:
                         colors = {'st_10_2': 'blue', 'st_10_3': 'purple', 'st_20_5': 'green'}
                         for st_key, color in colors.items():
                             if indicators.get(st_key):
-                                st_series = pd.Series(indicators[st_key], index=full_hist.index)
-                                fig.add_trace(go.Scatter(
-                                    x=full_hist.index, 
-                                    y=st_series, 
+                                st_series = pd.Series(indicators[st_key], index=full_hist.index, dtype=float)[in_window]
+                                fig.add_trace(line_trace(
+                                    st_series.index, 
+                                    st_series, 
                                     name=f"SuperTrend ({st_key.replace('st_', '').replace('_', ',')})", 
-                                    line=dict(width=2, dash='dot', color=color),
-                                    mode='lines'
+                                    line=dict(width=2, dash='dot', color=color)
                                 ))
                         
                         # Moving Averages
                         if indicators.get('ma50_series') is not None:
-                             fig.add_trace(go.Scatter(x=full_hist.index, y=indicators['ma50_series'], name='MA 50', line=dict(color='orange', width=1)))
+                             fig.add_trace(line_trace(window_hist.index, indicators['ma50_series'][in_window], name='MA 50', line=dict(color='orange', width=1)))
                         
                         if indicators.get('ma200_series') is not None:
-                             fig.add_trace(go.Scatter(x=full_hist.index, y=indicators['ma200_series'], name='MA 200', line=dict(color='red', width=1)))
+                             fig.add_trace(line_trace(window_hist.index, indicators['ma200_series'][in_window], name='MA 200', line=dict(color='red', width=1)))
     
                         # EMA
                         if indicators.get('ema20_series') is not None:
-                             fig.add_trace(go.Scatter(x=full_hist.index, y=indicators['ema20_series'], name='EMA 20', line=dict(color='cyan', width=1)))
+                             fig.add_trace(line_trace(window_hist.index, indicators['ema20_series'][in_window], name='EMA 20', line=dict(color='cyan', width=1)))
     
                         fig.update_layout(
                             xaxis_rangeslider_visible=False,
@@ -191,26 +215,17 @@ with tab3:
                     
                     with col_data:
                         st.subheader("📋 Data View")
-                        # Prepare Data to display
-                        # Combine key metrics into a DF
-                        view_df = full_hist[['Close', 'Volume']].copy()
-                        view_df['RSI'] = indicators.get('rsi_series')
-                        if indicators.get('st_10_3'):
-                            view_df['SuperTrend'] = indicators['st_10_3']
-                        
-                        # Sort new to old
-                        view_df = view_df.sort_index(ascending=False)
-                        view_df.index = view_df.index.strftime('%Y-%m-%d')
-                        
-                        st.dataframe(
-                            view_df,
+                        # Stored bars (RSI 14, SuperTrend 10,3), newest first, one page per query
+                        render_paginated_table(
+                            lambda limit, offset: get_history_page(formatted_ticker, limit, offset, window_start, window_end),
+                            key=f"ta_data_view_{formatted_ticker}",
                             use_container_width=True,
                             height=700,
                             column_config={
-                                "Close": st.column_config.NumberColumn("Close", format="%.2f"),
-                                "RSI": st.column_config.NumberColumn("RSI", format="%.1f"),
-                                "SuperTrend": st.column_config.NumberColumn("ST", format="%.2f"),
-                                "Volume": st.column_config.NumberColumn("Vol", format="%d compact"),
+                                "close": st.column_config.NumberColumn("Close", format="%.2f"),
+                                "rsi": st.column_config.NumberColumn("RSI", format="%.1f"),
+                                "supertrend": st.column_config.NumberColumn("ST", format="%.2f"),
+                                "volume": st.column_config.NumberColumn("Vol", format="%d compact"),
                             }
                         )
                     
@@ -218,3 +233,54 @@ with tab3:
                     st.error("No data found.")
             except Exception as e:
                 st.error(f"Error fetching data: {e}")
+
+# --- TAB 4: ALERTS ---
+with tab4:
+    st.caption(
+        "Rules are checked whenever live quotes are fetched and after every batch run. "
+        "Close rules fire on live prices; RSI rules fire on stored daily bars. Each rule fires at most once a day."
+    )
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.header("New Rule")
+        rule_ticker = st.text_input("Ticker", key="alert_ticker").strip().upper()
+        preset = st.selectbox("Condition", list(RULE_PRESETS))
+        metric, reference = RULE_PRESETS[preset]
+        level = None
+        if reference == 'level':
+            level = st.number_input("Level", value=30.0 if metric == 'rsi' else 0.0, step=1.0)
+        direction = st.radio("Direction", ["either", "above", "below"], horizontal=True)
+        if st.button("🔔 Add Rule"):
+            if rule_ticker:
+                if add_alert_rule(rule_ticker, metric, reference, level, direction) is not None:
+                    get_alert_engine().invalidate()
+                    st.success(f"Added rule on {format_ticker(rule_ticker)}")
+                    st.rerun()
+            else:
+                st.warning("Enter a ticker.")
+    
+    with col2:
+        st.header("Rules")
+        rules_df = get_alert_rules()
+        if rules_df.empty:
+            st.info("No alert rules yet.")
+        else:
+            st.dataframe(rules_df.drop(columns=['created_at']), hide_index=True, use_container_width=True, height=300)
+            labels = {row['id']: f"#{row['id']} {describe_rule(row)}" for row in rules_df.to_dict('records')}
+            to_remove = st.selectbox("Remove rule", list(labels), format_func=labels.get)
+            if st.button("🗑️ Remove Rule"):
+                remove_alert_rule(to_remove)
+                get_alert_engine().invalidate()
+                st.rerun()
+    
+    st.header("Fired Alerts")
+    log_df = get_alert_log(200)
+    if log_df.empty:
+        st.info("No alerts have fired yet.")
+    else:
+        st.dataframe(
+            log_df[['fired_at', 'trigger_date', 'ticker', 'message', 'source']],
+            hide_index=True,
+            use_container_width=True
+        )
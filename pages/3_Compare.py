@@ -1,59 +1,136 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-from utils.market_data import get_nse_stock_list, get_historical_data, calculate_relative_return, format_ticker
-from utils.constants import NSE_INDICES_URLS
+from utils.market_data import get_nse_stock_list, calculate_relative_return, format_ticker
+from utils.history import get_close_matrix
+from utils.analytics import compute_metrics, correlation_matrix
+from utils.constants import NSE_INDICES_URLS, BENCHMARK_TICKER
+from utils.db import init_db
+from utils.memory import budgeted_cache
+
+# Initialize DB
+init_db()
 
 st.title("🚀 Compare Performance")
 
+METRIC_LABELS = {
+    'total_return': "Total Return %",
+    'cagr': "CAGR %",
+    'volatility': "Volatility %",
+    'max_drawdown': "Max Drawdown %",
+    'sharpe': "Sharpe",
+    'beta': "Beta (vs NIFTY 50)",
+    'correlation': "Corr (vs NIFTY 50)",
+}
+PERCENT_METRICS = ['total_return', 'cagr', 'volatility', 'max_drawdown']
+
+@budgeted_cache("compare.comparison", ttl=900)
+def load_comparison(tickers, period):
+    """Close matrix, metrics and benchmark for a ticker universe (one pass)"""
+    closes = get_close_matrix(list(tickers) + [BENCHMARK_TICKER], period=period)
+    if closes.empty:
+        return pd.DataFrame(), pd.DataFrame()
+    benchmark = closes.pop(BENCHMARK_TICKER) if BENCHMARK_TICKER in closes else None
+    # beta / correlation are only computed when the benchmark loaded
+    return closes, compute_metrics(closes, benchmark).reindex(columns=list(METRIC_LABELS))
+
 # 1. Select Index/Universe
 indices = list(NSE_INDICES_URLS.keys())
 selected_index = st.selectbox("Select Index", indices)
 
 # 2. Fetch Tickers for Index
 if selected_index:
-    with st.spinner(f"Loading {selected_index} tickers..."):
-        available_tickers = get_nse_stock_list(selected_index)
-        
+    available_tickers = get_nse_stock_list(selected_index)
+
     if available_tickers:
-        # 3. Select Tickers to Compare
-        default_tickers = available_tickers[:3] if len(available_tickers) >=3 else available_tickers
-        selected_tickers = st.multiselect(
-            "Select Stocks to Compare", 
-            options=available_tickers,
-            default=default_tickers
+        # 3. Select Universe
+        scope = st.radio(
+            "Universe", ["Selected stocks", f"All {len(available_tickers)} constituents"],
+            horizontal=True
         )
-        
+
+        if scope == "Selected stocks":
+            default_tickers = available_tickers[:3] if len(available_tickers) >=3 else available_tickers
+            selected_tickers = st.multiselect(
+                "Select Stocks to Compare",
+                options=available_tickers,
+                default=default_tickers
+            )
+        else:
+            selected_tickers = available_tickers
+
+        c1, c2, c3 = st.columns(3)
+        period = c1.selectbox("Period", ["6mo", "1y", "2y", "5y"], index=1)
+        rank_by = c2.selectbox("Rank By", list(METRIC_LABELS), format_func=METRIC_LABELS.get)
+        top_n = c3.slider("Plot Top N", min_value=3, max_value=25, value=10)
+
         if selected_tickers:
+            # Format tickers just in case
+            formatted_tickers = tuple(sorted({format_ticker(t) for t in selected_tickers}))
+            # Ranking and Top N re-render a loaded comparison; a new universe or period waits for the button
             if st.button("Compare", type="primary"):
-                with st.spinner("Fetching historical data..."):
-                    # Format tickers just in case
-                    formatted_tickers = [format_ticker(t) for t in selected_tickers]
-                    
-                    # Fetch Data (1 Year)
-                    df_close = get_historical_data(formatted_tickers, period="1y")
-                    
-                    if not df_close.empty:
-                        # Calculate Relative Return
-                        rel_ret = calculate_relative_return(df_close)
-                        
-                        # Plot
-                        st.subheader("Relative Return Comparison (1 Year)")
-                        fig = px.line(
-                            rel_ret, 
-                            title="Cumulative Returns",
-                            labels={"value": "Return", "Date": "Date", "variable": "Ticker"}
+                st.session_state['compare_loaded'] = (formatted_tickers, period)
+            if st.session_state.get('compare_loaded') == (formatted_tickers, period):
+                with st.spinner("Loading historical data..."):
+                    # Stored closes; only missing/stale symbols are downloaded
+                    df_close, metrics = load_comparison(formatted_tickers, period)
+
+                if not df_close.empty:
+                    if metrics[rank_by].isna().all():
+                        st.info(f"{METRIC_LABELS[rank_by]} needs the benchmark, which could not be loaded; ranking by Total Return.")
+                        rank_by = 'total_return'
+                    ascending = rank_by in ('volatility',)
+                    ranked = metrics.sort_values(rank_by, ascending=ascending)
+                    top = ranked.head(top_n).index.tolist()
+
+                    # Ranked metrics table (full universe)
+                    st.subheader(f"Performance Metrics ({len(metrics)} stocks, {period})")
+                    display = ranked.copy()
+                    display[PERCENT_METRICS] = display[PERCENT_METRICS] * 100
+                    st.dataframe(
+                        display.reset_index(),
+                        column_config={
+                            'ticker': "Ticker",
+                            **{k: st.column_config.NumberColumn(v, format="%.2f") for k, v in METRIC_LABELS.items()}
+                        },
+                        hide_index=True,
+                        use_container_width=True
+                    )
+
+                    # Plot only the top-N subset
+                    import plotly.express as px # Deferred: plotly.express costs ~75 ms to import
+                    st.subheader(f"Relative Return Comparison (Top {len(top)} by {METRIC_LABELS[rank_by]})")
+                    rel_ret = calculate_relative_return(df_close[top].ffill())
+                    fig = px.line(
+                        rel_ret,
+                        title="Cumulative Returns",
+                        labels={"value": "Return", "Date": "Date", "variable": "Ticker"}
+                    )
+                    st.plotly_chart(fig, use_container_width=True)
+
+                    col_risk, col_corr = st.columns(2)
+                    with col_risk:
+                        st.subheader("Risk vs Return")
+                        scatter_df = display.reset_index()
+                        fig = px.scatter(
+                            scatter_df, x='volatility', y='cagr', hover_name='ticker',
+                            color='sharpe', color_continuous_scale='RdYlGn',
+                            labels={'volatility': "Volatility %", 'cagr': "CAGR %"}
                         )
                         st.plotly_chart(fig, use_container_width=True)
-                        
-                        # Table
-                        st.subheader("Performance Metrics")
-                        total_ret = rel_ret.iloc[-1] * 100
-                        ret_df = pd.DataFrame(total_ret).reset_index()
-                        ret_df.columns = ['Ticker', 'Total Return %']
-                        st.dataframe(ret_df.sort_values('Total Return %', ascending=False), hide_index=True)
-                        
-                    else:
-                        st.error("No data fetched.")
+
+                    with col_corr:
+                        st.subheader(f"Correlation (Top {len(top)})")
+                        corr = correlation_matrix(df_close[top])
+                        fig = px.imshow(corr, zmin=-1, zmax=1, color_continuous_scale='RdBu_r', aspect='auto')
+                        st.plotly_chart(fig, use_container_width=True)
+
+                    if len(df_close.columns) > top_n:
+                        full_corr = correlation_matrix(df_close)
+                        n = len(full_corr)
+                        avg_corr = (full_corr.sum().sum() - n) / (n * (n - 1)) if n > 1 else float('nan')
+                        st.caption(f"Average pairwise correlation across all {n} stocks: {avg_corr:.2f}")
+
+                else:
+                    st.error("No data fetched.")
     else:
         st.warning("Could not load tickers for this index.")
@@ -1,15 +1,31 @@
 import streamlit as st
 import pandas as pd
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-from utils.db import get_historical_data, get_watchlist, get_portfolio_db
-from utils.ui_components import render_tradingview_ticker
+from utils.db import get_historical_data, get_history_coverage, get_history_page, get_watchlist, get_portfolio_db
+from utils.intraday import TIMEFRAMES, get_intraday_coverage, get_intraday_generation, get_intraday_frame
+from utils.symbols import resolve_symbol
+from utils.charting import build_dashboard_figure, apply_view_options
+from utils.constants import FIGURE_CACHE_ENTRIES
+from utils.memory import budgeted_cache
+from utils.ui_components import render_tradingview_ticker, render_date_window, render_paginated_table
 
 # Page Config
 st.set_page_config(page_title="Deep Dive Dashboard", page_icon="🕵️", layout="wide")
 
 st.title("🕵️ Deep Dive Analysis")
 
+# Keyed on the data generation (latest updated_at), so a batch run invalidates it
+@budgeted_cache("dashboard.figure", max_entries=FIGURE_CACHE_ENTRIES)
+def load_figure(ticker, generation, start, end):
+    """Dashboard figure dict for the chart window"""
+    return build_dashboard_figure(get_historical_data(ticker, start=start, end=end), ticker)
+
+# Keyed on the ticker's intraday write counter, so every stored batch (1m or 5m) invalidates it
+@budgeted_cache("dashboard.intraday", max_entries=FIGURE_CACHE_ENTRIES)
+def load_intraday(ticker, timeframe, generation, start, end):
+    """Resampled bars with indicators, and their figure dict"""
+    df = get_intraday_frame(ticker, timeframe, start, end)
+    return df, build_dashboard_figure(df, f"{ticker} ({timeframe})")
+
 # Sidebar - Ticker Selection
 st.sidebar.header("Configuration")
 
@@ -31,6 +47,16 @@ if not sorted_tickers:
 
 selected_ticker = st.sidebar.selectbox("Select Ticker", sorted_tickers)
 
+# Intraday timeframes are resampled from 1m/5m bars stored by the batch job
+intraday_range = get_intraday_coverage(selected_ticker)
+timeframe = st.sidebar.selectbox(
+    "Timeframe", ["Daily"] + list(TIMEFRAMES),
+    disabled=intraday_range is None,
+    help="Intraday timeframes appear once the batch job has stored intraday bars for this ticker."
+)
+if intraday_range is None:
+    timeframe = "Daily" # A disabled selectbox keeps the previous ticker's choice
+
 # Log Scale Toggle
 use_log_scale = st.sidebar.checkbox("Logarithmic Scale", value=False)
 
@@ -47,87 +73,62 @@ if selected_ticker:
         
     render_tradingview_ticker([{"proName": tv_symbol, "title": selected_ticker}])
     
-    # 2. Fetch Data from DB
-    df = get_historical_data(selected_ticker)
+    # 2. Fetch Data from DB (only the visible window; the chart layer downsamples it)
+    coverage = get_history_coverage([resolve_symbol(selected_ticker)])
     
-    if df.empty:
+    if coverage.empty and timeframe == "Daily":
         st.error(f"No historical data found for {selected_ticker}. Please run the batch job.")
     else:
         # Latest Close & Indicators
-        latest = df.iloc[-1]
-        c1, c2, c3, c4 = st.columns(4)
-        c1.metric("Close", f"{latest['close']:,.2f}")
-        c2.metric("RSI (14)", f"{latest['rsi']:.2f}")
-        c3.metric("Slow MA (200)", f"{latest['ma200']:,.2f}")
-        # SuperTrend Status
-        st_val = latest['supertrend']
-        st_color = "green" if latest['close'] > st_val else "red"
-        st_status = "Bullish" if latest['close'] > st_val else "Bearish"
-        c4.markdown(f"**SuperTrend**: :{st_color}[{st_status}] ({st_val:,.2f})")
+        if not coverage.empty:
+            first_date, last_date = coverage['first_date'].iloc[0], coverage['last_date'].iloc[0]
+            latest = get_historical_data(selected_ticker, start=last_date).iloc[-1]
+            c1, c2, c3, c4 = st.columns(4)
+            c1.metric("Close", f"{latest['close']:,.2f}")
+            c2.metric("RSI (14)", f"{latest['rsi']:.2f}")
+            c3.metric("Slow MA (200)", f"{latest['ma200']:,.2f}")
+            # SuperTrend Status
+            st_val = latest['supertrend']
+            st_color = "green" if latest['close'] > st_val else "red"
+            st_status = "Bullish" if latest['close'] > st_val else "Bearish"
+            c4.markdown(f"**SuperTrend**: :{st_color}[{st_status}] ({st_val:,.2f})")
+
+        # Zooming re-queries the window at full resolution
+        if timeframe == "Daily":
+            window_start, window_end = render_date_window(first_date, last_date, key=f"window_{selected_ticker}")
+            generation = coverage['updated_at'].iloc[0]
+            figure, candle_count, bar_count = load_figure(selected_ticker, generation, window_start, window_end)
+            fetch_page = lambda limit, offset: get_history_page(selected_ticker, limit, offset, window_start, window_end)
+        else:
+            first_bar, last_bar = intraday_range
+            # Minute-level timeframes open on the last week; rollup timeframes on everything stored
+            window_start, window_end = render_date_window(
+                first_bar, last_bar, key=f"window_{selected_ticker}_{timeframe}",
+                default_days=5 if TIMEFRAMES[timeframe][0] in ('1m', '5m') else None
+            )
+            bars, (figure, candle_count, bar_count) = load_intraday(
+                selected_ticker, timeframe, get_intraday_generation(selected_ticker), window_start, window_end
+            )
+            newest_first = bars.iloc[::-1].drop(columns=['ticker'])
+            fetch_page = lambda limit, offset: (newest_first.iloc[offset:offset + limit], len(newest_first))
 
         # 3. Interactive Chart & Data Table Layout
         col_chart, col_data = st.columns([3, 1])
 
         with col_chart:
-            # Create subplots: Row 1 = Price, Row 2 = Volume, Row 3 = RSI
-            fig = make_subplots(
-                rows=3, cols=1, 
-                shared_xaxes=True,
-                vertical_spacing=0.05,
-                row_heights=[0.6, 0.2, 0.2],
-                subplot_titles=(f"{selected_ticker} Price Action", "Volume", "RSI")
-            )
-
-            # Candlestick
-            fig.add_trace(go.Candlestick(
-                x=df['date'],
-                open=df['open'], high=df['high'],
-                low=df['low'], close=df['close'],
-                name='OHLC'
-            ), row=1, col=1)
-
-            # Overlays: MA50, MA200, SuperTrend
-            fig.add_trace(go.Scatter(x=df['date'], y=df['ma50'], line=dict(color='orange', width=1), name='MA 50'), row=1, col=1)
-            fig.add_trace(go.Scatter(x=df['date'], y=df['ma200'], line=dict(color='blue', width=2), name='MA 200'), row=1, col=1)
-            
-            # SuperTrend (Green/Red dots or line)
-            # Ensure mode is lines so it draws even if points are close
-            fig.add_trace(go.Scatter(
-                x=df['date'], 
-                y=df['supertrend'], 
-                line=dict(color='purple', dash='dot', width=2), 
-                mode='lines',
-                name='SuperTrend'
-            ), row=1, col=1)
-
-            # Volume
-            colors = ['red' if row['open'] - row['close'] > 0 else 'green' for index, row in df.iterrows()]
-            fig.add_trace(go.Bar(x=df['date'], y=df['volume'], marker_color=colors, name='Volume'), row=2, col=1)
-
-            # RSI
-            fig.add_trace(go.Scatter(x=df['date'], y=df['rsi'], line=dict(color='purple', width=2), name='RSI'), row=3, col=1)
-            # RSI Levels
-            fig.add_hline(y=70, line_dash="dash", line_color="red", row=3, col=1)
-            fig.add_hline(y=30, line_dash="dash", line_color="green", row=3, col=1)
-
-            # Layout Updates
-            fig.update_layout(height=800, xaxis_rangeslider_visible=False, margin=dict(l=20, r=20, t=40, b=20))
-            
-            if use_log_scale:
-                fig.update_yaxes(type="log", row=1, col=1)
-
+            # Traces come from the cache; view options only patch the layout
+            fig = apply_view_options(figure, log_scale=use_log_scale)
             st.plotly_chart(fig, use_container_width=True)
-            st.caption("Charts powered by Plotly & DuckDB")
+            st.caption(f"Charts powered by Plotly & DuckDB · {candle_count:,} candles for {bar_count:,} bars")
 
         with col_data:
             st.subheader("📋 Data View")
-            # Prepare display dataframe
-            display_df = df[['date', 'close', 'rsi', 'supertrend', 'volume']].sort_values(by='date', ascending=False)
-            display_df['date'] = display_df['date'].dt.strftime('%Y-%m-%d')
-            
-            st.dataframe(
-                display_df, 
-                use_container_width=True, 
+            # Newest bars first, one page per query
+            render_paginated_table(
+                fetch_page,
+                key=f"data_view_{selected_ticker}_{timeframe}",
+                date_format='%Y-%m-%d' if timeframe == "Daily" else '%Y-%m-%d %H:%M',
+                use_container_width=True,
                 height=800,
                 column_config={
                     "close": st.column_config.NumberColumn("Close", format="%.2f"),
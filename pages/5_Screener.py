@@ -0,0 +1,81 @@
+import streamlit as st
+import time
+from utils.db import init_db, screen_latest_snapshot, get_index_members
+from utils.constants import NSE_INDICES_URLS
+from utils.symbols import resolve_symbols
+
+# Initialize DB
+init_db()
+
+st.title("🔎 Stock Screener")
+st.markdown("Filter every stored ticker by its latest indicators. Values come from the batch job's snapshot.")
+
+SORT_LABELS = {
+    'ticker': "Ticker",
+    'day_change_pct': "Day Change %",
+    'rsi': "RSI",
+    'pct_from_high': "% From 52W High",
+    'close': "Close",
+}
+TREND_OPTIONS = {"Any": None, "Above": True, "Below": False}
+
+# 1. Universe
+universe = st.selectbox("Universe", ["All stored tickers"] + list(NSE_INDICES_URLS.keys()))
+symbols = None
+if universe != "All stored tickers":
+    members = get_index_members(universe)
+    # Members are stored bare (RELIANCE); snapshot rows are canonical (RELIANCE.NS)
+    symbols = resolve_symbols(members['symbol']).tolist() if not members.empty else []
+
+# 2. Filters
+c1, c2, c3, c4 = st.columns(4)
+rsi_range = c1.slider("RSI (14)", 0, 100, (0, 100))
+ma50_state = c2.selectbox("Close vs MA 50", list(TREND_OPTIONS))
+ma200_state = c3.selectbox("Close vs MA 200", list(TREND_OPTIONS))
+trend_state = c4.selectbox("SuperTrend", ["Any", "Bullish", "Bearish"])
+
+c1, c2, c3 = st.columns(3)
+max_from_high = c1.slider("Max % Below 52W High", 0, 100, 100)
+sort_by = c2.selectbox("Sort By", list(SORT_LABELS), format_func=SORT_LABELS.get)
+ascending = c3.radio("Order", ["Ascending", "Descending"], horizontal=True) == "Ascending"
+
+# 3. Query
+started = time.perf_counter()
+results = screen_latest_snapshot(
+    rsi_min=rsi_range[0] if rsi_range[0] > 0 else None,
+    rsi_max=rsi_range[1] if rsi_range[1] < 100 else None,
+    above_ma50=TREND_OPTIONS[ma50_state],
+    above_ma200=TREND_OPTIONS[ma200_state],
+    supertrend_bullish={"Any": None, "Bullish": True, "Bearish": False}[trend_state],
+    max_pct_from_high=max_from_high if max_from_high < 100 else None,
+    symbols=symbols,
+    order_by=sort_by,
+    ascending=ascending
+)
+elapsed_ms = (time.perf_counter() - started) * 1000
+
+if results.empty:
+    st.info("No tickers match. If the screener is empty, run the batch job to build the snapshot.")
+else:
+    st.caption(f"{len(results):,} matches · query {elapsed_ms:.0f} ms")
+    results['date'] = results['date'].dt.strftime('%Y-%m-%d')
+    st.dataframe(
+        results,
+        column_config={
+            "ticker": "Ticker",
+            "date": "As Of",
+            "close": st.column_config.NumberColumn("Close", format="%.2f"),
+            "prev_close": st.column_config.NumberColumn("Prev Close", format="%.2f"),
+            "day_change_pct": st.column_config.NumberColumn("Day %", format="%+.2f%%"),
+            "rsi": st.column_config.NumberColumn("RSI", format="%.1f"),
+            "ma50": st.column_config.NumberColumn("MA 50", format="%.2f"),
+            "ma200": st.column_config.NumberColumn("MA 200", format="%.2f"),
+            "supertrend": st.column_config.NumberColumn("ST", format="%.2f"),
+            "supertrend_bullish": st.column_config.CheckboxColumn("ST Bullish"),
+            "high_52w": st.column_config.NumberColumn("52W High", format="%.2f"),
+            "low_52w": st.column_config.NumberColumn("52W Low", format="%.2f"),
+            "pct_from_high": st.column_config.NumberColumn("From High", format="%.1f%%"),
+        },
+        hide_index=True,
+        use_container_width=True
+    )
@@ -0,0 +1,130 @@
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+from utils.db import init_db, get_trace_spans
+from utils.tracing import get_spans, clear_spans, persist_spans
+from utils.provider import get_provider_stats
+from utils.market_data import clear_quote_cache
+from utils.memory import cache_report, budget_usage, resident_bytes, clear_budgeted_caches
+from utils.constants import COMPACT_FRAMES
+
+# Initialize DB
+init_db()
+
+st.title("🩺 Diagnostics")
+st.markdown("Where time goes: spans recorded around provider calls, DuckDB queries, indicator math and chart serialization.")
+
+# 1. Source
+source = st.radio("Spans", ["This server process", "Stored (batch job and saved sessions)"], horizontal=True)
+c1, c2 = st.columns(2)
+if c1.button("💾 Save this process's spans"):
+    st.success(f"Saved {persist_spans()} spans.")
+if c2.button("🧹 Clear buffer"):
+    clear_spans()
+    st.rerun()
+
+# 2. Memory (this server process; independent of the span source)
+st.subheader("Memory")
+held, budget = budget_usage()
+rss = resident_bytes()
+k1, k2, k3 = st.columns(3)
+k1.metric("Process RSS", f"{rss / 2**20:,.0f} MB" if rss else "n/a")
+k2.metric("Cached Frames", f"{held / 2**20:,.1f} / {budget / 2**20:,.0f} MB")
+k3.metric("Compact Frames", "On" if COMPACT_FRAMES else "Off", help="Set STOCK_APP_COMPACT=1 for float32 prices and categorical tickers")
+report = cache_report()
+if report.empty:
+    st.caption("No budgeted cache lookups yet.")
+else:
+    st.dataframe(
+        report,
+        column_config={
+            "bytes": st.column_config.NumberColumn("Resident Bytes", format="%d"),
+            "hit_rate": st.column_config.NumberColumn("Hit Rate", format="%.1f%%"),
+        },
+        use_container_width=True
+    )
+    if st.button("🧹 Clear cached frames"):
+        clear_budgeted_caches()
+        st.rerun()
+
+# Admin: the quote cache file is shared by every worker and the batch job
+if st.button("🗑️ Wipe shared quote cache", help="Drops every cached quote for all sessions; the next lookups all go to the provider"):
+    clear_quote_cache()
+    st.success("Quote cache wiped.")
+
+spans = get_spans() if source == "This server process" else get_trace_spans()
+if spans.empty:
+    st.info("No spans recorded yet. Browse a few pages (or run the batch job and pick stored spans).")
+    st.stop()
+# Spans record whatever row count a call reported (None, ints, numpy scalars); an object column can't be averaged
+spans['rows'] = pd.to_numeric(spans['rows'], errors='coerce')
+
+if spans['process'].nunique() > 1:
+    processes = st.multiselect("Processes", sorted(spans['process'].unique()), default=sorted(spans['process'].unique()))
+    spans = spans[spans['process'].isin(processes)]
+
+categories = st.multiselect("Categories", sorted(spans['category'].unique()), default=sorted(spans['category'].unique()))
+spans = spans[spans['category'].isin(categories)]
+if spans.empty:
+    st.stop()
+
+m1, m2, m3, m4 = st.columns(4)
+m1.metric("Spans", f"{len(spans):,}")
+m2.metric("Functions", f"{spans['name'].nunique():,}")
+m3.metric("Recorded Time", f"{spans.loc[spans['parent'].isna(), 'ms'].sum() / 1000:,.1f}s")
+m4.metric("Errors", f"{spans['error'].notna().sum():,}")
+
+# 3. Per-function latency
+st.subheader("Per-Function Latency")
+by_name = spans.groupby('name')['ms'].describe(percentiles=[0.5, 0.9, 0.99])
+by_name['total'] = spans.groupby('name')['ms'].sum()
+by_name['avg_rows'] = spans.groupby('name')['rows'].mean()
+by_name['errors'] = spans.groupby('name')['error'].count()
+by_name = by_name.sort_values('total', ascending=False)
+st.dataframe(
+    by_name[['count', 'total', 'mean', '50%', '90%', '99%', 'max', 'avg_rows', 'errors']],
+    column_config={
+        "count": st.column_config.NumberColumn("Calls", format="%d"),
+        "total": st.column_config.NumberColumn("Total ms", format="%.0f"),
+        "mean": st.column_config.NumberColumn("Mean ms", format="%.1f"),
+        "50%": st.column_config.NumberColumn("p50 ms", format="%.1f"),
+        "90%": st.column_config.NumberColumn("p90 ms", format="%.1f"),
+        "99%": st.column_config.NumberColumn("p99 ms", format="%.1f"),
+        "max": st.column_config.NumberColumn("Max ms", format="%.1f"),
+        "avg_rows": st.column_config.NumberColumn("Avg Rows", format="%.0f"),
+    },
+    use_container_width=True
+)
+
+selected = st.selectbox("Latency histogram for", by_name.index.tolist())
+fig = px.histogram(spans[spans['name'] == selected], x='ms', nbins=50, log_y=True, title=f"{selected} (ms)")
+st.plotly_chart(fig, use_container_width=True)
+
+# 4. Slowest calls
+st.subheader("Slowest Calls")
+st.dataframe(
+    spans.nlargest(25, 'ms')[['started_at', 'name', 'ms', 'rows', 'parent', 'error', 'thread', 'process']],
+    column_config={"ms": st.column_config.NumberColumn("ms", format="%.1f")},
+    hide_index=True,
+    use_container_width=True
+)
+
+# 5. Cache effectiveness
+st.subheader("Cache Effectiveness")
+cached = spans.dropna(subset=['cache_hits'])
+if cached.empty:
+    st.caption("No cache lookups in these spans.")
+else:
+    caches = cached.groupby('name')[['cache_hits', 'cache_misses']].sum()
+    caches['hit_rate'] = caches['cache_hits'] / (caches['cache_hits'] + caches['cache_misses']) * 100
+    st.dataframe(
+        caches,
+        column_config={"hit_rate": st.column_config.NumberColumn("Hit Rate", format="%.1f%%")},
+        use_container_width=True
+    )
+
+# Process-wide counters kept by utils/provider.py since startup
+stats = get_provider_stats()
+if stats:
+    st.caption("Provider calls since this process started")
+    st.dataframe(pd.DataFrame(stats).T, use_container_width=True)
@@ -13,6 +13,9 @@ pg = st.navigation([
     st.Page("pages/1_Portfolio.py", title="Portfolio Review", icon="💼"),
     st.Page("pages/2_Watchlist.py", title="Watchlist & Research", icon="🔍"),
     st.Page("pages/3_Compare.py", title="Compare Performance", icon="🚀"),
+    st.Page("pages/4_Dashboard.py", title="Deep Dive Dashboard", icon="🕵️"),
+    st.Page("pages/5_Screener.py", title="Screener", icon="🔎"),
+    st.Page("pages/6_Diagnostics.py", title="Diagnostics", icon="🩺"),
 ])
 
 pg.run()
@@ -0,0 +1,7 @@
+import os
+import sys
+import tempfile
+
+# Point the app at a throwaway data directory before any utils module is imported
+os.environ["STOCK_APP_DATA_DIR"] = tempfile.mkdtemp(prefix="stock_app_test_")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,20 @@
+import numpy as np
+from utils.backtest import evaluate
+
+def test_position_is_carried_through_missing_bars():
+    # Long from bar 0 to bar 4; bar 2's close is missing, so bars 2 and 3 have no return
+    returns = np.array([[np.nan], [0.01], [np.nan], [np.nan], [0.02], [0.01]])
+    carried = np.array([[1.0], [1.0], [1.0], [1.0], [0.0], [0.0]])
+    # A flat signal on the missing close
+    position = np.array([[1.0], [1.0], [0.0], [0.0], [0.0], [0.0]])
+
+    daily, stats = evaluate(carried, returns, cost_bps=10)
+    # Entry cost on bar 1, nothing on the missing bars, exit cost on bar 5
+    np.testing.assert_allclose(daily, [0.0, 0.01 - 0.001, 0.0, 0.0, 0.02, -0.001])
+    assert stats['trades'] == 1
+    np.testing.assert_allclose(stats['avg_trade'], (1 - 0.001 + 0.01) * 1.02 * (1 - 0.001) - 1, rtol=1e-3)
+
+    daily, stats = evaluate(position, returns, cost_bps=10)
+    # The exit waits for the next bar with a return instead of zeroing the missing bars
+    np.testing.assert_allclose(daily, [0.0, 0.01 - 0.001, 0.0, 0.0, -0.001, 0.0])
+    assert stats['trades'] == 1
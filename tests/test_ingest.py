@@ -0,0 +1,99 @@
+import io
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+import utils.data_handler as data_handler
+import utils.tradebook as tradebook
+
+ROWS = 40_000
+BLOCK_SIZE = 64 << 10 # Many small batches for a ~1 MB file
+
+def _holdings_csv():
+    rng = np.random.default_rng(0)
+    tickers = np.array([f"SYM{i}" for i in range(300)] + ["SGBAUG28V"])
+    frame = pd.DataFrame({
+        'Instrument': rng.choice(tickers, ROWS),
+        'Qty.': rng.integers(1, 100, ROWS),
+        'Avg. cost': rng.uniform(10, 5000, ROWS).round(2),
+    })
+    return frame, io.BytesIO(frame.to_csv(index=False).encode())
+
+def _tradebook_csv():
+    rng = np.random.default_rng(1)
+    frame = pd.DataFrame({
+        'symbol': rng.choice([f"SYM{i}" for i in range(50)], ROWS),
+        'trade_date': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 30, ROWS), unit='D'),
+        'trade_type': 'buy',
+        'quantity': rng.integers(1, 50, ROWS),
+        'price': rng.uniform(10, 500, ROWS).round(2),
+    })
+    frame['order_execution_time'] = frame['trade_date'] + pd.to_timedelta(rng.integers(0, 4, ROWS), unit='h')
+    frame['trade_date'] = frame['trade_date'].dt.strftime('%Y-%m-%d')
+    return frame, io.BytesIO(frame.to_csv(index=False).encode())
+
+@pytest.fixture
+def batch_sizes(monkeypatch):
+    """Record every Arrow batch read, and fail if anything concatenates them into the whole file"""
+    sizes = []
+    original = data_handler.iter_csv_batches
+
+    def tracking(*args, **kwargs):
+        for batch in original(*args, **kwargs):
+            sizes.append(batch.num_rows)
+            yield batch
+
+    def refuse(*args, **kwargs):
+        raise AssertionError("whole upload materialized")
+
+    monkeypatch.setattr(data_handler, 'iter_csv_batches', tracking)
+    monkeypatch.setattr(tradebook, 'iter_csv_batches', tracking)
+    monkeypatch.setattr(pa, 'concat_tables', refuse)
+    return sizes
+
+def test_holdings_ingest_streams_batches_and_aggregates_in_duckdb(batch_sizes):
+    frame, source = _holdings_csv()
+    stats = {}
+    holdings = data_handler.ingest_holdings_csv_to_duckdb(source, stats, block_size=BLOCK_SIZE)
+
+    # Many batches, none close to the whole file
+    assert len(batch_sizes) > 10
+    assert max(batch_sizes) < ROWS / 10
+    assert sum(batch_sizes) == stats['rows_read'] == ROWS
+
+    expected = frame.assign(cost=frame['Qty.'] * frame['Avg. cost']).groupby('Instrument').agg(
+        shares=('Qty.', 'sum'), cost=('cost', 'sum')
+    )
+    result = holdings.set_index('ticker').sort_index()
+    assert list(result.index) == list(expected.index)
+    np.testing.assert_allclose(result['shares'], expected['shares'])
+    np.testing.assert_allclose(result['buy_price'], expected['cost'] / expected['shares'])
+    assert result.loc['SGBAUG28V', 'asset_type'] == 'SGB'
+
+def test_tradebook_staging_streams_batches_and_merges_fills(batch_sizes):
+    frame, source = _tradebook_csv()
+    trades = tradebook.stage_tradebook_csv(source, block_size=BLOCK_SIZE)
+
+    assert len(batch_sizes) > 10
+    assert max(batch_sizes) < ROWS / 10
+    keys = ['symbol', 'trade_date', 'order_execution_time']
+    assert len(trades) == frame.groupby(keys).ngroups
+    assert trades['quantity'].sum() == frame['quantity'].sum()
+    np.testing.assert_allclose((trades['quantity'] * trades['price']).sum(), (frame['quantity'] * frame['price']).sum())
+
+def test_large_uploads_are_routed_through_duckdb(monkeypatch):
+    frame, source = _holdings_csv()
+    monkeypatch.setattr(data_handler, 'CSV_STAGE_BYTES', 1 << 10)
+    holdings = data_handler.parse_holdings_csv(source)
+    assert holdings.attrs['ingest_stats']['staged']
+    assert len(holdings) == frame['Instrument'].nunique()
+
+    frame, source = _tradebook_csv()
+    staged = []
+    original = tradebook.stage_tradebook_csv
+    monkeypatch.setattr(tradebook, 'CSV_STAGE_BYTES', 1 << 10)
+    monkeypatch.setattr(tradebook, 'stage_tradebook_csv', lambda *a, **k: staged.append(1) or original(*a, **k))
+    trades = tradebook.parse_tradebook_csv(source)
+    assert staged
+    assert trades['quantity'].sum() == frame['quantity'].sum()
+    assert pd.api.types.is_datetime64_any_dtype(trades['trade_date'])
@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+from utils import db, intraday
+
+def _bars(freq, periods=60):
+    ts = pd.date_range('2026-10-14 09:15', periods=periods, freq=freq)
+    return pd.DataFrame({'ticker': 'GEN.NS', 'ts': ts, 'open': 1.0, 'high': 2.0, 'low': 0.5,
+                         'close': np.arange(float(periods)), 'volume': 10.0})
+
+def test_every_stored_batch_bumps_the_generation():
+    db.init_db()
+    assert intraday.get_intraday_generation('GEN.NS') == 0
+    intraday.save_intraday_bars('5m', _bars('5min'))
+    first = intraday.get_intraday_generation('GEN.NS')
+    # 1m bars leave the hourly rollups (and so the coverage range) unchanged
+    coverage = intraday.get_intraday_coverage('GEN.NS')
+    intraday.save_intraday_bars('1m', _bars('1min'))
+    assert intraday.get_intraday_coverage('GEN.NS') == coverage
+    assert intraday.get_intraday_generation('GEN.NS') > first
+
+def test_partition_glob_is_bound(tmp_path, monkeypatch):
+    # A quote in the data path would break an interpolated glob
+    monkeypatch.setattr(intraday, 'INTRADAY_DIR', str(tmp_path / "o'brien"))
+    db.init_db()
+    intraday.save_intraday_bars('5m', _bars('5min', 30))
+    intraday.save_intraday_bars('5m', _bars('5min')) # Merged into the stored partition
+    assert len(intraday.get_bars(['GEN.NS'], '5m')) == 60
+    bars = intraday.get_bars(['GEN.NS'], '15m', start='2026-10-14 10:00', end='2026-10-14 11:00')
+    assert len(bars) == 5
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+import utils.memory as memory
+from utils.memory import budgeted_cache
+
+def _cached_frame(name):
+    calls = []
+
+    @budgeted_cache(name)
+    def load(key):
+        calls.append(key)
+        return pd.DataFrame({'close': [1.0, 2.0, 3.0]}), pd.Series([4.0, 5.0])
+    return load, calls
+
+def test_importing_memory_leaves_pandas_options_alone():
+    if int(pd.__version__.split('.')[0]) < 3:
+        assert pd.get_option("mode.copy_on_write") is False
+
+def test_cache_hits_cannot_change_the_cached_entry():
+    load, calls = _cached_frame("test.detach")
+    frame, series = load('a')
+    frame.loc[0, 'close'] = -1.0
+    frame['extra'] = 0
+    series.iloc[0] = -1.0
+
+    frame, series = load('a')
+    assert calls == ['a']
+    assert frame['close'].tolist() == [1.0, 2.0, 3.0]
+    assert list(frame.columns) == ['close']
+    assert series.tolist() == [4.0, 5.0]
+
+def test_hits_deep_copy_without_copy_on_write(monkeypatch):
+    monkeypatch.setattr(memory, '_copy_on_write', lambda: False)
+    load, _ = _cached_frame("test.detach_deep")
+    first, _ = load('a')
+    second, _ = load('a')
+    assert not np.shares_memory(first['close'].to_numpy(), second['close'].to_numpy())
+    second.loc[0, 'close'] = -1.0
+    assert load('a')[0]['close'].tolist() == [1.0, 2.0, 3.0]
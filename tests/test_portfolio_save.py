@@ -0,0 +1,36 @@
+import pandas as pd
+import pytest
+from utils import db
+
+HOLDINGS = pd.DataFrame({'ticker': ['AAA.NS'], 'shares': [10.0], 'buy_price': [100.0], 'asset_type': ['Equity']})
+LOTS = pd.DataFrame({'ticker': ['AAA.NS'], 'buy_date': pd.to_datetime(['2025-01-02']), 'quantity': [10.0], 'price': [100.0]})
+REALIZED = pd.DataFrame({
+    'ticker': ['BBB.NS'], 'buy_date': pd.to_datetime(['2025-01-02']), 'sell_date': pd.to_datetime(['2025-02-03']),
+    'quantity': [5.0], 'buy_price': [50.0], 'sell_price': [60.0], 'pnl': [50.0], 'holding_days': [32],
+})
+
+def _counts():
+    conn = db.get_connection()
+    try:
+        return {t: conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in ('holdings', 'open_lots', 'realized_trades')}
+    finally:
+        conn.close()
+
+@pytest.fixture(autouse=True)
+def schema():
+    db.init_db()
+
+def test_tradebook_save_is_all_or_nothing():
+    assert db.save_tradebook(HOLDINGS, LOTS, REALIZED)
+    assert _counts() == {'holdings': 1, 'open_lots': 1, 'realized_trades': 1}
+
+    # The realized insert fails after holdings and lots were replaced
+    broken = REALIZED.drop(columns=['holding_days'])
+    two_holdings = pd.concat([HOLDINGS, HOLDINGS.assign(ticker='CCC.NS')])
+    assert not db.save_tradebook(two_holdings, pd.concat([LOTS, LOTS]), broken)
+    assert _counts() == {'holdings': 1, 'open_lots': 1, 'realized_trades': 1}
+
+def test_holdings_snapshot_supersedes_the_tradebook():
+    assert db.save_tradebook(HOLDINGS, LOTS, REALIZED)
+    assert db.save_portfolio_db(HOLDINGS.assign(shares=20.0))
+    assert _counts() == {'holdings': 1, 'open_lots': 0, 'realized_trades': 0}
@@ -0,0 +1,23 @@
+from utils.quote_cache import QuoteCache
+
+QUOTE = {"price": 100.0, "change": 1.0, "pct": 1.0}
+
+def test_invalidate_drops_only_the_given_symbols(tmp_path):
+    path = str(tmp_path / "quotes.sqlite")
+    session, other_worker = QuoteCache(path), QuoteCache(path)
+    session.put_many({"A.NS": QUOTE, "B.NS": QUOTE})
+
+    session.invalidate(["A.NS"])
+    hits, missing = session.get_many(["A.NS", "B.NS"])
+    assert missing == ["A.NS"] and hits == {"B.NS": QUOTE}
+    # The shared tier keeps other symbols for other workers
+    hits, missing = other_worker.get_many(["A.NS", "B.NS"])
+    assert missing == ["A.NS"] and hits == {"B.NS": QUOTE}
+
+def test_clear_wipes_both_tiers(tmp_path):
+    path = str(tmp_path / "quotes.sqlite")
+    cache = QuoteCache(path)
+    cache.put_many({"A.NS": QUOTE})
+    cache.clear()
+    assert cache.get_many(["A.NS"]) == ({}, ["A.NS"])
+    assert QuoteCache(path).get_many(["A.NS"]) == ({}, ["A.NS"])
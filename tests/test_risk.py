@@ -0,0 +1,32 @@
+import threading
+import numpy as np
+from utils.risk import RollingCovariance
+
+def _engine(bars=30):
+    rng = np.random.default_rng(0)
+    engine = RollingCovariance(['A', 'B', 'C'], window=20)
+    for day in range(bars):
+        engine.push(day, rng.normal(0, 0.01, 3))
+    return engine
+
+def test_snapshot_is_consistent_and_detached():
+    engine = _engine()
+    returns, cov, mean, as_of = engine.snapshot()
+    np.testing.assert_allclose(cov, np.cov(returns.to_numpy(), rowvar=False))
+    np.testing.assert_allclose(mean, returns.mean().to_numpy())
+    assert as_of == returns.index[-1]
+
+    engine.push(99, np.array([0.5, -0.5, 0.2]))
+    # A later push does not reach an earlier snapshot
+    np.testing.assert_allclose(mean, returns.mean().to_numpy())
+    assert 99 not in returns.index
+
+def test_snapshot_waits_for_the_engine_lock():
+    engine = _engine()
+    taken = threading.Event()
+    with engine.lock:
+        reader = threading.Thread(target=lambda: (engine.snapshot(), taken.set()))
+        reader.start()
+        assert not taken.wait(0.2)
+    reader.join(5)
+    assert taken.is_set()
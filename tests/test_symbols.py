@@ -0,0 +1,29 @@
+import pandas as pd
+import pytest
+from utils import db, symbols
+
+MASTER = pd.DataFrame({'symbol': ['TATA.BO'], 'base': ['TATA'], 'exchange': ['BSE'],
+                       'company_name': [''], 'industry': [''], 'isin': ['']})
+
+@pytest.fixture(autouse=True)
+def fresh_map():
+    symbols.invalidate_symbol_map()
+    yield
+    symbols.invalidate_symbol_map()
+
+def test_failed_master_read_is_not_cached(monkeypatch):
+    reads = iter([None, MASTER])
+    monkeypatch.setattr(db, 'get_symbol_master', lambda: next(reads))
+    # Heuristic while the master can't be read, the master once it can
+    assert symbols.resolve_symbol('TATA') == 'TATA.NS'
+    assert symbols.resolve_symbol('TATA') == 'TATA.BO'
+
+def test_connection_error_keeps_the_last_good_map(monkeypatch):
+    monkeypatch.setattr(db, 'get_symbol_master', lambda: MASTER)
+    assert symbols.resolve_symbol('TATA') == 'TATA.BO'
+
+    def unavailable():
+        raise RuntimeError("database is locked")
+    monkeypatch.setattr(db, 'get_symbol_master', unavailable)
+    monkeypatch.setattr(symbols, 'SYMBOL_MAP_TTL_SECONDS', 0)
+    assert symbols.resolve_symbol('TATA') == 'TATA.BO'
@@ -0,0 +1,187 @@
+import threading
+import time
+from collections import deque
+import pandas as pd
+from utils.constants import ALERT_RELOAD_SECONDS, ALERT_RECENT_ENTRIES
+from utils.db import get_alert_rules, log_alerts, get_recent_bars, screen_latest_snapshot
+from utils.symbols import resolve_symbols
+
+# Alert rules fire when a metric crosses a reference between two
+# observations: a live quote against its previous close, or the last two
+# stored bars after a batch run. Rules are held in memory indexed by ticker,
+# so an update only touches the rules of the symbols whose price moved. The
+# alert_log primary key (rule_id, trigger_date) makes firing idempotent
+# across processes; each process also remembers what it has logged today.
+
+METRICS = ('close', 'rsi')
+REFERENCES = ('level', 'supertrend', 'ma50', 'ma200')
+DIRECTIONS = ('above', 'below', 'either')
+
+# label -> (metric, reference); the Watchlist page offers these
+RULE_PRESETS = {
+    "Close crosses SuperTrend": ('close', 'supertrend'),
+    "Close crosses MA200": ('close', 'ma200'),
+    "Close crosses MA50": ('close', 'ma50'),
+    "Close crosses a price": ('close', 'level'),
+    "RSI crosses a level": ('rsi', 'level'),
+}
+
+def crossing(prev, curr, prev_ref, curr_ref):
+    """'above' / 'below' when curr moved across the reference since prev, else None"""
+    if any(pd.isna(v) for v in (prev, curr, prev_ref, curr_ref)):
+        return None
+    if prev <= prev_ref and curr > curr_ref:
+        return 'above'
+    if prev >= prev_ref and curr < curr_ref:
+        return 'below'
+    return None
+
+def describe_rule(rule):
+    metric = 'RSI' if rule['metric'] == 'rsi' else 'Close'
+    reference = f"{rule['level']:g}" if rule['reference'] == 'level' else rule['reference'].upper()
+    verb = {'above': 'crosses above', 'below': 'crosses below'}.get(rule['direction'], 'crosses')
+    return f"{rule['ticker']} {metric} {verb} {reference}"
+
+class AlertEngine:
+    """Per-process rule index and evaluator"""
+
+    def __init__(self):
+        self._rules = {}  # ticker -> list of rule dicts
+        self._levels = {}  # ticker -> last stored bar (close, rsi, ma50, ma200, supertrend)
+        self._last_price = {}  # ticker -> last live price evaluated
+        self._logged = set()  # (rule_id, trigger_date) fired by this process
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        self.recent = deque(maxlen=ALERT_RECENT_ENTRIES)
+
+    def invalidate(self):
+        """Re-read rules on the next evaluation (after rules are added or removed)"""
+        self._loaded_at = 0.0
+
+    def _ensure_loaded(self):
+        if time.time() - self._loaded_at < ALERT_RELOAD_SECONDS:
+            return
+        rules = get_alert_rules()
+        by_ticker = {}
+        for rule in rules.to_dict('records'):
+            by_ticker.setdefault(rule['ticker'], []).append(rule)
+        levels = screen_latest_snapshot(symbols=list(by_ticker)) if by_ticker else pd.DataFrame()
+        self._rules = by_ticker
+        self._levels = {row['ticker']: row for row in levels.to_dict('records')}
+        self._last_price = {t: p for t, p in self._last_price.items() if t in by_ticker}
+        today = pd.Timestamp.today().date()
+        self._logged = {key for key in self._logged if key[1] >= today}
+        self._loaded_at = time.time()
+
+    @property
+    def rule_count(self):
+        return sum(len(rules) for rules in self._rules.values())
+
+    def tickers(self):
+        """Tickers with at least one rule"""
+        with self._lock:
+            self._ensure_loaded()
+            return list(self._rules)
+
+    def _fire(self, rule, trigger_date, side, value, reference_value, source):
+        if rule['direction'] not in (side, 'either') or (rule['id'], trigger_date) in self._logged:
+            return None
+        return {
+            'rule_id': rule['id'], 'ticker': rule['ticker'], 'trigger_date': trigger_date,
+            'direction': side, 'value': value, 'reference_value': reference_value,
+            'message': f"{describe_rule(rule)} ({side}: {value:,.2f} vs {reference_value:,.2f})",
+            'source': source,
+        }
+
+    def evaluate_quotes(self, quotes, today=None):
+        """
+        Check close rules against live quotes (symbol -> {price, change, pct}).
+
+        Only symbols with rules whose price changed since the last call are
+        evaluated; the stored bar supplies indicator references. RSI rules
+        need a full bar and are left to evaluate_bars(). Returns alerts logged.
+        """
+        today = today or pd.Timestamp.today().date()
+        fired = []
+        with self._lock:
+            self._ensure_loaded()
+            for symbol, quote in quotes.items():
+                rules = self._rules.get(symbol)
+                if not rules or not quote or self._last_price.get(symbol) == quote['price']:
+                    continue
+                self._last_price[symbol] = quote['price']
+                price, prev_close = quote['price'], quote['price'] - quote['change']
+                bar = self._levels.get(symbol, {})
+                for rule in rules:
+                    if rule['metric'] != 'close':
+                        continue
+                    reference = rule['level'] if rule['reference'] == 'level' else bar.get(rule['reference'])
+                    side = crossing(prev_close, price, reference, reference)
+                    alert = side and self._fire(rule, today, side, price, reference, 'quote')
+                    if alert:
+                        fired.append(alert)
+            return self._log(fired)
+
+    def evaluate_bars(self, bars):
+        """Check every rule on the tickers in bars (get_recent_bars() output: last two per ticker)"""
+        fired = []
+        with self._lock:
+            self._ensure_loaded()
+            for symbol, frame in bars.groupby('ticker', sort=False):
+                rules = self._rules.get(symbol)
+                if not rules or len(frame) < 2:
+                    continue
+                prev, curr = frame.iloc[-2], frame.iloc[-1]
+                self._levels[symbol] = curr.to_dict()
+                trigger_date = pd.Timestamp(curr['date']).date()
+                for rule in rules:
+                    metric = rule['metric']
+                    if rule['reference'] == 'level':
+                        prev_ref = curr_ref = rule['level']
+                    else:
+                        prev_ref, curr_ref = prev[rule['reference']], curr[rule['reference']]
+                    side = crossing(prev[metric], curr[metric], prev_ref, curr_ref)
+                    alert = side and self._fire(rule, trigger_date, side, curr[metric], curr_ref, 'batch')
+                    if alert:
+                        fired.append(alert)
+            return self._log(fired)
+
+    def _log(self, fired):
+        if not fired:
+            return []
+        logged = log_alerts(pd.DataFrame(fired))
+        self._logged.update((alert['rule_id'], alert['trigger_date']) for alert in fired)
+        new = logged.to_dict('records') if not logged.empty else []
+        self.recent.extendleft(new)
+        return new
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_alert_engine():
+    """Process-wide AlertEngine"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = AlertEngine()
+    return _engine
+
+def evaluate_quote_alerts(quotes):
+    """Evaluate rules for freshly fetched quotes; never raises into the quote path"""
+    try:
+        return get_alert_engine().evaluate_quotes({sym: q for sym, q in quotes.items() if q})
+    except Exception as e:
+        print(f"Error evaluating quote alerts: {e}")
+        return []
+
+def evaluate_stored_alerts(tickers=None):
+    """Evaluate rules against the last two stored bars of tickers (every ruled ticker by default)"""
+    engine = get_alert_engine()
+    ruled = engine.tickers()
+    if tickers is not None:
+        wanted = set(resolve_symbols(list(tickers)))
+        ruled = [t for t in ruled if t in wanted]
+    if not ruled:
+        return []
+    return engine.evaluate_bars(get_recent_bars(ruled, 2))
@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+from utils.constants import RISK_FREE_RATE, TRADING_DAYS_PER_YEAR
+
+def daily_returns(close_df):
+    """Simple daily returns of a close-price matrix (no filling across gaps)"""
+    return close_df.pct_change(fill_method=None)
+
+def compute_metrics(close_df, benchmark=None, risk_free_rate=RISK_FREE_RATE):
+    """Per-ticker performance metrics over a close matrix (date x ticker) in one pass.
+
+    Returns a DataFrame indexed by ticker with total_return, cagr, volatility,
+    max_drawdown, sharpe and, when a benchmark close series is given, beta and
+    correlation to it. Ratios are fractions (0.12 == 12%).
+    """
+    if close_df is None or close_df.empty:
+        return pd.DataFrame()
+
+    close_df = close_df.sort_index()
+    returns = daily_returns(close_df)
+
+    # First / last valid price and the span between them, per column
+    first_price = close_df.bfill().iloc[0]
+    last_price = close_df.ffill().iloc[-1]
+    valid = close_df.notna().to_numpy()
+    dates = close_df.index.to_numpy()
+    first_idx = valid.argmax(axis=0)
+    last_idx = len(valid) - 1 - valid[::-1].argmax(axis=0)
+    years = pd.Series(
+        (dates[last_idx] - dates[first_idx]) / np.timedelta64(1, 'D') / 365.25,
+        index=close_df.columns
+    )
+
+    total_return = last_price / first_price - 1
+    cagr = (last_price / first_price) ** (1 / years.where(years > 0)) - 1
+
+    volatility = returns.std() * np.sqrt(TRADING_DAYS_PER_YEAR)
+    annual_return = returns.mean() * TRADING_DAYS_PER_YEAR
+    sharpe = (annual_return - risk_free_rate) / volatility.replace(0, np.nan)
+
+    max_drawdown = (close_df / close_df.cummax() - 1).min()
+
+    metrics = pd.DataFrame({
+        'total_return': total_return,
+        'cagr': cagr,
+        'volatility': volatility,
+        'max_drawdown': max_drawdown,
+        'sharpe': sharpe,
+    })
+
+    if benchmark is not None and not benchmark.empty:
+        bench_returns = daily_returns(benchmark.sort_index()).reindex(returns.index)
+        metrics['beta'], metrics['correlation'] = _beta_and_correlation(returns, bench_returns)
+
+    metrics.index.name = 'ticker'
+    return metrics
+
+def _beta_and_correlation(returns, bench_returns):
+    """Beta and correlation of every column against a benchmark, on shared dates"""
+    R = returns.to_numpy()
+    b = bench_returns.to_numpy()[:, None]
+    mask = ~np.isnan(R) & ~np.isnan(b)
+
+    n = mask.sum(axis=0)
+    Rm = np.where(mask, R, 0.0)
+    bm = np.where(mask, b, 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_r = Rm.sum(axis=0) / n
+        mean_b = bm.sum(axis=0) / n
+        dr = np.where(mask, R - mean_r, 0.0)
+        db = np.where(mask, b - mean_b, 0.0)
+        cov = (dr * db).sum(axis=0) / (n - 1)
+        var_r = (dr ** 2).sum(axis=0) / (n - 1)
+        var_b = (db ** 2).sum(axis=0) / (n - 1)
+        beta = cov / var_b
+        corr = cov / np.sqrt(var_r * var_b)
+
+    return (
+        pd.Series(beta, index=returns.columns),
+        pd.Series(corr, index=returns.columns),
+    )
+
+def correlation_matrix(close_df, min_periods=20):
+    """Pairwise correlation of daily returns"""
+    if close_df is None or close_df.empty:
+        return pd.DataFrame()
+    return daily_returns(close_df.sort_index()).corr(min_periods=min_periods)
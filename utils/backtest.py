@@ -0,0 +1,160 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from utils.analytics import compute_metrics
+from utils.constants import BACKTEST_COST_BPS
+from utils.db import get_history_frame, get_history_tickers
+from utils.indicators import supertrend_matrix, rolling_mean_matrix
+
+# Signals are evaluated on a wide (dates x tickers) panel of adjusted bars,
+# so one parameter set costs a single pass over the dates however many
+# tickers there are. Positions are decided on a bar's close and earn the next
+# bar's return; every change of position pays cost_bps.
+
+SUPERTREND_PERIODS = [7, 10, 14, 20, 30]
+SUPERTREND_MULTIPLIERS = [1.5, 2, 2.5, 3, 3.5, 4]
+RSI_PERIODS = [7, 14, 21]
+RSI_LOWER = [20, 25, 30, 35, 40] # Buy when RSI falls below
+RSI_UPPER = [60, 65, 70, 75, 80] # Sell when RSI rises above
+
+def default_grid():
+    """Every SuperTrend (period, multiplier) and RSI (period, lower, upper) combination"""
+    grid = [
+        {'strategy': 'supertrend', 'period': p, 'multiplier': m}
+        for p in SUPERTREND_PERIODS for m in SUPERTREND_MULTIPLIERS
+    ]
+    grid += [
+        {'strategy': 'rsi', 'period': p, 'lower': lo, 'upper': hi}
+        for p in RSI_PERIODS for lo in RSI_LOWER for hi in RSI_UPPER
+    ]
+    return grid
+
+def param_label(params):
+    if params['strategy'] == 'supertrend':
+        return f"supertrend({params['period']},{params['multiplier']:g})"
+    return f"rsi({params['period']},{params['lower']:g}/{params['upper']:g})"
+
+def load_panel(tickers=None, start=None):
+    """Adjusted high / low / close as aligned (dates x tickers) frames"""
+    frame = get_history_frame(tickers if tickers is not None else get_history_tickers(), start)
+    if frame.empty:
+        return {}
+    return {
+        column: frame.pivot(index='date', columns='ticker', values=column).sort_index()
+        for column in ('high', 'low', 'close')
+    }
+
+def rsi_matrix(close, period=14):
+    """RSI (simple-average form, as in calculate_rsi_series) down the rows of a 2-D array"""
+    delta = np.diff(close, axis=0, prepend=np.nan)
+    gain = rolling_mean_matrix(np.where(delta > 0, delta, np.where(np.isnan(delta), np.nan, 0.0)), period)
+    loss = rolling_mean_matrix(np.where(delta < 0, -delta, np.where(np.isnan(delta), np.nan, 0.0)), period)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = gain / np.where(loss == 0, np.nan, loss)
+    return 100 - 100 / (1 + rs)
+
+def positions(panel, params):
+    """Long (1) / flat (0) position held after each bar's close"""
+    if params['strategy'] == 'supertrend':
+        _, bullish = supertrend_matrix(panel['high'], panel['low'], panel['close'], params['period'], params['multiplier'])
+        return bullish.astype(float)
+
+    # Enter when oversold, hold until overbought
+    rsi = rsi_matrix(panel['close'], params['period'])
+    signal = np.full(rsi.shape, np.nan)
+    signal[rsi < params['lower']] = 1.0
+    signal[rsi > params['upper']] = 0.0
+    return pd.DataFrame(signal).ffill().fillna(0.0).to_numpy()
+
+def evaluate(position, returns, cost_bps=BACKTEST_COST_BPS):
+    """
+    Apply positions to next-bar returns.
+
+    Returns:
+        tuple: (portfolio daily returns, trade stats dict). The portfolio is an
+        equal-weight sleeve per ticker, over the tickers trading that day.
+        Positions are carried through bars with a NaN return.
+    """
+    rows, cols = returns.shape
+    valid = ~np.isnan(returns)
+    zeros = np.zeros((1, cols))
+    # A bar without a return (missing close, or the bar after one) keeps the
+    # previous position: it earns nothing, trades nothing and does not split a trade
+    held = np.where(valid, np.vstack([zeros, position[:-1]]), np.nan)
+    held = pd.DataFrame(held).ffill().fillna(0.0).to_numpy()
+    turnover = np.abs(np.diff(np.vstack([zeros, held]), axis=0))
+    strategy = held * np.where(valid, returns, 0.0) - turnover * cost_bps / 10_000
+
+    portfolio = strategy.sum(axis=1) / np.maximum(valid.sum(axis=1), 1)
+
+    # Trades: runs of held == 1, including the exit cost on the bar after
+    log_equity = np.vstack([zeros, np.cumsum(np.log1p(strategy), axis=0)])
+    change = np.diff(np.vstack([zeros, held, zeros]), axis=0)
+    start_cols, start_rows = np.nonzero(change.T == 1)
+    _, end_rows = np.nonzero(change.T == -1)
+    trade_returns = np.expm1(
+        log_equity[np.minimum(end_rows + 1, rows), start_cols] - log_equity[start_rows, start_cols]
+    )
+
+    stats = {
+        'trades': len(trade_returns),
+        'hit_rate': (trade_returns > 0).mean() if len(trade_returns) else np.nan,
+        'avg_trade': trade_returns.mean() if len(trade_returns) else np.nan,
+        'exposure': held[valid].mean() if valid.any() else np.nan,
+    }
+    return portfolio, stats
+
+# Worker state: the panel is sent once per process, not once per task
+_worker_panel = None
+
+def _init_worker(panel):
+    global _worker_panel
+    _worker_panel = panel
+
+def _run_one(params):
+    returns = _worker_panel['returns']
+    daily, stats = evaluate(positions(_worker_panel, params), returns, _worker_panel['cost_bps'])
+    return params, daily, stats
+
+def run_sweep(panel, grid=None, workers=None, cost_bps=BACKTEST_COST_BPS):
+    """
+    Backtest every parameter set in grid over the panel from load_panel().
+
+    Args:
+        workers (int, optional): Processes to spread the grid over (CPU count
+            by default; 1 runs in this process).
+
+    Returns:
+        tuple: (results DataFrame indexed by parameter label with
+        total_return, cagr, volatility, max_drawdown, sharpe, trades,
+        hit_rate, avg_trade and exposure; equity curves, dates x label)
+    """
+    grid = grid or default_grid()
+    close = panel['close']
+    arrays = {
+        'high': panel['high'].to_numpy(float),
+        'low': panel['low'].to_numpy(float),
+        'close': close.to_numpy(float),
+        'returns': close.pct_change(fill_method=None).to_numpy(float),
+        'cost_bps': cost_bps,
+    }
+
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1:
+        _init_worker(arrays)
+        outcomes = [_run_one(params) for params in grid]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(arrays,)) as pool:
+            outcomes = list(pool.map(_run_one, grid, chunksize=max(1, len(grid) // (workers * 4))))
+
+    labels = [param_label(params) for params, _, _ in outcomes]
+    equity = pd.DataFrame(
+        np.cumprod(1 + np.column_stack([daily for _, daily, _ in outcomes]), axis=0),
+        index=close.index, columns=labels
+    )
+    results = compute_metrics(equity).join(
+        pd.DataFrame([stats for _, _, stats in outcomes], index=labels)
+    )
+    results.index.name = 'params'
+    return results, equity
@@ -0,0 +1,145 @@
+import numpy as np
+import pandas as pd
+from utils.constants import CHART_MAX_POINTS, CHART_MAX_CANDLES, CHART_WEBGL_THRESHOLD
+from utils.tracing import traced
+
+# Chart data layer: every series is reduced to roughly the number of points
+# the chart can actually show before it is handed to Plotly. Lines use
+# Largest-Triangle-Three-Buckets (keeps the visual shape, peaks included);
+# candles are re-bucketed so each bucket keeps its open, high, low and close.
+
+def _as_float(x):
+    """Numeric view of an x axis (datetimes as int64 nanoseconds)"""
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype('datetime64[ns]').astype(np.int64).astype(float)
+    return x.astype(float)
+
+def lttb_indices(x, y, threshold):
+    """Indices of the points Largest-Triangle-Three-Buckets keeps (first and last always kept)"""
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = _as_float(x)
+    y = np.asarray(y, dtype=float)
+
+    # Bucket edges for the n - 2 interior points
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    keep = np.empty(threshold, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Average of the next bucket (or the last point) is the third vertex
+        nlo, nhi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[nlo:nhi].mean()
+        avg_y = y[nlo:nhi].mean()
+
+        area = np.abs(
+            (x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a])
+        )
+        a = lo + int(area.argmax())
+        keep[i + 1] = a
+
+    return keep
+
+def downsample_series(x, y, threshold=CHART_MAX_POINTS):
+    """LTTB-reduce one line series; gaps (NaN) are dropped first"""
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=float)
+    valid = ~np.isnan(y)
+    x, y = x[valid], y[valid]
+    idx = lttb_indices(x, y, threshold)
+    return x[idx], y[idx]
+
+def downsample_ohlc(df, threshold=CHART_MAX_CANDLES, date_col='date',
+                    columns=('open', 'high', 'low', 'close', 'volume')):
+    """Merge consecutive bars into at most threshold candles (first open, max high, min low, last close, summed volume)"""
+    n = len(df)
+    if n <= threshold:
+        return df
+
+    o, h, l, c, v = columns
+    starts = np.linspace(0, n, threshold, endpoint=False).astype(int)
+    ends = np.append(starts[1:], n) - 1
+    dates = df[date_col].to_numpy() if date_col in df else df.index.to_numpy()
+
+    out = pd.DataFrame({
+        o: df[o].to_numpy()[starts],
+        h: np.maximum.reduceat(df[h].to_numpy(dtype=float), starts),
+        l: np.minimum.reduceat(df[l].to_numpy(dtype=float), starts),
+        c: df[c].to_numpy()[ends],
+        v: np.add.reduceat(np.nan_to_num(df[v].to_numpy(dtype=float)), starts),
+    })
+    if date_col in df:
+        out.insert(0, date_col, dates[starts])
+    else:
+        out.index = pd.Index(dates[starts], name=df.index.name)
+    return out
+
+def line_trace(x, y, threshold=CHART_MAX_POINTS, **kwargs):
+    """Downsampled line trace; WebGL (Scattergl) once the point count is large"""
+    import plotly.graph_objects as go # Deferred: only chart renders need plotly
+    x, y = downsample_series(x, y, threshold)
+    trace = go.Scattergl if len(y) > CHART_WEBGL_THRESHOLD else go.Scatter
+    return trace(x=x, y=y, mode='lines', **kwargs)
+
+@traced
+def build_dashboard_figure(df, ticker):
+    """Price / volume / RSI figure for one ticker's bars, as a plain dict.
+
+    Depends only on its inputs, so callers can cache the result keyed on
+    (ticker, data generation, window). View options are applied afterwards
+    with apply_view_options and never require rebuilding the traces.
+    Returns (figure_dict, candle_count, bar_count).
+    """
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+    candles = downsample_ohlc(df, CHART_MAX_CANDLES)
+    dates = df['date'].to_numpy()
+    candle_dates = candles['date'].to_numpy()
+
+    # Row 1 = Price, Row 2 = Volume, Row 3 = RSI
+    fig = make_subplots(
+        rows=3, cols=1,
+        shared_xaxes=True,
+        vertical_spacing=0.05,
+        row_heights=[0.6, 0.2, 0.2],
+        subplot_titles=(f"{ticker} Price Action", "Volume", "RSI")
+    )
+
+    fig.add_trace(go.Candlestick(
+        x=candle_dates,
+        open=candles['open'].to_numpy(), high=candles['high'].to_numpy(),
+        low=candles['low'].to_numpy(), close=candles['close'].to_numpy(),
+        name='OHLC'
+    ), row=1, col=1)
+
+    fig.add_trace(line_trace(dates, df['ma50'], line=dict(color='orange', width=1), name='MA 50'), row=1, col=1)
+    fig.add_trace(line_trace(dates, df['ma200'], line=dict(color='blue', width=2), name='MA 200'), row=1, col=1)
+    fig.add_trace(line_trace(dates, df['supertrend'], line=dict(color='purple', dash='dot', width=2), name='SuperTrend'), row=1, col=1)
+
+    colors = np.where(candles['open'].to_numpy() > candles['close'].to_numpy(), 'red', 'green')
+    fig.add_trace(go.Bar(x=candle_dates, y=candles['volume'].to_numpy(), marker_color=colors, name='Volume'), row=2, col=1)
+
+    fig.add_trace(line_trace(dates, df['rsi'], line=dict(color='purple', width=2), name='RSI'), row=3, col=1)
+    fig.add_hline(y=70, line_dash="dash", line_color="red", row=3, col=1)
+    fig.add_hline(y=30, line_dash="dash", line_color="green", row=3, col=1)
+
+    fig.update_layout(height=800, xaxis_rangeslider_visible=False, margin=dict(l=20, r=20, t=40, b=20))
+    return fig.to_dict(), len(candles), len(df)
+
+def apply_view_options(figure, log_scale=False):
+    """Figure for a cached figure dict with view options patched into a shallow copy of its layout.
+
+    The dict was validated when it was built, so it is wrapped without
+    validating again (a validated rebuild costs about ten times the render).
+    The cached dict itself is never modified.
+    """
+    import plotly.graph_objects as go
+    layout = figure['layout']
+    if log_scale:
+        layout = {**layout, 'yaxis': {**layout.get('yaxis', {}), 'type': 'log'}} # Row 1 (price) axis
+    return go.Figure({**figure, 'layout': layout}, _validate=False)
@@ -2,9 +2,13 @@ import os
 
 # Paths
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DATA_DIR = os.path.join(BASE_DIR, "data")
+DATA_DIR = os.environ.get("STOCK_APP_DATA_DIR", os.path.join(BASE_DIR, "data")) # Overridable so load tests use a copy
+REPLAY_DIR = os.environ.get("STOCK_APP_REPLAY_DIR") # Serve provider calls from recorded files (see load_test.py)
+DB_READ_ONLY = os.environ.get("STOCK_APP_DB_READ_ONLY") == "1" # Open the DuckDB file read-only (set by api_server.py)
 PORTFOLIO_FILE = os.path.join(DATA_DIR, "portfolio.json")
 WATCHLIST_FILE = os.path.join(DATA_DIR, "watchlist.json")
+QUOTE_CACHE_FILE = os.path.join(DATA_DIR, "quote_cache.sqlite")
+LOTTIE_CACHE_FILE = os.path.join(DATA_DIR, "lottie_stock.json") # Home page animation, downloaded once
 
 # Ensure data directory exists
 os.makedirs(DATA_DIR, exist_ok=True)
@@ -28,6 +32,8 @@ NSE_INDICES_URLS = {
     ]
 }
 
+INDEX_REFRESH_SECONDS = 3600 # Re-check NSE index lists (conditionally) after this
+
 # SGB HANDLING
 GOLD_PROXY = "GC=F"
 USD_INR_TICKER = "INR=X"
@@ -52,3 +58,63 @@ GLOBAL_INDICES = {
 
 # CONSTANTS
 TROY_OZ_TO_GRAMS = 31.1035
+TRADING_DAYS_PER_YEAR = 252
+RISK_FREE_RATE = 0.065 # Annual, used for Sharpe ratios
+BENCHMARK_TICKER = "^NSEI" # NIFTY 50, used for beta
+
+# QUOTE CACHE
+QUOTE_TTL_SECONDS = 60 # Fresh quote lifetime (shared across workers)
+QUOTE_MISS_TTL_SECONDS = 30 # Negative cache for symbols the provider did not return
+QUOTE_MEMORY_ENTRIES = 2048 # In-process LRU size
+QUOTE_BATCH_WINDOW_SECONDS = 0.05 # Single-ticker lookups within this window share one download
+QUOTE_BATCH_MAX_SYMBOLS = 200 # Flush a batch early once it reaches this size
+QUOTE_BATCH_TIMEOUT_SECONDS = 30 # Give up waiting on a batched lookup after this
+QUOTE_POLL_INTERVAL_SECONDS = 15 # Background poller refresh period
+
+# SYMBOL MASTER
+SYMBOL_MAP_TTL_SECONDS = 3600 # Reload the in-process raw -> canonical map after this
+
+# HISTORY STORE
+HISTORY_RECHECK_SECONDS = 900 # Ask the provider about a symbol's history at most this often per process
+
+# CSV INGESTION
+CSV_BLOCK_SIZE = 4 << 20 # Bytes per Arrow CSV read block (one chunk in memory at a time)
+CSV_STAGE_BYTES = 64 << 20 # Uploads at least this large are staged in DuckDB and aggregated there
+
+# CHARTS
+CHART_MAX_POINTS = 1500 # Line points per trace (about one per horizontal pixel)
+CHART_MAX_CANDLES = 400 # Candles per chart before bars are merged
+CHART_WEBGL_THRESHOLD = 1000 # Line traces larger than this render with Scattergl
+FIGURE_CACHE_ENTRIES = 32 # Serialized dashboard figures kept per process
+DATA_VIEW_PAGE_SIZE = 50 # Rows per page in the Data View tables
+
+# INTRADAY STORE
+INTRADAY_DIR = os.path.join(DATA_DIR, "intraday") # Hive-partitioned Parquet: interval=<i>/date=<d>/
+INTRADAY_RETENTION_DAYS = {'1m': 30, '5m': 365} # Base-interval partitions older than this are deleted
+INTRADAY_FETCH_PERIODS = {'1m': '7d', '5m': '60d'} # Longest history Yahoo serves per interval
+
+# BACKTESTS
+BACKTEST_COST_BPS = 10 # Charged on every position change (per side)
+
+# RISK
+RISK_WINDOW_DAYS = 252 # Trailing daily returns in the covariance window
+RISK_REBUILD_BARS = 63 # Re-estimate a covariance engine from scratch after this many incremental bars
+RISK_ENGINES = 16 # Covariance engines (one per set of holdings) kept per process
+RISK_ROLLING_VOL_DAYS = 21 # Window of the rolling portfolio volatility chart
+
+# ALERTS
+ALERT_RELOAD_SECONDS = 60 # Re-read rules and stored indicator levels at most this often per process
+ALERT_RECENT_ENTRIES = 50 # Fired alerts kept in memory for the Home page
+
+# TRACING
+TRACE_ENABLED = os.environ.get("STOCK_APP_TRACE", "1") != "0" # STOCK_APP_TRACE=0 turns span recording off
+TRACE_BUFFER_SPANS = 5000 # Most recent spans kept in memory per process
+
+# DATA API
+API_PORT = 8765 # api_server.py default port (bound to localhost)
+API_MAX_CONNECTIONS = 8 # Concurrent read-only queries; further requests wait for a slot
+API_BATCH_ROWS = 65536 # Rows per Arrow record batch in streamed responses
+
+# MEMORY
+COMPACT_FRAMES = os.environ.get("STOCK_APP_COMPACT") == "1" # float32 prices/indicators and categorical tickers in history frames
+FRAME_CACHE_BUDGET_MB = int(os.environ.get("STOCK_APP_CACHE_BUDGET_MB", "256")) # Shared by every budgeted cache in a process
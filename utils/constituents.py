@@ -0,0 +1,135 @@
+import threading
+import pandas as pd
+from datetime import datetime, timedelta
+from io import StringIO
+from utils.constants import NSE_INDICES_URLS, INDEX_REFRESH_SECONDS
+from utils import provider
+from utils.db import (
+    get_index_members, get_index_source, save_index_source, save_index_members, upsert_symbols
+)
+
+# Index constituents are served from DuckDB. The NSE archive is only asked
+# for changes (If-None-Match / If-Modified-Since), in the background once the
+# stored list is older than INDEX_REFRESH_SECONDS.
+
+HEADERS = {
+    # Generic headers to avoid blocking
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+def parse_constituents_csv(text):
+    """Normalize an NSE index CSV to symbol, company_name, industry, isin"""
+    df = pd.read_csv(StringIO(text))
+
+    def column(keyword):
+        col = next((c for c in df.columns if keyword in c.lower()), None)
+        return df[col] if col else None
+
+    symbol = column('symbol')
+    if symbol is None:
+        return pd.DataFrame()
+
+    members = pd.DataFrame({
+        'symbol': symbol.astype(str).str.strip().str.upper(),
+        'company_name': column('company'),
+        'industry': column('industry'),
+        'isin': column('isin'),
+    })
+    return members[symbol.notna()].reset_index(drop=True)
+
+def refresh_index(index_name, timeout=10):
+    """Conditionally re-download an index list; returns True if membership data changed"""
+    source = get_index_source(index_name) or {}
+
+    for url in NSE_INDICES_URLS.get(index_name, []):
+        headers = dict(HEADERS)
+        if source.get('url') == url:
+            if source.get('etag'):
+                headers['If-None-Match'] = source['etag']
+            if source.get('last_modified'):
+                headers['If-Modified-Since'] = source['last_modified']
+
+        try:
+            response = provider.http_get(url, headers=headers, timeout=timeout)
+        except Exception as e:
+            print(f"Failed to fetch {url}: {e}")
+            continue
+
+        if response.status_code == 304:
+            save_index_source(index_name, url)
+            return False
+
+        if response.status_code == 200:
+            members = parse_constituents_csv(response.content.decode('utf-8'))
+            if members.empty:
+                continue
+            save_index_members(index_name, members)
+            save_index_source(
+                index_name, url,
+                etag=response.headers.get('ETag'),
+                last_modified=response.headers.get('Last-Modified'),
+                changed=True
+            )
+            update_symbol_master(members)
+            return True
+
+    return False
+
+def refresh_index_async(index_name):
+    """Refresh an index list in a background thread (at most one per index)"""
+    with _refreshing_lock:
+        if index_name in _refreshing:
+            return
+        _refreshing.add(index_name)
+
+    def run():
+        try:
+            refresh_index(index_name)
+        except Exception as e:
+            print(f"Background refresh of {index_name} failed: {e}")
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(index_name)
+
+    threading.Thread(target=run, name=f"refresh-{index_name}", daemon=True).start()
+
+def get_constituents(index_name, as_of=None):
+    """Constituent symbols (with .NS) for an index, served from the local store.
+
+    The first ever request for an index fetches synchronously; after that the
+    stored list is returned immediately and refreshed in the background when
+    stale. Passing `as_of` reads historical membership and never refreshes.
+    """
+    members = get_index_members(index_name, as_of)
+
+    if as_of is None:
+        source = get_index_source(index_name)
+        if members.empty and source is None:
+            refresh_index(index_name)
+            members = get_index_members(index_name)
+        elif source is None or source['checked_at'] is None or \
+                datetime.now() - source['checked_at'] > timedelta(seconds=INDEX_REFRESH_SECONDS):
+            refresh_index_async(index_name)
+
+    if members.empty:
+        return []
+    return [f"{s}.NS" for s in members['symbol']]
+
+def refresh_all_indices():
+    """Refresh every configured index list; returns the number that changed"""
+    return sum(refresh_index(name) for name in NSE_INDICES_URLS)
+
+def update_symbol_master(members):
+    """Add index members to the symbols master table"""
+    master = pd.DataFrame({
+        'symbol': members['symbol'] + '.NS',
+        'base': members['symbol'],
+        'exchange': 'NSE',
+        'company_name': members['company_name'],
+        'industry': members['industry'],
+        'isin': members['isin'],
+    })
+    return upsert_symbols(master)
@@ -1,48 +1,178 @@
+import csv
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
 import json
 import os
+import time
 import streamlit as st
-from utils.constants import PORTFOLIO_FILE, WATCHLIST_FILE
+from utils.constants import PORTFOLIO_FILE, WATCHLIST_FILE, CSV_BLOCK_SIZE, CSV_STAGE_BYTES
+from utils.db import get_connection
 
-def parse_holdings_csv(uploaded_file):
-    """Parse holdings CSV with robust error handling"""
+def source_size(source):
+    """Total bytes of a seekable file-like object (position is restored), else None"""
+    if getattr(source, 'size', None) is not None: # Streamlit UploadedFile
+        return source.size
     try:
-        # Read CSV with quote handling
-        df = pd.read_csv(uploaded_file, quotechar='"', escapechar='\\')
-        
-        # Clean column names
-        df.columns = [col.strip('"').strip() for col in df.columns]
-        
-        # Find columns by partial match
-        ticker_col = next((c for c in df.columns if 'instrument' in c.lower() or 'symbol' in c.lower()), None)
-        qty_col = next((c for c in df.columns if 'qty' in c.lower() or 'quantity' in c.lower()), None)
-        price_col = next((c for c in df.columns if 'avg' in c.lower() or 'cost' in c.lower() or 'price' in c.lower()), None)
-        
-        if not all([ticker_col, qty_col, price_col]):
-             st.error(f"Required columns not found. Found: {list(df.columns)}")
-             return pd.DataFrame()
-        
-        # Extract and clean data
-        holdings = pd.DataFrame({
-            'ticker': df[ticker_col].astype(str).str.strip(),
-            'shares': pd.to_numeric(df[qty_col], errors='coerce'),
-            'buy_price': pd.to_numeric(df[price_col], errors='coerce')
+        pos = source.tell()
+        size = source.seek(0, os.SEEK_END)
+        source.seek(pos)
+        return size
+    except (AttributeError, OSError):
+        return None
+
+def read_csv_header(source):
+    """Column names of a CSV file-like object (position is restored)"""
+    pos = source.tell()
+    first_line = source.readline()
+    source.seek(pos)
+    if isinstance(first_line, bytes):
+        first_line = first_line.decode('utf-8-sig')
+    return [c.strip('"').strip() for c in next(csv.reader([first_line]))]
+
+def find_column(columns, *keywords):
+    """First column whose name contains any keyword (case-insensitive)"""
+    return next((c for c in columns if any(k in c.lower() for k in keywords)), None)
+
+def clean_numeric(array):
+    """Vectorized string -> float64 (drops ₹, commas, quotes; accepts .5, 1., 1e3; unparseable -> null)"""
+    cleaned = pc.replace_substring_regex(pc.utf8_trim_whitespace(array), r'[",₹\s]', '')
+    numeric = pc.match_substring_regex(cleaned, r'^[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?$')
+    return pc.cast(pc.if_else(numeric, cleaned, pa.scalar(None, pa.string())), pa.float64())
+
+def iter_csv_batches(source, columns, block_size=CSV_BLOCK_SIZE):
+    """Stream selected CSV columns as Arrow record batches (all read as strings)"""
+    header = read_csv_header(source)
+    reader = pa_csv.open_csv(
+        source,
+        read_options=pa_csv.ReadOptions(block_size=block_size, column_names=header, skip_rows=1),
+        parse_options=pa_csv.ParseOptions(quote_char='"', escape_char='\\'),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=columns,
+            column_types={c: pa.string() for c in columns},
+            strings_can_be_null=True,
+        ),
+    )
+    for batch in reader:
+        yield batch
+
+def _clean_holdings_batch(batch, ticker_col, qty_col, price_col):
+    """Vectorized cleaning + SGB classification for one batch of holdings"""
+    ticker = pc.utf8_trim(pc.fill_null(batch.column(ticker_col), ''), '" ')
+    shares = clean_numeric(batch.column(qty_col))
+    buy_price = clean_numeric(batch.column(price_col))
+
+    # Identify Asset Type (SGB vs Equity)
+    asset_type = pc.if_else(
+        pc.match_substring(pc.utf8_upper(ticker), 'SGB'), 'SGB', 'EQUITY'
+    )
+
+    # Filter invalid rows
+    valid = pc.and_(
+        pc.and_(pc.greater(pc.utf8_length(ticker), 0), pc.greater(shares, 0)),
+        pc.greater_equal(buy_price, 0)
+    )
+    table = pa.table({'ticker': ticker, 'shares': shares, 'buy_price': buy_price, 'asset_type': asset_type})
+    return table.filter(pc.fill_null(valid, False))
+
+def iter_holdings(source, stats=None, block_size=CSV_BLOCK_SIZE):
+    """Stream cleaned holdings (ticker, shares, buy_price, asset_type) as Arrow tables.
+
+    Columns are detected by partial name match. When a `stats` dict is
+    given it is filled with rows read/kept, bytes, elapsed time, throughput
+    and peak Arrow memory.
+    """
+    header = read_csv_header(source)
+    ticker_col = find_column(header, 'instrument', 'symbol')
+    qty_col = find_column(header, 'qty', 'quantity')
+    price_col = find_column(header, 'avg', 'cost', 'price')
+
+    if not all([ticker_col, qty_col, price_col]):
+        raise ValueError(f"Required columns not found. Found: {header}")
+
+    pool = pa.default_memory_pool()
+    start_bytes = pool.bytes_allocated()
+    peak_bytes = 0
+    rows_read = rows_kept = 0
+    started = time.perf_counter()
+
+    for batch in iter_csv_batches(source, [ticker_col, qty_col, price_col], block_size):
+        cleaned = _clean_holdings_batch(batch, ticker_col, qty_col, price_col)
+        rows_read += batch.num_rows
+        rows_kept += cleaned.num_rows
+        peak_bytes = max(peak_bytes, pool.bytes_allocated() - start_bytes)
+        yield cleaned
+
+    if stats is not None:
+        elapsed = time.perf_counter() - started
+        stats.update({
+            'rows_read': rows_read,
+            'rows_valid': rows_kept,
+            'bytes_read': source.tell() if hasattr(source, 'tell') else None,
+            'seconds': elapsed,
+            'rows_per_sec': rows_read / elapsed if elapsed > 0 else None,
+            'peak_arrow_bytes': peak_bytes,
         })
-        
-        # Identify Asset Type (SGB vs Equity)
-        holdings['asset_type'] = holdings['ticker'].apply(
-            lambda x: 'SGB' if 'SGB' in x.upper() else 'EQUITY'
-        )
-        
-        # Filter invalid rows
-        valid_mask = (
-            (holdings['ticker'].str.len() > 0) & 
-            (holdings['shares'] > 0) & 
-            (holdings['buy_price'] >= 0)
-        )
-        
-        return holdings[valid_mask].reset_index(drop=True)
-        
+
+def ingest_holdings_csv_to_duckdb(source, stats=None, block_size=CSV_BLOCK_SIZE):
+    """Stream a (possibly larger-than-memory) holdings export through DuckDB.
+
+    Each cleaned Arrow batch is appended to a temporary staging table and
+    dropped, so only one batch is in memory at a time. Rows are aggregated
+    in SQL (multi-account exports repeat tickers): shares are summed and the
+    buy price is quantity-weighted. Returns one row per ticker.
+    """
+    conn = get_connection()
+    try:
+        conn.execute("""
+            CREATE OR REPLACE TEMP TABLE holdings_staging (
+                ticker VARCHAR, shares DOUBLE, buy_price DOUBLE, asset_type VARCHAR
+            )
+        """)
+        for table in iter_holdings(source, stats, block_size):
+            conn.register('holdings_batch', table)
+            conn.execute("INSERT INTO holdings_staging SELECT * FROM holdings_batch")
+            conn.unregister('holdings_batch')
+        return conn.execute("""
+            SELECT ticker, SUM(shares) AS shares, SUM(shares * buy_price) / SUM(shares) AS buy_price,
+                   ANY_VALUE(asset_type) AS asset_type
+            FROM holdings_staging
+            GROUP BY ticker
+            ORDER BY ticker
+        """).fetchdf()
+    finally:
+        conn.close() # Temporary tables go with the connection
+
+def parse_holdings_csv(uploaded_file):
+    """Parse holdings CSV with robust error handling.
+
+    Uploads of CSV_STAGE_BYTES or more are streamed through DuckDB (see
+    ingest_holdings_csv_to_duckdb); smaller ones are read in memory.
+    Ingestion stats are attached as df.attrs['ingest_stats'].
+    """
+    try:
+        stats = {}
+        size = source_size(uploaded_file)
+        if size is not None and size >= CSV_STAGE_BYTES:
+            holdings = ingest_holdings_csv_to_duckdb(uploaded_file, stats)
+            stats['staged'] = True
+            stats['dataframe_bytes'] = int(holdings.memory_usage(deep=True).sum())
+            holdings.attrs['ingest_stats'] = stats
+            return holdings
+
+        tables = list(iter_holdings(uploaded_file, stats))
+        if not tables:
+            return pd.DataFrame()
+
+        holdings = pa.concat_tables(tables).to_pandas()
+        stats['dataframe_bytes'] = int(holdings.memory_usage(deep=True).sum())
+        holdings.attrs['ingest_stats'] = stats
+        return holdings
+
+    except ValueError as e:
+        st.error(str(e))
+        return pd.DataFrame()
     except Exception as e:
         st.error(f"Error parsing CSV: {str(e)}")
         return pd.DataFrame()
@@ -1,18 +1,69 @@
 import duckdb
 import os
+import threading
 import pandas as pd
 from datetime import datetime
-from utils.constants import DATA_DIR
+from utils.constants import DATA_DIR, DB_READ_ONLY
+from utils.symbols import resolve_symbol, resolve_symbols, invalidate_symbol_map
+from utils.tracing import traced
+from utils.memory import shrink_frame
 
 DB_FILE = os.path.join(DATA_DIR, "stock_master.duckdb")
 
+# Threads must not open the same file concurrently (DuckDB rejects a second
+# attach while the first is live), so all connections in the process are
+# cursors on one shared database. The file is released again once the last
+# connection closes, leaving it free for the batch job's process. Readers
+# such as api_server.py open it read-only (STOCK_APP_DB_READ_ONLY=1).
+_db = None
+_db_users = 0
+_db_lock = threading.Lock()
+
+class _Connection:
+    """Cursor on the shared database; close() releases the shared handle"""
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._closed = False
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def close(self):
+        global _db, _db_users
+        if self._closed:
+            return
+        self._closed = True
+        self._cursor.close()
+        with _db_lock:
+            _db_users -= 1
+            if _db_users == 0:
+                _db.close()
+                _db = None
+
 def get_connection():
     """Get DuckDB connection"""
-    conn = duckdb.connect(DB_FILE)
-    return conn
+    global _db, _db_users
+    with _db_lock:
+        if _db is None:
+            _db = duckdb.connect(DB_FILE, read_only=DB_READ_ONLY)
+        _db_users += 1
+        return _Connection(_db.cursor())
+
+_schema_ready = False
+_schema_lock = threading.Lock()
 
 def init_db():
-    """Initialize Database Tables"""
+    """Initialize Database Tables (once per process; later calls return immediately)"""
+    global _schema_ready
+    if _schema_ready:
+        return
+    with _schema_lock:
+        if not _schema_ready:
+            _create_schema()
+            _schema_ready = True
+
+def _create_schema():
+    """Create any missing tables, sequences and indexes"""
     conn = get_connection()
     
     # Watchlist Table
@@ -57,10 +108,231 @@ def init_db():
         )
     """)
     
+    # Adjustment Factors (corporate actions; historical_data holds raw bars)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS adjustment_factors (
+            ticker VARCHAR,
+            ex_date TIMESTAMP,
+            action VARCHAR,
+            value DOUBLE,
+            price_factor DOUBLE,
+            volume_factor DOUBLE,
+            PRIMARY KEY (ticker, ex_date, action)
+        )
+    """)
+    
+    # Adjusted History: raw bars times the product of every later factor. Each
+    # bar is ASOF-joined to its next ex-date, which carries that product.
+    # Price-level indicators are stored de-adjusted, so they scale the same way.
+    conn.execute("""
+        CREATE OR REPLACE VIEW adjusted_history AS
+        WITH events AS (
+            SELECT ticker, ex_date, PRODUCT(price_factor) AS price_factor, PRODUCT(volume_factor) AS volume_factor
+            FROM adjustment_factors
+            GROUP BY ticker, ex_date
+        ),
+        cumulative AS (
+            SELECT
+                ticker, ex_date,
+                PRODUCT(price_factor) OVER later AS price_factor,
+                PRODUCT(volume_factor) OVER later AS volume_factor
+            FROM events
+            WINDOW later AS (PARTITION BY ticker ORDER BY ex_date DESC ROWS UNBOUNDED PRECEDING)
+        )
+        SELECT
+            h.ticker, h.date,
+            h.open * COALESCE(c.price_factor, 1) AS open,
+            h.high * COALESCE(c.price_factor, 1) AS high,
+            h.low * COALESCE(c.price_factor, 1) AS low,
+            h.close * COALESCE(c.price_factor, 1) AS close,
+            h.volume * COALESCE(c.volume_factor, 1) AS volume,
+            h.rsi,
+            h.ma50 * COALESCE(c.price_factor, 1) AS ma50,
+            h.ma200 * COALESCE(c.price_factor, 1) AS ma200,
+            h.supertrend * COALESCE(c.price_factor, 1) AS supertrend,
+            h.updated_at
+        FROM historical_data h
+        ASOF LEFT JOIN cumulative c ON c.ticker = h.ticker AND h.date < c.ex_date
+    """)
+    
+    # Symbol Master (canonical provider symbols, e.g. ITC -> ITC.NS)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS symbols (
+            symbol VARCHAR PRIMARY KEY,
+            base VARCHAR,
+            exchange VARCHAR,
+            company_name VARCHAR,
+            industry VARCHAR,
+            isin VARCHAR,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_symbols_base ON symbols (base)")
+    
+    # Latest Snapshot (one row per ticker, refreshed on every history write)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS latest_snapshot (
+            ticker VARCHAR PRIMARY KEY,
+            date TIMESTAMP,
+            close DOUBLE,
+            prev_close DOUBLE,
+            day_change_pct DOUBLE,
+            rsi DOUBLE,
+            ma50 DOUBLE,
+            ma200 DOUBLE,
+            supertrend DOUBLE,
+            supertrend_bullish BOOLEAN,
+            high_52w DOUBLE,
+            low_52w DOUBLE,
+            pct_from_high DOUBLE,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    
+    # Realized Trades (FIFO-matched from an uploaded tradebook)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS realized_trades (
+            ticker VARCHAR,
+            buy_date DATE,
+            sell_date DATE,
+            quantity DOUBLE,
+            buy_price DOUBLE,
+            sell_price DOUBLE,
+            pnl DOUBLE,
+            holding_days INTEGER
+        )
+    """)
+    
+    # Open Lots (dated buys behind the holdings, from the last tradebook upload)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS open_lots (
+            ticker VARCHAR,
+            buy_date DATE,
+            quantity DOUBLE,
+            price DOUBLE
+        )
+    """)
+    
+    # Portfolio NAV (daily series materialized from holdings x adjusted_history)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS portfolio_nav (
+            date TIMESTAMP PRIMARY KEY,
+            value DOUBLE,
+            invested DOUBLE,
+            net_flow DOUBLE,
+            realized_pnl DOUBLE,
+            daily_return DOUBLE,
+            nav DOUBLE,
+            drawdown DOUBLE,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    
+    # Alert Rules (a metric crossing a level or indicator, per ticker)
+    conn.execute("CREATE SEQUENCE IF NOT EXISTS seq_alert_rules_id START 1")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS alert_rules (
+            id INTEGER PRIMARY KEY,
+            ticker VARCHAR,
+            metric VARCHAR,
+            reference VARCHAR,
+            level DOUBLE,
+            direction VARCHAR,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_alert_rules_ticker ON alert_rules (ticker)")
+    
+    # Alert Log (a rule fires at most once per trading day)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS alert_log (
+            rule_id INTEGER,
+            ticker VARCHAR,
+            trigger_date DATE,
+            direction VARCHAR,
+            value DOUBLE,
+            reference_value DOUBLE,
+            message VARCHAR,
+            source VARCHAR,
+            fired_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (rule_id, trigger_date)
+        )
+    """)
+    
+    # Trace Spans (copied from processes' in-memory span buffers, see utils/tracing.py)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS trace_spans (
+            process VARCHAR,
+            seq BIGINT,
+            name VARCHAR,
+            category VARCHAR,
+            parent VARCHAR,
+            started_at TIMESTAMP,
+            ms DOUBLE,
+            rows BIGINT,
+            cache_hits BIGINT,
+            cache_misses BIGINT,
+            error VARCHAR,
+            thread VARCHAR,
+            PRIMARY KEY (process, seq)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_trace_spans_started ON trace_spans (started_at)")
+    
+    # Intraday Rollups (1h / 1d buckets derived from the Parquet intraday store)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS intraday_rollups (
+            ticker VARCHAR,
+            timeframe VARCHAR,
+            bucket TIMESTAMP,
+            open DOUBLE,
+            high DOUBLE,
+            low DOUBLE,
+            close DOUBLE,
+            volume DOUBLE,
+            PRIMARY KEY (ticker, timeframe, bucket)
+        )
+    """)
+    
+    # Intraday write counter per ticker (bumped on every stored batch; keys chart caches)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS intraday_writes (
+            ticker VARCHAR PRIMARY KEY,
+            generation BIGINT
+        )
+    """)
+    
+    # Index Constituents (membership with effective dates)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS index_constituents (
+            index_name VARCHAR,
+            symbol VARCHAR,
+            company_name VARCHAR,
+            industry VARCHAR,
+            isin VARCHAR,
+            effective_from DATE,
+            effective_to DATE,
+            PRIMARY KEY (index_name, symbol, effective_from)
+        )
+    """)
+    
+    # Index list sources (HTTP validators for conditional refreshes)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS index_sources (
+            index_name VARCHAR PRIMARY KEY,
+            url VARCHAR,
+            etag VARCHAR,
+            last_modified VARCHAR,
+            checked_at TIMESTAMP,
+            changed_at TIMESTAMP
+        )
+    """)
+    
     conn.close()
 
 def add_ticker(ticker):
-    """Add ticker to watchlist"""
+    """Add ticker to watchlist (stored as its canonical symbol)"""
+    ticker = resolve_symbol(ticker)
     conn = get_connection()
     try:
         # Check if exists
@@ -77,6 +349,7 @@ def add_ticker(ticker):
 
 def remove_ticker(ticker):
     """Remove ticker from watchlist"""
+    ticker = resolve_symbol(ticker)
     conn = get_connection()
     try:
         conn.execute("DELETE FROM watchlist WHERE ticker = ?", [ticker])
@@ -84,6 +357,7 @@ def remove_ticker(ticker):
     finally:
         conn.close()
 
+@traced
 def get_watchlist():
     """Get all watchlist tickers"""
     conn = get_connection()
@@ -93,24 +367,37 @@ def get_watchlist():
     finally:
         conn.close()
 
+def _replace_holdings(conn, df):
+    df = df.copy()
+    df['ticker'] = resolve_symbols(df['ticker'])
+    conn.execute("DELETE FROM holdings")
+    conn.register('temp_df', df)
+    conn.execute("""
+        INSERT INTO holdings (id, ticker, shares, buy_price, asset_type)
+        SELECT nextval('seq_holdings_id'), ticker, shares, buy_price, asset_type FROM temp_df
+    """)
+
 def save_portfolio_db(df):
-    """Save portfolio dataframe to DB (overwrite mode for now similar to JSON)"""
+    """Save a holdings snapshot to DB (overwrite mode for now similar to JSON)"""
     conn = get_connection()
     try:
-        conn.execute("DELETE FROM holdings")
-        # DuckDB pandas insert
-        conn.register('temp_df', df)
-        conn.execute("""
-            INSERT INTO holdings (ticker, shares, buy_price, asset_type)
-            SELECT ticker, shares, buy_price, asset_type FROM temp_df
-        """)
+        conn.execute("BEGIN TRANSACTION")
+        _replace_holdings(conn, df)
+        # A new snapshot supersedes the last tradebook: its lots, the trades
+        # it closed (their buys may predate the snapshot's shares) and the NAV
+        conn.execute("DELETE FROM open_lots")
+        conn.execute("DELETE FROM realized_trades")
+        conn.execute("DELETE FROM portfolio_nav")
+        conn.execute("COMMIT")
         return True
     except Exception as e:
+        conn.execute("ROLLBACK")
         print(f"Error saving portfolio: {e}")
         return False
     finally:
         conn.close()
 
+@traced
 def get_portfolio_db():
     """Get portfolio holdings"""
     conn = get_connection()
@@ -120,55 +407,798 @@ def get_portfolio_db():
     finally:
         conn.close()
 
-def save_historical_data(ticker, df):
-    """Save historical data for a ticker (Upsert)"""
+@traced
+def get_realized_trades():
+    """Get realized trades"""
+    conn = get_connection()
+    try:
+        return conn.execute("SELECT * FROM realized_trades ORDER BY sell_date DESC, ticker").fetchdf()
+    except Exception as e:
+        print(f"Error getting realized trades: {e}")
+        return pd.DataFrame()
+    finally:
+        conn.close()
+
+def save_tradebook(holdings, open_lots, realized):
+    """Replace holdings, their dated open lots and the realized (closed) trades from one FIFO result, atomically"""
+    open_lots, realized = open_lots.copy(), realized.copy()
+    open_lots['ticker'] = resolve_symbols(open_lots['ticker'])
+    realized['ticker'] = resolve_symbols(realized['ticker'])
+    conn = get_connection()
+    try:
+        conn.execute("BEGIN TRANSACTION")
+        _replace_holdings(conn, holdings)
+        conn.execute("DELETE FROM open_lots")
+        conn.register('temp_lots', open_lots)
+        conn.execute("INSERT INTO open_lots SELECT ticker, buy_date, quantity, price FROM temp_lots")
+        conn.execute("DELETE FROM realized_trades")
+        conn.register('temp_realized', realized)
+        conn.execute("""
+            INSERT INTO realized_trades
+            SELECT ticker, buy_date, sell_date, quantity, buy_price, sell_price, pnl, holding_days
+            FROM temp_realized
+        """)
+        conn.execute("DELETE FROM portfolio_nav")
+        conn.execute("COMMIT")
+        return True
+    except Exception as e:
+        conn.execute("ROLLBACK")
+        print(f"Error saving tradebook: {e}")
+        return False
+    finally:
+        conn.close()
+
+# Daily portfolio NAV, built in SQL from every lot the portfolio has held:
+# open lots from the last tradebook (or, after a holdings snapshot, each
+# holding bought at market on its first stored bar) and realized lots over
+# [buy_date, sell_date]. Trade prices and quantities are raw, so lots are
+# valued at the raw close (carried over a ticker's missing days by an ASOF
+# join) with their quantity scaled by the split / bonus volume factors since
+# the lot's basis date: the buy date, or today for a holdings snapshot, whose
+# shares are already current. A 1:2 split doubles the shares as it halves
+# the close, and dividends move neither. `nav` is a unit value (100 on the
+# first day) chained from flow-adjusted daily returns, so buys and sells
+# move `value` but not `nav`; drawdown is measured on `nav`.
+_NAV_SQL = """
+    WITH lots AS (
+        SELECT ticker, buy_date AS opened, NULL::DATE AS closed, quantity, price, NULL::DOUBLE AS sell_price
+        FROM open_lots
+        UNION ALL
+        SELECT ticker, NULL, NULL, shares, buy_price, NULL
+        FROM holdings WHERE NOT EXISTS (SELECT 1 FROM open_lots)
+        UNION ALL
+        SELECT ticker, buy_date, sell_date, quantity, buy_price, sell_price
+        FROM realized_trades
+    ),
+    first_bar AS (
+        SELECT ticker, MIN(date) AS first_date
+        FROM historical_data WHERE ticker IN (SELECT ticker FROM lots)
+        GROUP BY ticker
+    ),
+    dated AS (
+        SELECT l.ticker, COALESCE(CAST(l.opened AS TIMESTAMP), f.first_date) AS opened,
+               CAST(l.closed AS TIMESTAMP) AS closed, l.opened IS NULL AS at_market,
+               COALESCE(CAST(l.opened AS TIMESTAMP), TIMESTAMP '9999-12-31') AS basis,
+               l.quantity, l.price, l.sell_price
+        FROM lots l JOIN first_bar f USING (ticker)
+    ),
+    share_factors AS (
+        -- Running product of volume factors: shares held per share at the start
+        SELECT ticker, ex_date,
+               PRODUCT(volume_factor) OVER (PARTITION BY ticker ORDER BY ex_date ROWS UNBOUNDED PRECEDING) AS factor
+        FROM (
+            SELECT ticker, ex_date, PRODUCT(volume_factor) AS volume_factor
+            FROM adjustment_factors WHERE ticker IN (SELECT ticker FROM first_bar)
+            GROUP BY ticker, ex_date
+        )
+    ),
+    calendar AS (
+        SELECT DISTINCT date FROM historical_data
+        WHERE ticker IN (SELECT ticker FROM first_bar)
+          AND (CAST($since AS TIMESTAMP) IS NULL OR date >= CAST($since AS TIMESTAMP))
+    ),
+    held AS (
+        SELECT c.date, d.*
+        FROM calendar c JOIN dated d ON c.date >= d.opened AND (d.closed IS NULL OR c.date <= d.closed)
+    ),
+    priced AS (
+        SELECT h.*, p.close, h.quantity * COALESCE(n.factor, 1) / COALESCE(b.factor, 1) AS shares
+        FROM held h
+        ASOF LEFT JOIN historical_data p ON p.ticker = h.ticker AND p.date <= h.date
+        ASOF LEFT JOIN share_factors n ON n.ticker = h.ticker AND n.ex_date <= h.date
+        ASOF LEFT JOIN share_factors b ON b.ticker = h.ticker AND b.ex_date <= h.basis
+    ),
+    daily AS (
+        SELECT
+            date,
+            SUM(CASE WHEN closed IS NULL OR date < closed THEN shares * close ELSE 0 END) AS value,
+            SUM(CASE WHEN closed IS NULL OR date < closed THEN quantity * price ELSE 0 END) AS invested,
+            SUM(CASE WHEN date = opened THEN (CASE WHEN at_market THEN shares * close ELSE quantity * price END) ELSE 0 END)
+              - SUM(CASE WHEN date = closed THEN shares * sell_price ELSE 0 END) AS net_flow,
+            SUM(CASE WHEN date = closed THEN shares * sell_price - quantity * price ELSE 0 END) AS realized
+        FROM priced
+        GROUP BY date
+    ),
+    returns AS (
+        SELECT *,
+            CASE WHEN LAG(value) OVER (ORDER BY date) > 0
+                 THEN (value - net_flow) / LAG(value) OVER (ORDER BY date) - 1
+                 ELSE 0 END AS daily_return
+        FROM daily
+    ),
+    chained AS (
+        SELECT
+            date, value, invested, net_flow, daily_return,
+            $seed_realized + SUM(realized) OVER run AS realized_pnl,
+            $seed_nav * EXP(SUM(LN(GREATEST(1 + daily_return, 1e-9))) OVER run) AS nav
+        FROM returns
+        WHERE CAST($since AS TIMESTAMP) IS NULL OR date > CAST($since AS TIMESTAMP)
+        WINDOW run AS (ORDER BY date ROWS UNBOUNDED PRECEDING)
+    )
+    SELECT
+        date, value, invested, net_flow, realized_pnl, daily_return, nav,
+        nav / GREATEST($seed_peak, MAX(nav) OVER (ORDER BY date ROWS UNBOUNDED PRECEDING)) - 1 AS drawdown
+    FROM chained
+"""
+
+@traced
+def refresh_portfolio_nav(full=False):
+    """
+    Extend the materialized NAV series with any newer bars; returns rows written.
+
+    Only bars after the second-newest stored date are recomputed (so a
+    partial last bar is redone), chained from the stored row before them.
+    Saving holdings, lots or realized trades clears the series, and the next
+    refresh rebuilds it from the first bar.
+    """
+    conn = get_connection()
+    try:
+        conn.execute("BEGIN TRANSACTION")
+        seed = None
+        if not full:
+            seed = conn.execute("""
+                WITH seed AS (SELECT date, nav, realized_pnl FROM portfolio_nav ORDER BY date DESC LIMIT 1 OFFSET 1)
+                SELECT s.date, s.nav, s.realized_pnl, (SELECT MAX(nav) FROM portfolio_nav WHERE date <= s.date)
+                FROM seed s
+            """).fetchone()
+        since, seed_nav, seed_realized, seed_peak = seed if seed else (None, 100.0, 0.0, 100.0)
+
+        conn.execute(
+            "DELETE FROM portfolio_nav WHERE CAST(? AS TIMESTAMP) IS NULL OR date > CAST(? AS TIMESTAMP)",
+            [since, since]
+        )
+        written = conn.execute(f"""
+            INSERT INTO portfolio_nav (date, value, invested, net_flow, realized_pnl, daily_return, nav, drawdown)
+            {_NAV_SQL}
+        """, {'since': since, 'seed_nav': seed_nav, 'seed_realized': seed_realized, 'seed_peak': seed_peak}).fetchone()[0]
+        conn.execute("COMMIT")
+        return written
+    except Exception as e:
+        conn.execute("ROLLBACK")
+        print(f"Error refreshing portfolio NAV: {e}")
+        return 0
+    finally:
+        conn.close()
+
+@traced
+def get_portfolio_nav(start=None):
+    """Materialized daily NAV series (date, value, invested, realized_pnl, nav, drawdown, ...)"""
+    conn = get_connection()
+    try:
+        return conn.execute("""
+            SELECT date, value, invested, net_flow, realized_pnl, daily_return, nav, drawdown
+            FROM portfolio_nav
+            WHERE CAST(? AS TIMESTAMP) IS NULL OR date >= CAST(? AS TIMESTAMP)
+            ORDER BY date
+        """, [start, start]).fetchdf()
+    except Exception as e:
+        print(f"Error getting portfolio NAV: {e}")
+        return pd.DataFrame()
+    finally:
+        conn.close()
+
+def add_alert_rule(ticker, metric, reference, level=None, direction='either'):
+    """Store an alert rule (ticker saved as its canonical symbol); returns its id"""
+    conn = get_connection()
+    try:
+        return conn.execute("""
+            INSERT INTO alert_rules (id, ticker, metric, reference, level, direction)
+            VALUES (nextval('seq_alert_rules_id'), ?, ?, ?, ?, ?)
+            RETURNING id
+        """, [resolve_symbol(ticker), metric, reference, level, direction]).fetchone()[0]
+    except Exception as e:
+        print(f"Error adding alert rule: {e}")
+        return None
+    finally:
+        conn.close()
+
+def remove_alert_rule(rule_id):
+    """Delete an alert rule (its log entries are kept)"""
+    conn = get_connection()
+    try:
+        conn.execute("DELETE FROM alert_rules WHERE id = ?", [rule_id])
+    finally:
+        conn.close()
+
+@traced
+def get_alert_rules(tickers=None):
+    """Alert rules, optionally only those on these tickers"""
+    conn = get_connection()
+    try:
+        return conn.execute("""
+            SELECT id, ticker, metric, reference, level, direction, created_at
+            FROM alert_rules
+            WHERE CAST(? AS VARCHAR[]) IS NULL OR ticker IN (SELECT UNNEST(?))
+            ORDER BY ticker, id
+        """, [tickers, tickers]).fetchdf()
+    except Exception as e:
+        print(f"Error getting alert rules: {e}")
+        return pd.DataFrame()
+    finally:
+        conn.close()
+
+@traced
+def log_alerts(df):
+    """Append fired alerts, skipping any (rule_id, trigger_date) already logged; returns the new rows"""
+    conn = get_connection()
+    try:
+        conn.register('temp_alerts', df)
+        return conn.execute("""
+            INSERT OR IGNORE INTO alert_log (rule_id, ticker, trigger_date, direction, value, reference_value, message, source)
+            SELECT rule_id, ticker, trigger_date, direction, value, reference_value, message, source FROM temp_alerts
+            RETURNING *
+        """).fetchdf()
+    except Exception as e:
+        print(f"Error logging alerts: {e}")
+        return pd.DataFrame()
+    finally:
+        conn.close()
+
+def get_alert_log(limit=100):
+    """Most recently fired alerts"""
+    conn = get_connection()
+    try:
+        return conn.execute("SELECT * FROM alert_log ORDER BY fired_at DESC LIMIT ?", [limit]).fetchdf()
+    except Exception as e:
+        print(f"Error getting alert log: {e}")
+        return pd.DataFrame()
+    finally:
+        conn.close()
+
+def save_trace_spans(df):
+    """Append spans from utils.tracing.get_spans()"""
+    conn = get_connection()
+    try:
+        conn.register('temp_spans', df)
+        conn.execute("INSERT OR IGNORE INTO trace_spans BY NAME SELECT * FROM temp_spans")
+        return True
+    except Exception as e:
+        print(f"Error saving trace spans: {e}")
+        return False
+    finally:
+        conn.close()
+
+def get_trace_spans(since=None, limit=50000):
+    """Stored spans, newest first (optionally only those started after since)"""
     conn = get_connection()
     try:
-        # Add ticker column if missing
+        return conn.execute("""
+            SELECT * FROM trace_spans
+            WHERE CAST(? AS TIMESTAMP) IS NULL OR started_at >= CAST(? AS TIMESTAMP)
+            ORDER BY started_at DESC
+            LIMIT ?
+        """, [since, since, limit]).fetchdf()
+    except Exception as e:
+        print(f"Error getting trace spans: {e}")
+        return pd.DataFrame()
+    finally:
+        conn.close()
+
+@traced
+def get_recent_bars(tickers, bars=2):
+    """Last `bars` adjusted bars per ticker, oldest first"""
+    conn = get_connection()
+    try:
+        return conn.execute("""
+            SELECT ticker, date, close, rsi, ma50, ma200, supertrend
+            FROM adjusted_history
+            WHERE ticker IN (SELECT UNNEST(?))
+            QUALIFY ROW_NUMBER() OVER (PARTITION BY ticker ORDER BY date DESC) <= ?
+            ORDER BY ticker, date
+        """, [list(tickers), bars]).fetchdf()
+    except Exception as e:
+        print(f"Error getting recent bars: {e}")
+        return pd.DataFrame()
+    finally:
+        conn.close()
+
+def save_historical_data(ticker, df):
+    """Save historical data for a ticker (Upsert)"""
+    return bool(save_historical_data_bulk({ticker: df}))
+
+@traced
+def save_historical_data_bulk(frames):
+    """Upsert raw bars for many tickers in one transaction ({ticker: df}); returns the tickers saved.
+
+    Only the rows passed are written. Indicator columns are optional and
+    should be de-adjusted (see adjusted_history).
+    """
+    if not frames:
+        return []
+    parts = []
+    for ticker, df in frames.items():
         df = df.copy()
-        df['ticker'] = ticker
-        df.reset_index(inplace=True) # Ensure Date is a column if it's index
-        
-        # Rename columns to match DB schema if needed
-        # Expected: Date, Open, High, Low, Close, Volume, ticker, + indicators
-        # Mapping standard yfinance/pandas names to lowercase DB columns
+        df['ticker'] = resolve_symbol(ticker)
+        df.reset_index(inplace=True)
         df.columns = [c.lower() for c in df.columns]
-        
-        # Register for bulk insert
-        conn.register('temp_hist', df)
-        
-        # Delete existing data for this ticker to define clean slate or range? 
-        # For simplicity in batch, we can delete entries for this ticker and re-insert 
-        # OR use ON CONFLICT DO UPDATE if DuckDB supports it nicely.
-        # Let's use Delete + Insert for now to modify full history cleanly.
-        conn.execute("DELETE FROM historical_data WHERE ticker = ?", [ticker])
-        
-        # Insert
-        # Only selecting columns that exist in table
+        parts.append(df)
+    long_df = pd.concat(parts, ignore_index=True)
+    tickers = long_df['ticker'].unique().tolist()
+    for column in ('rsi', 'ma50', 'ma200', 'supertrend'):
+        if column not in long_df:
+            long_df[column] = float('nan')
+
+    conn = get_connection()
+    try:
+        conn.register('temp_hist', long_df)
+        conn.execute("BEGIN TRANSACTION")
         conn.execute("""
-            INSERT INTO historical_data (ticker, date, open, high, low, close, volume, rsi, ma50, ma200, supertrend)
-            SELECT ticker, date, open, high, low, close, volume, rsi, ma50, ma200, supertrend 
+            INSERT OR REPLACE INTO historical_data
+                (ticker, date, open, high, low, close, volume, rsi, ma50, ma200, supertrend, updated_at)
+            SELECT ticker, date, open, high, low, close, volume, rsi, ma50, ma200, supertrend, CURRENT_TIMESTAMP
             FROM temp_hist
         """)
-        return True
+        _refresh_latest_snapshot(conn, tickers)
+        conn.execute("COMMIT")
+        return tickers
     except Exception as e:
-        print(f"Error saving history for {ticker}: {e}")
-        return False
+        conn.execute("ROLLBACK")
+        print(f"Error saving history for {len(tickers)} tickers: {e}")
+        return []
+    finally:
+        conn.close()
+
+def save_adjustment_factors(df):
+    """Upsert corporate actions (ticker, ex_date, action, value, price_factor, volume_factor)"""
+    if df.empty:
+        return 0
+    conn = get_connection()
+    try:
+        conn.register('temp_factors', df)
+        conn.execute("""
+            INSERT OR REPLACE INTO adjustment_factors (ticker, ex_date, action, value, price_factor, volume_factor)
+            SELECT ticker, ex_date, action, value, price_factor, volume_factor FROM temp_factors
+        """)
+        return len(df)
+    except Exception as e:
+        print(f"Error saving adjustment factors: {e}")
+        return 0
     finally:
         conn.close()
 
-def get_historical_data(ticker, limit=365):
-    """Get historical data for a ticker"""
+def get_adjustment_factors(ticker):
+    """Corporate actions recorded for a ticker, newest first"""
+    ticker = resolve_symbol(ticker)
+    conn = get_connection()
+    try:
+        return conn.execute("""
+            SELECT ex_date, action, value, price_factor, volume_factor
+            FROM adjustment_factors WHERE ticker = ?
+            ORDER BY ex_date DESC
+        """, [ticker]).fetchdf()
+    except Exception as e:
+        print(f"Error getting adjustment factors for {ticker}: {e}")
+        return pd.DataFrame()
+    finally:
+        conn.close()
+
+def _refresh_latest_snapshot(conn, tickers=None):
+    """Recompute latest_snapshot rows from adjusted_history (all tickers if None)"""
+    conn.execute("""
+        DELETE FROM latest_snapshot
+        WHERE CAST(? AS VARCHAR[]) IS NULL OR ticker IN (SELECT UNNEST(?))
+    """, [tickers, tickers])
+    conn.execute("""
+        INSERT INTO latest_snapshot
+        SELECT
+            ticker, date, close, prev_close,
+            (close / prev_close - 1) * 100 AS day_change_pct,
+            rsi, ma50, ma200, supertrend,
+            close > supertrend AS supertrend_bullish,
+            high_52w, low_52w,
+            (close / high_52w - 1) * 100 AS pct_from_high,
+            CURRENT_TIMESTAMP AS updated_at
+        FROM (
+            SELECT
+                ticker, date, close, rsi, ma50, ma200, supertrend,
+                LAG(close) OVER (PARTITION BY ticker ORDER BY date) AS prev_close,
+                MAX(high) OVER year_window AS high_52w,
+                MIN(low) OVER year_window AS low_52w
+            FROM adjusted_history
+            JOIN (
+                SELECT ticker, MAX(date) AS last_date
+                FROM historical_data
+                WHERE CAST(? AS VARCHAR[]) IS NULL OR ticker IN (SELECT UNNEST(?))
+                GROUP BY ticker
+            ) latest USING (ticker)
+            -- Only the trailing year per ticker is needed for the 52-week range
+            WHERE date >= last_date - INTERVAL 365 DAYS
+            WINDOW year_window AS (
+                PARTITION BY ticker ORDER BY date
+                RANGE BETWEEN INTERVAL 365 DAYS PRECEDING AND CURRENT ROW
+            )
+        )
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY ticker ORDER BY date DESC) = 1
+    """, [tickers, tickers])
+
+@traced
+def refresh_latest_snapshot(tickers=None):
+    """Rebuild the latest_snapshot table (all stored tickers by default)"""
+    conn = get_connection()
+    try:
+        conn.execute("BEGIN TRANSACTION")
+        _refresh_latest_snapshot(conn, tickers)
+        conn.execute("COMMIT")
+        return conn.execute("SELECT COUNT(*) FROM latest_snapshot").fetchone()[0]
+    except Exception as e:
+        conn.execute("ROLLBACK")
+        print(f"Error refreshing latest snapshot: {e}")
+        return 0
+    finally:
+        conn.close()
+
+SNAPSHOT_SORT_COLUMNS = [
+    'ticker', 'close', 'day_change_pct', 'rsi', 'ma50', 'ma200', 'supertrend',
+    'high_52w', 'low_52w', 'pct_from_high'
+]
+
+@traced
+def screen_latest_snapshot(rsi_min=None, rsi_max=None, above_ma50=None, above_ma200=None,
+                           supertrend_bullish=None, max_pct_from_high=None, symbols=None,
+                           order_by='ticker', ascending=True, limit=None):
+    """Filter and sort the latest snapshot; None means no condition"""
+    if order_by not in SNAPSHOT_SORT_COLUMNS:
+        raise ValueError(f"Cannot sort by {order_by}")
+    
+    conditions, params = [], []
+    if rsi_min is not None:
+        conditions.append("rsi >= ?")
+        params.append(rsi_min)
+    if rsi_max is not None:
+        conditions.append("rsi <= ?")
+        params.append(rsi_max)
+    if above_ma50 is not None:
+        conditions.append("(close > ma50) = ?")
+        params.append(above_ma50)
+    if above_ma200 is not None:
+        conditions.append("(close > ma200) = ?")
+        params.append(above_ma200)
+    if supertrend_bullish is not None:
+        conditions.append("supertrend_bullish = ?")
+        params.append(supertrend_bullish)
+    if max_pct_from_high is not None:
+        conditions.append("pct_from_high >= ?")
+        params.append(-abs(max_pct_from_high))
+    if symbols is not None:
+        conditions.append("ticker IN (SELECT UNNEST(?))")
+        params.append(list(symbols))
+    
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    direction = "ASC" if ascending else "DESC"
+    limit_clause = f"LIMIT {int(limit)}" if limit else ""
+    
+    conn = get_connection()
+    try:
+        return conn.execute(f"""
+            SELECT * EXCLUDE (updated_at) FROM latest_snapshot
+            {where}
+            ORDER BY {order_by} {direction} NULLS LAST, ticker
+            {limit_clause}
+        """, params).fetchdf()
+    except Exception as e:
+        print(f"Error screening snapshot: {e}")
+        return pd.DataFrame()
+    finally:
+        conn.close()
+
+@traced
+def get_historical_data(ticker, limit=365, start=None, end=None, adjusted=True):
+    """Get historical data for a ticker (optionally only bars between start and end)"""
+    ticker = resolve_symbol(ticker)
+    source = "adjusted_history" if adjusted else "historical_data"
     conn = get_connection()
     try:
         df = conn.execute(f"""
-            SELECT * FROM historical_data 
+            SELECT * FROM {source} 
             WHERE ticker = ? 
+              AND (CAST(? AS TIMESTAMP) IS NULL OR date >= CAST(? AS TIMESTAMP))
+              AND (CAST(? AS TIMESTAMP) IS NULL OR date <= CAST(? AS TIMESTAMP))
             ORDER BY date ASC
-        """, [ticker]).fetchdf()
-        return df
+        """, [ticker, start, start, end, end]).fetchdf()
+        return shrink_frame(df)
     except Exception as e:
         print(f"Error getting history for {ticker}: {e}")
         return pd.DataFrame()
     finally:
         conn.close()
+
+@traced
+def get_history_page(ticker, limit, offset=0, start=None, end=None):
+    """Get one page of stored bars, newest first, and the total row count"""
+    ticker = resolve_symbol(ticker)
+    conn = get_connection()
+    try:
+        df = conn.execute("""
+            SELECT date, close, rsi, supertrend, volume, COUNT(*) OVER () AS total_rows
+            FROM adjusted_history
+            WHERE ticker = ?
+              AND (CAST(? AS TIMESTAMP) IS NULL OR date >= CAST(? AS TIMESTAMP))
+              AND (CAST(? AS TIMESTAMP) IS NULL OR date <= CAST(? AS TIMESTAMP))
+            ORDER BY date DESC
+            LIMIT ? OFFSET ?
+        """, [ticker, start, start, end, end, limit, offset]).fetchdf()
+        total = int(df['total_rows'].iloc[0]) if not df.empty else 0
+        return df.drop(columns='total_rows'), total
+    except Exception as e:
+        print(f"Error getting history page for {ticker}: {e}")
+        return pd.DataFrame(), 0
+    finally:
+        conn.close()
+
+def get_symbol_master():
+    """Get the symbol master (canonical symbol + base ticker); None when it can't be read"""
+    conn = get_connection()
+    try:
+        return conn.execute("SELECT symbol, base, exchange, company_name, industry, isin FROM symbols").fetchdf()
+    except Exception as e:
+        # Table may not exist before the first init_db()
+        print(f"Error reading symbol master: {e}")
+        return None
+    finally:
+        conn.close()
+
+def upsert_symbols(df):
+    """Insert or update symbol master rows (symbol, base, exchange, company_name, industry, isin)"""
+    if df is None or df.empty:
+        return 0
+    conn = get_connection()
+    try:
+        conn.register('temp_symbols', df)
+        conn.execute("""
+            INSERT OR REPLACE INTO symbols (symbol, base, exchange, company_name, industry, isin, updated_at)
+            SELECT DISTINCT ON (symbol) symbol, base, exchange, company_name, industry, isin, CURRENT_TIMESTAMP
+            FROM temp_symbols
+        """)
+        invalidate_symbol_map()
+        return len(df)
+    except Exception as e:
+        print(f"Error saving symbol master: {e}")
+        return 0
+    finally:
+        conn.close()
+
+@traced
+def canonicalize_stored_tickers():
+    """Rewrite watchlist, holdings and history tickers to canonical symbols, merging duplicates"""
+    conn = get_connection()
+    in_transaction = False
+    try:
+        raw = conn.execute("""
+            SELECT ticker FROM watchlist
+            UNION SELECT ticker FROM holdings
+            UNION SELECT DISTINCT ticker FROM historical_data
+        """).fetchdf()
+        mapping = pd.DataFrame({'raw': raw['ticker'], 'canonical': resolve_symbols(raw['ticker'])})
+        mapping = mapping[mapping['raw'] != mapping['canonical']]
+        if mapping.empty:
+            return 0
+
+        conn.register('ticker_map', mapping)
+        conn.execute("BEGIN TRANSACTION")
+        in_transaction = True
+
+        # Watchlist: keep one row per canonical symbol (earliest created_at)
+        conn.execute("""
+            CREATE OR REPLACE TEMP TABLE watchlist_canonical AS
+            SELECT COALESCE(m.canonical, w.ticker) AS ticker, MIN(w.created_at) AS created_at
+            FROM watchlist w LEFT JOIN ticker_map m ON w.ticker = m.raw
+            GROUP BY 1
+        """)
+        conn.execute("DELETE FROM watchlist")
+        conn.execute("INSERT INTO watchlist SELECT ticker, created_at FROM watchlist_canonical")
+
+        conn.execute("""
+            UPDATE holdings SET ticker = m.canonical
+            FROM ticker_map m WHERE holdings.ticker = m.raw
+        """)
+
+        # History: keep the most recently updated row where both spellings cover a date
+        conn.execute("""
+            CREATE OR REPLACE TEMP TABLE history_canonical AS
+            SELECT * EXCLUDE (rn) FROM (
+                SELECT COALESCE(m.canonical, h.ticker) AS ticker, h.* EXCLUDE (ticker),
+                       ROW_NUMBER() OVER (
+                           PARTITION BY COALESCE(m.canonical, h.ticker), h.date
+                           ORDER BY h.updated_at DESC NULLS LAST
+                       ) AS rn
+                FROM historical_data h
+                LEFT JOIN ticker_map m ON h.ticker = m.raw
+                WHERE h.ticker IN (SELECT raw FROM ticker_map UNION SELECT canonical FROM ticker_map)
+            ) WHERE rn = 1
+        """)
+        conn.execute("""
+            DELETE FROM historical_data
+            WHERE ticker IN (SELECT raw FROM ticker_map UNION SELECT canonical FROM ticker_map)
+        """)
+        conn.execute("INSERT INTO historical_data BY NAME SELECT * FROM history_canonical")
+
+        conn.execute("""
+            CREATE OR REPLACE TEMP TABLE factors_canonical AS
+            SELECT DISTINCT ON (ticker, ex_date, action) * FROM (
+                SELECT COALESCE(m.canonical, a.ticker) AS ticker, a.* EXCLUDE (ticker)
+                FROM adjustment_factors a LEFT JOIN ticker_map m ON a.ticker = m.raw
+                WHERE a.ticker IN (SELECT raw FROM ticker_map UNION SELECT canonical FROM ticker_map)
+            )
+        """)
+        conn.execute("""
+            DELETE FROM adjustment_factors
+            WHERE ticker IN (SELECT raw FROM ticker_map UNION SELECT canonical FROM ticker_map)
+        """)
+        conn.execute("INSERT INTO adjustment_factors BY NAME SELECT * FROM factors_canonical")
+
+        conn.execute("COMMIT")
+        return len(mapping)
+    except Exception as e:
+        if in_transaction:
+            conn.execute("ROLLBACK")
+        print(f"Error canonicalizing tickers: {e}")
+        return 0
+    finally:
+        conn.close()
+
+@traced
+def get_index_members(index_name, as_of=None):
+    """Get index constituents, current or as of a date (no network access)"""
+    conn = get_connection()
+    try:
+        if as_of is None:
+            return conn.execute("""
+                SELECT symbol, company_name, industry, isin, effective_from
+                FROM index_constituents
+                WHERE index_name = ? AND effective_to IS NULL
+                ORDER BY symbol
+            """, [index_name]).fetchdf()
+        return conn.execute("""
+            SELECT symbol, company_name, industry, isin, effective_from
+            FROM index_constituents
+            WHERE index_name = ? AND effective_from <= ?
+              AND (effective_to IS NULL OR effective_to > ?)
+            ORDER BY symbol
+        """, [index_name, as_of, as_of]).fetchdf()
+    except Exception as e:
+        print(f"Error getting members for {index_name}: {e}")
+        return pd.DataFrame()
+    finally:
+        conn.close()
+
+def get_index_source(index_name):
+    """Get stored HTTP validators and check times for an index list"""
+    conn = get_connection()
+    try:
+        row = conn.execute("""
+            SELECT url, etag, last_modified, checked_at, changed_at
+            FROM index_sources WHERE index_name = ?
+        """, [index_name]).fetchone()
+        if row is None:
+            return None
+        return dict(zip(['url', 'etag', 'last_modified', 'checked_at', 'changed_at'], row))
+    except Exception as e:
+        print(f"Error getting source for {index_name}: {e}")
+        return None
+    finally:
+        conn.close()
+
+def save_index_source(index_name, url, etag=None, last_modified=None, changed=False):
+    """Record a refresh check (and validators) for an index list"""
+    conn = get_connection()
+    try:
+        conn.execute("""
+            INSERT INTO index_sources (index_name, url, etag, last_modified, checked_at, changed_at)
+            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP, CASE WHEN ? THEN CURRENT_TIMESTAMP END)
+            ON CONFLICT (index_name) DO UPDATE SET
+                url = EXCLUDED.url,
+                etag = COALESCE(EXCLUDED.etag, index_sources.etag),
+                last_modified = COALESCE(EXCLUDED.last_modified, index_sources.last_modified),
+                checked_at = EXCLUDED.checked_at,
+                changed_at = COALESCE(EXCLUDED.changed_at, index_sources.changed_at)
+        """, [index_name, url, etag, last_modified, changed])
+        return True
+    except Exception as e:
+        print(f"Error saving source for {index_name}: {e}")
+        return False
+    finally:
+        conn.close()
+
+def save_index_members(index_name, members_df):
+    """Apply a fresh constituents list: close removed members, open new ones"""
+    conn = get_connection()
+    try:
+        conn.register('temp_members', members_df)
+        conn.execute("BEGIN TRANSACTION")
+        conn.execute("""
+            UPDATE index_constituents SET effective_to = CURRENT_DATE
+            WHERE index_name = ? AND effective_to IS NULL
+              AND symbol NOT IN (SELECT symbol FROM temp_members)
+        """, [index_name])
+        # Re-open members dropped and re-added on the same day
+        conn.execute("""
+            UPDATE index_constituents SET effective_to = NULL
+            WHERE index_name = ? AND effective_from = CURRENT_DATE AND effective_to = CURRENT_DATE
+              AND symbol IN (SELECT symbol FROM temp_members)
+        """, [index_name])
+        conn.execute("""
+            INSERT OR IGNORE INTO index_constituents
+                (index_name, symbol, company_name, industry, isin, effective_from, effective_to)
+            SELECT DISTINCT ON (symbol) ?, symbol, company_name, industry, isin, CURRENT_DATE, NULL
+            FROM temp_members
+            WHERE symbol NOT IN (
+                SELECT symbol FROM index_constituents
+                WHERE index_name = ? AND effective_to IS NULL
+            )
+        """, [index_name, index_name])
+        conn.execute("COMMIT")
+        return True
+    except Exception as e:
+        conn.execute("ROLLBACK")
+        print(f"Error saving members for {index_name}: {e}")
+        return False
+    finally:
+        conn.close()
+
+@traced
+def get_history_tickers():
+    """Every ticker with stored bars"""
+    conn = get_connection()
+    try:
+        return conn.execute("SELECT DISTINCT ticker FROM historical_data ORDER BY ticker").fetchdf()['ticker'].tolist()
+    except Exception as e:
+        print(f"Error getting history tickers: {e}")
+        return []
+    finally:
+        conn.close()
+
+@traced
+def get_history_coverage(tickers):
+    """Get first/last stored date, row count and last write time per ticker"""
+    conn = get_connection()
+    try:
+        return conn.execute("""
+            SELECT ticker, MIN(date) AS first_date, MAX(date) AS last_date, COUNT(*) AS rows,
+                   MAX(updated_at) AS updated_at
+            FROM historical_data
+            WHERE ticker IN (SELECT UNNEST(?))
+            GROUP BY ticker
+        """, [list(tickers)]).fetchdf()
+    except Exception as e:
+        print(f"Error getting history coverage: {e}")
+        return pd.DataFrame(columns=['ticker', 'first_date', 'last_date', 'rows', 'updated_at'])
+    finally:
+        conn.close()
+
+@traced
+def get_history_frame(tickers, start=None):
+    """Get stored bars for many tickers in long format (ticker, date, ...), adjusted"""
+    conn = get_connection()
+    try:
+        return conn.execute("""
+            SELECT ticker, date, open, high, low, close, volume, rsi, ma50, ma200, supertrend
+            FROM adjusted_history
+            WHERE ticker IN (SELECT UNNEST(?))
+              AND (CAST(? AS TIMESTAMP) IS NULL OR date >= CAST(? AS TIMESTAMP))
+            ORDER BY ticker, date
+        """, [list(tickers), start, start]).fetchdf()
+    except Exception as e:
+        print(f"Error getting history frame: {e}")
+        return pd.DataFrame()
+    finally:
+        conn.close()
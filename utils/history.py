@@ -0,0 +1,211 @@
+import threading
+import time
+import pandas as pd
+from utils.constants import HISTORY_RECHECK_SECONDS
+from utils.db import get_history_coverage, get_history_frame, save_historical_data_bulk, save_adjustment_factors
+from utils.indicators import add_indicator_columns
+from utils.symbols import resolve_symbols
+from utils.memory import shrink_frame
+from utils import provider
+
+# Read-through history: bars come from the DuckDB historical_data table the
+# batch job fills. Only symbols (or date ranges) that are missing or stale
+# are downloaded, and only those rows are written back.
+#
+# Bars are stored raw, with splits and dividends kept as factors in
+# adjustment_factors; readers get adjusted prices from the adjusted_history
+# view. Indicators are computed on the adjusted series and stored
+# de-adjusted, so a later corporate action rescales them along with the
+# prices instead of forcing a rewrite.
+
+PERIOD_DAYS = {'1mo': 31, '3mo': 92, '6mo': 183, '1y': 366, '2y': 731, '5y': 1827}
+
+OHLCV_COLUMNS = {'open': 'Open', 'high': 'High', 'low': 'Low', 'close': 'Close', 'volume': 'Volume'}
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close']
+PRICE_INDICATORS = ['ma50', 'ma200', 'supertrend'] # Scale with price; rsi does not
+
+_last_checked = {}  # symbol -> time.time() of the last provider check
+_last_checked_lock = threading.Lock()
+
+def period_start(period):
+    """Start date for a yfinance-style period string ('1y', '2y', ...)"""
+    return pd.Timestamp.today().normalize() - pd.Timedelta(days=PERIOD_DAYS.get(period, 366))
+
+def last_session_date():
+    """Most recent weekday on or before today"""
+    return pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=1)[0]
+
+def _plan_fetches(symbols, start, force=False):
+    """Group symbols by the date each one needs downloading from"""
+    coverage = get_history_coverage(symbols).set_index('ticker')
+    last_session = last_session_date()
+    now = time.time()
+
+    plan = {}
+    for sym in symbols:
+        with _last_checked_lock:
+            recently_checked = now - _last_checked.get(sym, 0) < HISTORY_RECHECK_SECONDS
+        if recently_checked and not force:
+            continue
+
+        if sym not in coverage.index:
+            fetch_from = start
+        elif coverage.at[sym, 'first_date'] > start + pd.Timedelta(days=7):
+            fetch_from = start # Backfill the requested range
+        elif force or coverage.at[sym, 'last_date'] < last_session:
+            # Re-read the last stored bar too, it may have been a partial day
+            fetch_from = coverage.at[sym, 'last_date'].normalize()
+        else:
+            continue
+
+        plan.setdefault(fetch_from, []).append(sym)
+    return plan
+
+def _download_bars(symbols, start):
+    """Download daily bars for symbols since start; returns {symbol: (raw OHLCV, actions)}"""
+    try:
+        data = provider.download(
+            symbols, start=start.strftime('%Y-%m-%d'), interval="1d",
+            auto_adjust=False, actions=True, progress=False, group_by='ticker'
+        )
+    except Exception as e:
+        print(f"History fetch error: {e}")
+        return {}
+
+    if data.empty:
+        return {}
+
+    frames = {}
+    for sym in symbols:
+        if isinstance(data.columns, pd.MultiIndex):
+            if sym not in data.columns.get_level_values(0):
+                continue
+            df = data[sym]
+        else:
+            df = data
+        df = df.dropna(subset=['Close'])
+        if not df.empty:
+            frames[sym] = _unadjust(sym, df)
+    return frames
+
+def _later_product(factors, index):
+    """Product of the factors dated strictly after each date in index"""
+    per_day = factors.groupby(level=0).prod().reindex(index, fill_value=1.0)
+    return per_day[::-1].cumprod()[::-1].shift(-1, fill_value=1.0)
+
+def _unadjust(symbol, df):
+    """Raw OHLCV and corporate actions from one symbol's provider bars.
+
+    The provider split-adjusts every bar for the splits after it, all of which
+    are inside the frame (it runs to the latest session), so they can be undone
+    here. Its closes are not dividend-adjusted.
+    """
+    df = df.copy()
+    df.index = pd.DatetimeIndex(df.index).tz_localize(None)
+    ratios = df['Stock Splits'].fillna(0) if 'Stock Splits' in df else pd.Series(0.0, index=df.index)
+    ratios = ratios[ratios > 0]
+    dividends = df['Dividends'].fillna(0) if 'Dividends' in df else pd.Series(0.0, index=df.index)
+    # Same (split-adjusted) basis as the dividend amount
+    prev_close = df['Close'].shift(1)
+    dividends = dividends[(dividends > 0) & prev_close.notna()]
+
+    later_splits = _later_product(ratios, df.index)
+    raw = df[list(OHLCV_COLUMNS.values())].copy()
+    raw[PRICE_COLUMNS] = raw[PRICE_COLUMNS].mul(later_splits, axis=0)
+    raw['Volume'] = raw['Volume'] / later_splits
+
+    actions = pd.concat([
+        pd.DataFrame({
+            'action': 'split', 'value': ratios,
+            'price_factor': 1 / ratios, 'volume_factor': ratios,
+        }),
+        pd.DataFrame({
+            'action': 'dividend', 'value': dividends,
+            'price_factor': 1 - dividends / prev_close[dividends.index], 'volume_factor': 1.0,
+        }),
+    ]).rename_axis('ex_date').reset_index().assign(ticker=symbol)
+    return raw, actions
+
+def _merge_bars(stored, raw, actions):
+    """Recompute indicators over stored + fresh bars.
+
+    stored is adjusted (already including actions); raw and actions come from
+    _unadjust. Returns the fresh rows to save: raw OHLCV with de-adjusted indicators.
+    """
+    price_factor = _later_product(actions.set_index('ex_date')['price_factor'], raw.index)
+    volume_factor = _later_product(actions.set_index('ex_date')['volume_factor'], raw.index)
+    fresh = raw.copy()
+    fresh[PRICE_COLUMNS] = fresh[PRICE_COLUMNS].mul(price_factor, axis=0)
+    fresh['Volume'] = fresh['Volume'] * volume_factor
+
+    if stored is not None and not stored.empty:
+        stored = stored.set_index('date')[list(OHLCV_COLUMNS)].rename(columns=OHLCV_COLUMNS)
+        merged = pd.concat([stored[stored.index < fresh.index.min()], fresh])
+    else:
+        merged = fresh
+    merged = merged[~merged.index.duplicated(keep='last')].sort_index()
+    merged.index.name = 'Date'
+
+    indicators = add_indicator_columns(merged).loc[raw.index, ['rsi'] + PRICE_INDICATORS]
+    indicators[PRICE_INDICATORS] = indicators[PRICE_INDICATORS].div(price_factor, axis=0)
+    rows = raw.join(indicators)
+    rows.index.name = 'Date'
+    return rows
+
+def sync_history(tickers, period="1y", force=False):
+    """Download missing or stale bars for tickers and store them.
+
+    Returns the list of symbols that were updated.
+    """
+    symbols = list(dict.fromkeys(resolve_symbols(pd.Series(list(tickers), dtype=object))))
+    if not symbols:
+        return []
+
+    start = period_start(period)
+    plan = _plan_fetches(symbols, start, force)
+    updated = []
+
+    for fetch_from, group in plan.items():
+        fresh = _download_bars(group, fetch_from)
+
+        with _last_checked_lock:
+            for sym in group:
+                _last_checked[sym] = time.time()
+
+        if not fresh:
+            continue
+
+        # Factors first: the stored bars read back below must already reflect them
+        save_adjustment_factors(pd.concat([actions for _, actions in fresh.values()], ignore_index=True))
+        stored = get_history_frame(list(fresh))
+        stored_by_symbol = dict(tuple(stored.groupby('ticker'))) if not stored.empty else {}
+        rows = {sym: _merge_bars(stored_by_symbol.get(sym), raw, actions) for sym, (raw, actions) in fresh.items()}
+        updated += save_historical_data_bulk(rows)
+
+    return updated
+
+def get_history(tickers, period="1y"):
+    """Long-format stored bars (ticker, date, OHLCV, indicators), filling gaps first"""
+    sync_history(tickers, period)
+    symbols = list(dict.fromkeys(resolve_symbols(pd.Series(list(tickers), dtype=object))))
+    # Compact only on the way out: sync_history merges full-precision stored bars
+    return shrink_frame(get_history_frame(symbols, period_start(period)))
+
+def get_ohlcv(ticker, period="2y"):
+    """yfinance-style OHLCV frame (Date index; Open/High/Low/Close/Volume) for one ticker"""
+    df = get_history([ticker], period)
+    if df.empty:
+        return pd.DataFrame()
+    df = df.set_index('date').rename(columns=OHLCV_COLUMNS)
+    df.index.name = 'Date'
+    return df[list(OHLCV_COLUMNS.values())]
+
+def get_close_matrix(tickers, period="1y"):
+    """Wide close-price matrix (date x symbol) for tickers"""
+    df = get_history(tickers, period)
+    if df.empty:
+        return pd.DataFrame()
+    matrix = df.pivot(index='date', columns='ticker', values='close').sort_index()
+    matrix.columns = matrix.columns.astype(object) # Plain labels when tickers are categorical
+    matrix.index.name = 'Date'
+    return matrix
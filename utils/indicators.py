@@ -1,5 +1,6 @@
 import pandas as pd
 import numpy as np
+from utils.tracing import traced
 
 def calculate_ma(data, period):
     """Calculate Simple Moving Average"""
@@ -28,64 +29,62 @@ def calculate_rsi(data, period=14):
     # Return the last value
     return rsi.iloc[-1]
 
+@traced
 def calculate_supertrend(ohlc_data, period=10, multiplier=2):
     """Calculate SuperTrend indicator"""
     if ohlc_data is None or len(ohlc_data) < period:
         return None
     
-    high = ohlc_data['High']
-    low = ohlc_data['Low']
-    close = ohlc_data['Close']
+    line, _ = supertrend_matrix(
+        ohlc_data[['High']].to_numpy(float), ohlc_data[['Low']].to_numpy(float),
+        ohlc_data[['Close']].to_numpy(float), period, multiplier
+    )
+    return line[:, 0].tolist()
+
+def rolling_mean_matrix(values, period):
+    """Trailing mean down the rows of a 2-D array (NaN until a full, gap-free window)"""
+    return pd.DataFrame(values).rolling(period).mean().to_numpy()
+
+@traced
+def supertrend_matrix(high, low, close, period=10, multiplier=3):
+    """
+    SuperTrend for aligned (dates x tickers) arrays.
     
-    # Calculate ATR
-    hl_avg = (high + low) / 2
-    tr = high - low
-    atr = tr.rolling(period).mean()
+    The bands are recursive, so this steps through dates, but each step
+    updates every column at once. A band restarts from its basic value
+    wherever the previous one is undefined (warm-up, gaps in the data).
     
-    # Calculate Basic Bands
+    Returns:
+        tuple: (line, bullish) arrays shaped like close; line is NaN during warm-up.
+    """
+    hl_avg = (high + low) / 2
+    atr = rolling_mean_matrix(high - low, period)
     basic_ub = hl_avg + multiplier * atr
     basic_lb = hl_avg - multiplier * atr
     
-    # Initialize Final Bands
-    final_ub = [None] * len(ohlc_data)
-    final_lb = [None] * len(ohlc_data)
-    
-    # Initialize SuperTrend
-    supertrend = [None] * len(ohlc_data)
+    rows, cols = close.shape
+    line = np.full((rows, cols), np.nan)
+    bullish = np.zeros((rows, cols), dtype=bool)
+    final_ub = np.full(cols, np.nan)
+    final_lb = np.full(cols, np.nan)
+    prev_close = np.full(cols, np.nan)
+    is_bull = np.zeros(cols, dtype=bool)
     
-    for i in range(len(ohlc_data)):
-        if i == 0:
-            final_ub[i] = basic_ub.iloc[i]
-            final_lb[i] = basic_lb.iloc[i]
-            supertrend[i] = final_ub[i]
-            continue
+    with np.errstate(invalid='ignore'):
+        for i in range(rows):
+            # Upper band only moves down while price stays below it (and vice versa)
+            final_ub = np.where(np.isnan(final_ub) | (basic_ub[i] < final_ub) | (prev_close > final_ub), basic_ub[i], final_ub)
+            final_lb = np.where(np.isnan(final_lb) | (basic_lb[i] > final_lb) | (prev_close < final_lb), basic_lb[i], final_lb)
             
-        # Upper Band Logic
-        if basic_ub.iloc[i] < final_ub[i-1] or close.iloc[i-1] > final_ub[i-1]:
-            final_ub[i] = basic_ub.iloc[i]
-        else:
-            final_ub[i] = final_ub[i-1]
-            
-        # Lower Band Logic
-        if basic_lb.iloc[i] > final_lb[i-1] or close.iloc[i-1] < final_lb[i-1]:
-            final_lb[i] = basic_lb.iloc[i]
-        else:
-            final_lb[i] = final_lb[i-1]
-            
-        # SuperTrend Logic
-        if supertrend[i-1] == final_ub[i-1]:
-            if close.iloc[i] <= final_ub[i]:
-                supertrend[i] = final_ub[i]
-            else:
-                supertrend[i] = final_lb[i]
-        else:
-            if close.iloc[i] >= final_lb[i]:
-                supertrend[i] = final_lb[i]
-            else:
-                supertrend[i] = final_ub[i]
-                
-    return supertrend
+            # Bearish flips up on a close above the upper band; bullish flips down below the lower
+            is_bull = np.where(is_bull, close[i] >= final_lb, close[i] > final_ub) & ~np.isnan(final_ub)
+            line[i] = np.where(is_bull, final_lb, final_ub)
+            bullish[i] = is_bull
+            prev_close = close[i]
+    
+    return line, bullish
 
+@traced
 def calculate_all_indicators(hist_data):
     """Calculate common indicators for a stock (returns full series for plotting)"""
     if hist_data is None or hist_data.empty:
@@ -122,3 +121,16 @@ def calculate_rsi_series(data, period=14):
     loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
     rs = gain / loss.replace(0, np.nan)
     return 100 - (100 / (1 + rs))
+
+@traced
+def add_indicator_columns(hist_data):
+    """Add the stored indicator columns (rsi, ma50, ma200, supertrend) to OHLC data"""
+    df = hist_data.copy()
+    df['rsi'] = calculate_rsi_series(df['Close'], 14)
+    df['ma50'] = calculate_ma_series(df['Close'], 50)
+    df['ma200'] = calculate_ma_series(df['Close'], 200)
+    
+    # SuperTrend (10,3) is the one persisted; implementation returns a list
+    supertrend = calculate_supertrend(df, 10, 3)
+    df['supertrend'] = pd.Series(supertrend, index=df.index, dtype=float) if supertrend else np.nan
+    return df
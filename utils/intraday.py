@@ -0,0 +1,285 @@
+import os
+import shutil
+import pandas as pd
+from utils.constants import INTRADAY_DIR, INTRADAY_RETENTION_DAYS, INTRADAY_FETCH_PERIODS
+from utils.db import get_connection
+from utils.history import OHLCV_COLUMNS
+from utils.indicators import add_indicator_columns
+from utils.symbols import resolve_symbol, resolve_symbols
+from utils.memory import shrink_frame
+from utils import provider
+
+# Intraday bars are kept outside the DuckDB file as Hive-partitioned Parquet:
+#   <INTRADAY_DIR>/interval=5m/date=2026-10-16/bars.parquet
+# A filter on `date` prunes whole files, so a read costs the same however
+# much history is retained. Higher timeframes are derived in DuckDB with
+# time_bucket(); 1h and 1d buckets are also materialized in the
+# intraday_rollups table so long-range charts never rescan minute bars.
+
+# timeframe -> (source, bucket width); a source is a base interval, '1d' (the
+# daily rollup) or 'rollup' (read the materialized buckets directly)
+TIMEFRAMES = {
+    '1m': ('1m', None),
+    '5m': ('5m', None),
+    '15m': ('5m', '15 minutes'),
+    '30m': ('5m', '30 minutes'),
+    '1h': ('rollup', None),
+    '1d': ('rollup', None),
+    '1wk': ('1d', '1 week'),
+    '1mo': ('1d', '1 month'),
+}
+ROLLUPS = {'1h': '1 hour', '1d': '1 day'} # Materialized from ROLLUP_SOURCE on every write
+ROLLUP_SOURCE = '5m' # Longest-retained base interval
+
+# Buckets start at the NSE open (09:15), so 15m/1h bars line up with the session
+SESSION_ORIGIN = "TIMESTAMP '2000-01-03 09:15:00'"
+
+BAR_COLUMNS = ['ticker', 'ts', 'open', 'high', 'low', 'close', 'volume']
+
+def partition_path(interval, date):
+    """Parquet file holding one interval's bars for one date"""
+    return os.path.join(INTRADAY_DIR, f"interval={interval}", f"date={pd.Timestamp(date):%Y-%m-%d}", "bars.parquet")
+
+def _scan_pattern(interval):
+    """Glob over every partition of an interval, bound as $pattern in _SCAN"""
+    return os.path.join(INTRADAY_DIR, f"interval={interval}", "*", "*.parquet")
+
+_SCAN = "read_parquet($pattern, hive_partitioning = true)" # date becomes a column
+
+def _has_partitions(interval):
+    root = os.path.join(INTRADAY_DIR, f"interval={interval}")
+    return os.path.isdir(root) and any(os.scandir(root))
+
+def _bucket_sql(source, width):
+    """OHLCV aggregated into `width` buckets from a bars relation (ticker, ts, ...)"""
+    return f"""
+        SELECT
+            ticker,
+            time_bucket(INTERVAL '{width}', ts, {SESSION_ORIGIN}) AS ts,
+            arg_min(open, ts) AS open,
+            MAX(high) AS high,
+            MIN(low) AS low,
+            arg_max(close, ts) AS close,
+            SUM(volume) AS volume
+        FROM {source}
+        GROUP BY ALL
+    """
+
+def _bump_generation(conn, tickers):
+    conn.execute("""
+        INSERT INTO intraday_writes (ticker, generation)
+        SELECT UNNEST($tickers), 1
+        ON CONFLICT (ticker) DO UPDATE SET generation = generation + 1
+    """, {'tickers': tickers})
+
+def save_intraday_bars(interval, bars):
+    """Merge long-format bars (ticker, ts, OHLCV) into their date partitions; returns dates written"""
+    if bars.empty:
+        return []
+    bars = bars[BAR_COLUMNS].copy()
+    bars['ts'] = pd.to_datetime(bars['ts'])
+    dates = sorted(bars['ts'].dt.normalize().unique())
+
+    conn = get_connection()
+    try:
+        for date in dates:
+            path = partition_path(interval, date)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            day = bars[bars['ts'].dt.normalize() == date]
+            conn.register('new_bars', day)
+
+            # New bars win over stored ones for the same (ticker, ts)
+            existing = "SELECT *, 0 AS src FROM read_parquet($path)" if os.path.exists(path) else None
+            merged = f"""
+                SELECT {', '.join(BAR_COLUMNS)} FROM (
+                    {existing + ' UNION ALL BY NAME' if existing else ''}
+                    SELECT *, 1 AS src FROM new_bars
+                )
+                QUALIFY ROW_NUMBER() OVER (PARTITION BY ticker, ts ORDER BY src DESC) = 1
+                ORDER BY ticker, ts
+            """
+            tmp_path = path + ".tmp"
+            params = {'tmp_path': tmp_path, **({'path': path} if existing else {})}
+            conn.execute(f"COPY ({merged}) TO $tmp_path (FORMAT parquet)", params)
+            os.replace(tmp_path, path)
+            conn.unregister('new_bars')
+        _bump_generation(conn, bars['ticker'].unique().tolist())
+    except Exception as e:
+        print(f"Error saving {interval} bars: {e}")
+        return []
+    finally:
+        conn.close()
+
+    if interval == ROLLUP_SOURCE:
+        refresh_rollups(bars['ticker'].unique().tolist(), dates)
+    return dates
+
+def refresh_rollups(tickers, dates):
+    """Rebuild the materialized 1h / 1d buckets for these tickers on these dates"""
+    dates = [pd.Timestamp(d).date() for d in dates]
+    conn = get_connection()
+    try:
+        conn.execute("BEGIN TRANSACTION")
+        for timeframe, width in ROLLUPS.items():
+            conn.execute("""
+                DELETE FROM intraday_rollups
+                WHERE timeframe = ? AND ticker IN (SELECT UNNEST(?)) AND CAST(bucket AS DATE) IN (SELECT UNNEST(?))
+            """, [timeframe, tickers, dates])
+            source = f"""(
+                SELECT ticker, ts, open, high, low, close, volume FROM {_SCAN}
+                WHERE date IN (SELECT UNNEST($dates)) AND ticker IN (SELECT UNNEST($tickers))
+            )"""
+            conn.execute(f"""
+                INSERT INTO intraday_rollups (ticker, timeframe, bucket, open, high, low, close, volume)
+                SELECT ticker, $timeframe, ts, open, high, low, close, volume
+                FROM ({_bucket_sql(source, width)})
+            """, {'dates': dates, 'tickers': tickers, 'timeframe': timeframe, 'pattern': _scan_pattern(ROLLUP_SOURCE)})
+        conn.execute("COMMIT")
+    except Exception as e:
+        conn.execute("ROLLBACK")
+        print(f"Error refreshing intraday rollups: {e}")
+    finally:
+        conn.close()
+
+def apply_retention(today=None):
+    """Delete base-interval partitions older than INTRADAY_RETENTION_DAYS (rollups are kept)"""
+    today = pd.Timestamp(today or pd.Timestamp.today()).normalize()
+    removed = 0
+    for interval, days in INTRADAY_RETENTION_DAYS.items():
+        root = os.path.join(INTRADAY_DIR, f"interval={interval}")
+        if not os.path.isdir(root):
+            continue
+        cutoff = today - pd.Timedelta(days=days)
+        for entry in os.scandir(root):
+            if entry.is_dir() and entry.name.startswith("date="):
+                if pd.Timestamp(entry.name[len("date="):]) < cutoff:
+                    shutil.rmtree(entry.path)
+                    removed += 1
+    return removed
+
+def _download_intraday(symbols, interval):
+    """Download recent bars at a base interval; returns long-format bars"""
+    try:
+        data = provider.download(
+            symbols, period=INTRADAY_FETCH_PERIODS[interval], interval=interval,
+            auto_adjust=True, progress=False, group_by='ticker'
+        )
+    except Exception as e:
+        print(f"Intraday fetch error ({interval}): {e}")
+        return pd.DataFrame(columns=BAR_COLUMNS)
+
+    if data.empty or not isinstance(data.columns, pd.MultiIndex):
+        return pd.DataFrame(columns=BAR_COLUMNS)
+
+    frames = []
+    for sym in symbols:
+        if sym not in data.columns.get_level_values(0):
+            continue
+        df = data[sym].dropna(subset=['Close'])
+        if df.empty:
+            continue
+        df = df[list(OHLCV_COLUMNS.values())].rename(columns={v: k for k, v in OHLCV_COLUMNS.items()})
+        # Keep exchange wall-clock time; buckets are aligned to the session open
+        df.index = pd.DatetimeIndex(df.index).tz_localize(None)
+        frames.append(df.rename_axis('ts').reset_index().assign(ticker=sym))
+
+    if not frames:
+        return pd.DataFrame(columns=BAR_COLUMNS)
+    return pd.concat(frames, ignore_index=True)[BAR_COLUMNS]
+
+def sync_intraday(tickers):
+    """Fetch the provider's recent 1m and 5m bars for tickers and store them; returns rows stored"""
+    symbols = list(dict.fromkeys(resolve_symbols(list(tickers))))
+    if not symbols:
+        return 0
+
+    stored = 0
+    for interval in INTRADAY_FETCH_PERIODS:
+        bars = _download_intraday(symbols, interval)
+        if save_intraday_bars(interval, bars):
+            stored += len(bars)
+    apply_retention()
+    return stored
+
+def get_intraday_coverage(ticker):
+    """(first, last) hourly bucket stored for a ticker, or None when it has no intraday bars"""
+    symbol = resolve_symbol(ticker)
+    conn = get_connection()
+    try:
+        row = conn.execute("""
+            SELECT MIN(bucket), MAX(bucket) FROM intraday_rollups WHERE ticker = ? AND timeframe = '1h'
+        """, [symbol]).fetchone()
+        return row if row and row[0] is not None else None
+    except Exception as e:
+        print(f"Error reading intraday coverage: {e}")
+        return None
+    finally:
+        conn.close()
+
+def get_intraday_generation(ticker):
+    """Write counter for a ticker's intraday bars; changes whenever any interval is stored"""
+    symbol = resolve_symbol(ticker)
+    conn = get_connection()
+    try:
+        row = conn.execute("SELECT generation FROM intraday_writes WHERE ticker = ?", [symbol]).fetchone()
+        return row[0] if row else 0
+    except Exception as e:
+        print(f"Error reading intraday generation: {e}")
+        return None
+    finally:
+        conn.close()
+
+def get_bars(tickers, timeframe, start=None, end=None):
+    """Long-format OHLCV bars (ticker, ts, ...) at any timeframe in TIMEFRAMES"""
+    if timeframe not in TIMEFRAMES:
+        raise ValueError(f"Unknown timeframe {timeframe}")
+    symbols = list(dict.fromkeys(resolve_symbols(list(tickers))))
+    source, width = TIMEFRAMES[timeframe]
+    params = {
+        'tickers': symbols,
+        'start': pd.Timestamp(start) if start is not None else None,
+        'end': pd.Timestamp(end) if end is not None else None,
+    }
+    window = """
+        ticker IN (SELECT UNNEST($tickers))
+        AND (CAST($start AS TIMESTAMP) IS NULL OR {col} >= CAST($start AS TIMESTAMP))
+        AND (CAST($end AS TIMESTAMP) IS NULL OR {col} <= CAST($end AS TIMESTAMP))
+    """
+
+    if source == 'rollup' or source == '1d':
+        rollup = timeframe if source == 'rollup' else '1d'
+        bars = f"""(
+            SELECT ticker, bucket AS ts, open, high, low, close, volume FROM intraday_rollups
+            WHERE timeframe = '{rollup}' AND {window.format(col='bucket')}
+        )"""
+    else:
+        if not _has_partitions(source):
+            return pd.DataFrame(columns=BAR_COLUMNS)
+        # The date predicates are what let DuckDB skip partitions
+        bars = f"""(
+            SELECT ticker, ts, open, high, low, close, volume FROM {_SCAN}
+            WHERE {window.format(col='ts')}
+              AND (CAST($start AS DATE) IS NULL OR date >= CAST($start AS DATE))
+              AND (CAST($end AS DATE) IS NULL OR date <= CAST($end AS DATE))
+        )"""
+        params['pattern'] = _scan_pattern(source)
+
+    query = _bucket_sql(bars, width) if width else f"SELECT * FROM {bars}"
+    conn = get_connection()
+    try:
+        return conn.execute(f"SELECT * FROM ({query}) ORDER BY ticker, ts", params).fetchdf()
+    except Exception as e:
+        print(f"Error reading {timeframe} bars: {e}")
+        return pd.DataFrame(columns=BAR_COLUMNS)
+    finally:
+        conn.close()
+
+def get_intraday_frame(ticker, timeframe, start=None, end=None):
+    """One ticker's bars at a timeframe with indicators, shaped like db.get_historical_data()"""
+    bars = get_bars([ticker], timeframe, start, end)
+    if bars.empty:
+        return pd.DataFrame()
+    ohlcv = bars.set_index('ts')[list(OHLCV_COLUMNS)].rename(columns=OHLCV_COLUMNS)
+    df = add_indicator_columns(ohlcv)
+    df.columns = [c.lower() for c in df.columns]
+    return shrink_frame(df.rename_axis('date').reset_index().assign(ticker=bars['ticker'].iloc[0]))
@@ -1,155 +1,188 @@
-import yfinance as yf
 import pandas as pd
-import requests
-import streamlit as st
-from io import StringIO
-from utils.constants import NSE_INDICES_URLS, GOLD_PROXY, USD_INR_TICKER, TROY_OZ_TO_GRAMS
+import threading
+from utils.constants import GOLD_PROXY, USD_INR_TICKER, TROY_OZ_TO_GRAMS
+from utils.quote_cache import get_quote_cache
+from utils.quote_batcher import QuoteBatcher
+from utils.symbols import resolve_symbol
+from utils.constituents import get_constituents
+from utils.alerts import evaluate_quote_alerts
+from utils.tracing import span, traced
+from utils import provider
 
-@st.cache_data(ttl=300)
 def get_live_price(ticker):
     """Get live price for a single ticker"""
     if not ticker:
         return None
-        
+
     symbol = format_ticker(ticker)
-    try:
-        data = yf.Ticker(symbol).history(period="1d")
-        if not data.empty:
-            return data['Close'].iloc[-1]
-    except Exception:
-        pass
+    quote = get_live_prices_bulk([ticker]).get(symbol)
+    if quote:
+        return quote['price']
     return None
 
-@st.cache_data(ttl=60)
 def get_live_prices_bulk(tickers):
-    """Get live prices and daily change for multiple tickers in parallel"""
+    """Get live prices and daily change for multiple tickers.
+
+    Served per symbol from the shared quote cache; only symbols that are
+    missing or expired are downloaded, via the shared quote batcher.
+    """
     if not tickers:
         return {}
-    
-    # Format all tickers
-    symbols = [format_ticker(t) for t in tickers]
-    formatted_str = " ".join(symbols)
-    
+
+    with span("market_data.get_live_prices_bulk") as record:
+        # Format all tickers
+        symbols = list(dict.fromkeys(format_ticker(t) for t in tickers))
+
+        results, missing = get_quote_cache().get_many(symbols)
+        record.update(rows=len(symbols), cache_hits=len(symbols) - len(missing), cache_misses=len(missing))
+
+        if missing:
+            # Deduplicated against concurrent lookups and batched with them
+            results.update(_get_quote_batcher().get_many(missing))
+
+        return {sym: results.get(sym) for sym in symbols}
+
+@traced
+def refresh_live_prices(tickers):
+    """Force a download of tickers (bypassing TTLs) and store them in the quote cache"""
+    symbols = list(dict.fromkeys(format_ticker(t) for t in tickers))
+    if not symbols:
+        return {}
+
+    fetched = _download_quotes(symbols)
+    if fetched is None:
+        return {}
+    get_quote_cache().put_many(fetched)
+    evaluate_quote_alerts(fetched)
+    return fetched
+
+def invalidate_quotes(tickers):
+    """Drop cached quotes for tickers so their next lookup goes to the provider"""
+    get_quote_cache().invalidate(format_ticker(t) for t in tickers)
+
+def clear_quote_cache():
+    """Drop every cached quote, including other sessions' (admin action)"""
+    get_quote_cache().clear()
+
+def quote_from_closes(series):
+    """Build a {price, change, pct} quote from a series of daily closes"""
+    series = series.dropna()
+    if series.empty:
+        return None
+
+    # Get last valid price
+    current_price = float(series.iloc[-1])
+
+    # Get previous close
+    # If we have at least 2 days of data
+    if len(series) >= 2:
+        prev_close = float(series.iloc[-2])
+        change = current_price - prev_close
+        pct_change = (change / prev_close) * 100 if prev_close else 0.0
+        return {
+            "price": current_price,
+            "change": change,
+            "pct": pct_change
+        }
+
+    # Fallback if only 1 data point (e.g. effective IPO or error)
+    return {
+        "price": current_price,
+        "change": 0.0,
+        "pct": 0.0
+    }
+
+def _fetch_and_cache_quotes(symbols):
+    """Batcher fetch function: re-check the cache, download the rest, store them"""
+    cache = get_quote_cache()
+    results, missing = cache.get_many(symbols)
+    if missing:
+        fetched = _download_quotes(missing)
+        if fetched is not None:
+            cache.put_many(fetched)
+            evaluate_quote_alerts(fetched)
+            results.update(fetched)
+    return results
+
+_quote_batcher = None
+_quote_batcher_lock = threading.Lock()
+
+def _get_quote_batcher():
+    """Process-wide QuoteBatcher shared by every session"""
+    global _quote_batcher
+    if _quote_batcher is None:
+        with _quote_batcher_lock:
+            if _quote_batcher is None:
+                _quote_batcher = QuoteBatcher(_fetch_and_cache_quotes)
+    return _quote_batcher
+
+@traced
+def _download_quotes(symbols):
+    """Download quotes for already-formatted symbols in one request.
+
+    Returns symbol -> quote (None when the provider had no data), or None
+    if the request itself failed so that nothing gets cached.
+    """
     try:
         # Use bulk download - fetch 5d to ensure we get previous close
-        data = yf.download(formatted_str, period="5d", threads=True, progress=False)
-        
-        results = {}
-        
-        # Helper to process a single ticker's series
-        def process_series(series):
-            if series.empty:
-                return None
-            
-            # Get last valid price
-            current_price = series.iloc[-1]
-            
-            # Get previous close
-            # If we have at least 2 days of data
-            if len(series) >= 2:
-                prev_close = series.iloc[-2]
-                change = current_price - prev_close
-                pct_change = (change / prev_close) * 100
-                return {
-                    "price": current_price,
-                    "change": change,
-                    "pct": pct_change
-                }
-            else:
-                # Fallback if only 1 data point (e.g. effective IPO or error)
-                return {
-                    "price": current_price,
-                    "change": 0.0,
-                    "pct": 0.0
-                }
-
-        # Handling yfinance multiple tickers vs single ticker structure
-        if len(symbols) == 1:
-            sym = symbols[0]
-            if 'Close' in data:
-                 val = data['Close']
-                 if isinstance(val, pd.DataFrame): # Sometimes yf returns DF for single ticker if configured differently
-                    val = val.iloc[:, 0]
-                 results[sym] = process_series(val)
-        else:
-             if 'Close' in data:
-                 close_data = data['Close']
-                 for sym in symbols:
-                     if sym in close_data:
-                         results[sym] = process_series(close_data[sym])
-                     else:
-                         results[sym] = None
-        
-        return results
+        data = provider.download(symbols, period="5d", threads=True, progress=False)
     except Exception as e:
         print(f"Bulk fetch error: {e}")
-        return {}
+        return None
+
+    results = {}
+    if 'Close' not in data:
+        return {sym: None for sym in symbols}
+
+    close_data = data['Close']
+
+    # Handling yfinance multiple tickers vs single ticker structure
+    if isinstance(close_data, pd.Series):
+        close_data = close_data.to_frame(symbols[0])
+    elif len(symbols) == 1 and symbols[0] not in close_data:
+        close_data = close_data.iloc[:, :1].set_axis(symbols, axis=1)
+
+    for sym in symbols:
+        if sym in close_data:
+            results[sym] = quote_from_closes(close_data[sym])
+        else:
+            results[sym] = None
+
+    return results
 
 
 def format_ticker(ticker):
-    """Ensure NSE tickers have .NS suffix"""
-    ticker = str(ticker).strip().upper()
-    
-    # Known NSE keywords/patterns if not already suffixed
-    nse_keywords = ['HDFC', 'RELI', 'ITC', 'LICI', 'NIFTY', 'BANK', 'SGB', 'GOLDBEES', 'SILVER', 'TATVA']
-    
-    if not ticker.endswith('.NS') and not ticker.endswith('.BO') and not '=' in ticker and not ticker.startswith('^'):
-        # Heuristic: if it looks like an Indian stock, add .NS
-        if any(k in ticker for k in nse_keywords) or len(ticker) < 10: # Assuming short tickers are likely symbols
-             return f"{ticker}.NS"
-             
-    return ticker
-
-@st.cache_data(ttl=300)
+    """Canonical provider symbol for a ticker (symbol master, then .NS heuristic)"""
+    return resolve_symbol(ticker)
+
 def get_gold_metrics():
     """Fetch Comex Gold, USD/INR and calculate Gold INR/gram"""
-    try:
-        gold = yf.Ticker(GOLD_PROXY).history(period="1d")
-        usd = yf.Ticker(USD_INR_TICKER).history(period="1d")
-        
-        if not gold.empty and not usd.empty:
-            price_usd_oz = gold['Close'].iloc[-1]
-            usd_inr = usd['Close'].iloc[-1]
-            
-            price_inr_gram = (price_usd_oz * usd_inr) / TROY_OZ_TO_GRAMS
-            
-            return {
-                'usd_oz': price_usd_oz,
-                'usd_inr': usd_inr,
-                'inr_gram': price_inr_gram
-            }
-    except Exception:
-        pass
+    quotes = get_live_prices_bulk([GOLD_PROXY, USD_INR_TICKER])
+    return gold_metrics_from_quotes(quotes)
+
+def gold_metrics_from_quotes(quotes):
+    """Gold INR/gram from a get_live_prices_bulk() result containing GC=F and INR=X"""
+    gold = quotes.get(format_ticker(GOLD_PROXY))
+    usd = quotes.get(format_ticker(USD_INR_TICKER))
+
+    if gold and usd:
+        price_usd_oz = gold['price']
+        usd_inr = usd['price']
+
+        price_inr_gram = (price_usd_oz * usd_inr) / TROY_OZ_TO_GRAMS
+
+        return {
+            'usd_oz': price_usd_oz,
+            'usd_inr': usd_inr,
+            'inr_gram': price_inr_gram
+        }
     return None
 
-@st.cache_data(ttl=3600)
 def get_nse_stock_list(index_name):
-    """Fetch list of stocks for a given NSE Index"""
-    urls = NSE_INDICES_URLS.get(index_name, [])
-    
-    # Generic headers to avoid blocking
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-    }
-    
-    for url in urls:
-        try:
-            response = requests.get(url, headers=headers, timeout=10)
-            if response.status_code == 200:
-                df = pd.read_csv(StringIO(response.content.decode('utf-8')))
-                
-                # Find symbol column
-                col = next((c for c in df.columns if 'symbol' in c.lower()), None)
-                if col:
-                    symbols = df[col].dropna().unique().tolist()
-                    # Add .NS
-                    return [f"{s}.NS" for s in symbols]
-        except Exception as e:
-            print(f"Failed to fetch {url}: {e}")
-            continue
-            
-    return []
+    """List of stocks for a given NSE Index (local store, refreshed in background)"""
+    return get_constituents(index_name)
 
+@traced
 def get_historical_data(tickers, period="1y"):
     """Fetch historical data for multiple tickers"""
     try:
@@ -158,7 +191,7 @@ def get_historical_data(tickers, period="1y"):
         else:
             tickers_str = tickers
             
-        data = yf.download(tickers_str, period=period, progress=False)
+        data = provider.download(tickers_str, period=period, progress=False)
         
         # Handle multi-index columns if essential
         if 'Adj Close' in data:
@@ -0,0 +1,182 @@
+import functools
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from utils.constants import COMPACT_FRAMES, FRAME_CACHE_BUDGET_MB
+
+# Two ways to fit more sessions in one process:
+#   * compact frames: history frames leave utils/db.py with float32 price
+#     and indicator columns, categorical tickers and datetime64 dates
+#     (well under half the bytes); opt-in with STOCK_APP_COMPACT=1.
+#   * budgeted caches: page-level caches share one byte budget per process
+#     and evict least-recently-used entries across all of them. A hit hands
+#     out shallow copies of cached frames instead of an unpickled deep copy
+#     per hit (st.cache_data). Under copy-on-write (always on from pandas 3)
+#     they share the cached buffers until a caller writes to them; without
+#     it a hit gets a deep copy, so no caller can change the entry either
+#     way. Other values (dicts, figures) are shared as they are and must be
+#     treated as read-only.
+
+KEEP_FLOAT64 = {'volume', 'Volume'} # Counts that need more than float32's 24-bit mantissa
+
+def compact_frame(df):
+    """float32 floats (except volume), categorical tickers and datetime64 dates"""
+    if df is None or df.empty:
+        return df
+    df = df.copy(deep=False)
+    for column in df.columns:
+        series = df[column]
+        if series.dtype == np.float64 and column not in KEEP_FLOAT64:
+            df[column] = series.astype(np.float32)
+        elif column == 'ticker' and not isinstance(series.dtype, pd.CategoricalDtype):
+            df[column] = series.astype('category')
+        elif column in ('date', 'ts') and series.dtype == object:
+            df[column] = pd.to_datetime(series)
+    if df.index.dtype == object and df.index.name in ('date', 'Date'):
+        df.index = pd.DatetimeIndex(df.index, name=df.index.name)
+    return df
+
+def shrink_frame(df):
+    """compact_frame() in compact mode, otherwise df unchanged"""
+    return compact_frame(df) if COMPACT_FRAMES else df
+
+def _copy_on_write():
+    """Whether shallow frame copies are isolated from writes (pandas 3, or pandas 2 with the option set)"""
+    return int(pd.__version__.split('.')[0]) >= 3 or pd.get_option("mode.copy_on_write") is True
+
+def _detach(value):
+    """Copies of the frames in a cached value that a caller can write to (tuples and lists rebuilt around them)"""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy(deep=not _copy_on_write())
+    if isinstance(value, (tuple, list)):
+        return type(value)(_detach(v) for v in value)
+    return value
+
+def value_bytes(value):
+    """Approximate resident size of a cached value"""
+    if isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum() if hasattr(usage, 'sum') else usage)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sum(value_bytes(v) for v in value)
+    if isinstance(value, dict):
+        return sum(value_bytes(v) for v in value.values())
+    if isinstance(value, str):
+        return len(value)
+    return sys.getsizeof(value)
+
+class _Budget:
+    """Entries of every budgeted cache, in one least-recently-used order"""
+
+    def __init__(self, limit_bytes):
+        self.limit = limit_bytes
+        self.entries = OrderedDict()  # (cache, key) -> (value, nbytes, expires_at)
+        self.stats = {}  # cache -> counters
+        self.bytes = 0
+        self.lock = threading.Lock()
+
+    def _stats(self, cache):
+        return self.stats.setdefault(cache, {'entries': 0, 'bytes': 0, 'hits': 0, 'misses': 0, 'evictions': 0})
+
+    def _drop(self, slot, evicted=False):
+        _, nbytes, _ = self.entries.pop(slot)
+        stats = self._stats(slot[0])
+        stats['entries'] -= 1
+        stats['bytes'] -= nbytes
+        stats['evictions'] += evicted
+        self.bytes -= nbytes
+
+    def get(self, cache, key):
+        """(True, value) on a live hit, else (False, None)"""
+        slot = (cache, key)
+        with self.lock:
+            entry = self.entries.get(slot)
+            if entry is not None and (entry[2] is None or entry[2] > time.time()):
+                self.entries.move_to_end(slot)
+                self._stats(cache)['hits'] += 1
+                return True, entry[0]
+            if entry is not None:
+                self._drop(slot)
+            self._stats(cache)['misses'] += 1
+            return False, None
+
+    def put(self, cache, key, value, ttl=None, max_entries=None):
+        nbytes = value_bytes(value)
+        if nbytes > self.limit:
+            return # Would evict everything else; serve it uncached
+        slot = (cache, key)
+        with self.lock:
+            if slot in self.entries:
+                self._drop(slot)
+            self.entries[slot] = (value, nbytes, time.time() + ttl if ttl else None)
+            stats = self._stats(cache)
+            stats['entries'] += 1
+            stats['bytes'] += nbytes
+            self.bytes += nbytes
+
+            # Per-cache entry cap first, then the shared byte budget
+            if max_entries and stats['entries'] > max_entries:
+                oldest = next(s for s in self.entries if s[0] == cache)
+                self._drop(oldest, evicted=True)
+            while self.bytes > self.limit:
+                self._drop(next(iter(self.entries)), evicted=True)
+
+    def clear(self, cache=None):
+        with self.lock:
+            for slot in [s for s in self.entries if cache is None or s[0] == cache]:
+                self._drop(slot)
+
+_budget = _Budget(FRAME_CACHE_BUDGET_MB << 20)
+
+def budgeted_cache(name, ttl=None, max_entries=None):
+    """
+    Memoize a function in the process-wide byte budget.
+
+    Arguments are keyed by repr(), so lists and tuples work; ttl (seconds)
+    expires entries, max_entries caps this cache alone.
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = repr((args, sorted(kwargs.items())))
+            hit, value = _budget.get(name, key)
+            if hit:
+                return _detach(value)
+            value = func(*args, **kwargs)
+            _budget.put(name, key, value, ttl, max_entries)
+            return _detach(value)
+        wrapper.clear = lambda: _budget.clear(name)
+        return wrapper
+    return decorate
+
+def clear_budgeted_caches():
+    _budget.clear()
+
+def cache_report():
+    """Per-cache entries, resident bytes, hits, misses and evictions"""
+    with _budget.lock:
+        report = pd.DataFrame.from_dict(_budget.stats, orient='index')
+    if report.empty:
+        return report
+    lookups = report['hits'] + report['misses']
+    report['hit_rate'] = (report['hits'] / lookups.where(lookups > 0)) * 100
+    report.index.name = 'cache'
+    return report.sort_values('bytes', ascending=False)
+
+def budget_usage():
+    """(bytes held by budgeted caches, budget in bytes)"""
+    return _budget.bytes, _budget.limit
+
+def resident_bytes():
+    """Resident set size of this process (None where /proc is unavailable)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return None
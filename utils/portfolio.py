@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+from utils.constants import GOLD_PROXY, USD_INR_TICKER
+from utils.market_data import get_live_prices_bulk, format_ticker, gold_metrics_from_quotes
+
+def value_portfolio(holdings_df):
+    """Value holdings against live quotes in a single bulk fetch.
+
+    Returns the holdings with symbol, live_price, day_change, day_change_pct,
+    invested_value, current_value, pnl, pnl_pct, weight and, for SGB rows,
+    gold_value / gold_premium_pct benchmarked against gold INR/gram.
+    """
+    if holdings_df is None or holdings_df.empty:
+        return pd.DataFrame()
+
+    df = holdings_df.copy().reset_index(drop=True)
+
+    # Resolve each distinct ticker once
+    unique_tickers = df['ticker'].astype(str).unique()
+    symbol_map = {t: format_ticker(t) for t in unique_tickers}
+    df['symbol'] = df['ticker'].astype(str).map(symbol_map)
+
+    # One round trip for every holding plus the gold benchmark inputs
+    quotes = get_live_prices_bulk(list(unique_tickers) + [GOLD_PROXY, USD_INR_TICKER])
+
+    quote_df = pd.DataFrame.from_dict(
+        {sym: (quotes.get(sym) or {}) for sym in symbol_map.values()},
+        orient='index'
+    ).reindex(columns=['price', 'change', 'pct'])
+
+    df['live_price'] = df['symbol'].map(quote_df['price']).astype(float)
+    day_change = df['symbol'].map(quote_df['change']).astype(float).fillna(0)
+    df['day_change_pct'] = df['symbol'].map(quote_df['pct']).astype(float).fillna(0)
+
+    # Valuation
+    df['invested_value'] = df['shares'] * df['buy_price']
+    df['current_value'] = df['shares'] * df['live_price'].fillna(0)
+    df['day_change'] = df['shares'] * day_change
+    df['pnl'] = df['current_value'] - df['invested_value']
+    df['pnl_pct'] = (
+        df['pnl'] / df['invested_value'].replace(0, np.nan) * 100
+    ).fillna(0)
+
+    total_current = df['current_value'].sum()
+    df['weight'] = df['current_value'] / total_current * 100 if total_current > 0 else 0.0
+
+    # SGB benchmarking (1 unit = 1 gram of gold)
+    gold = gold_metrics_from_quotes(quotes)
+    is_sgb = df['asset_type'] == 'SGB'
+    if gold:
+        df['gold_value'] = np.where(is_sgb, df['shares'] * gold['inr_gram'], np.nan)
+        df['gold_premium_pct'] = (df['current_value'] / df['gold_value'] - 1) * 100
+    else:
+        df['gold_value'] = np.nan
+        df['gold_premium_pct'] = np.nan
+
+    return df
+
+def summarize_portfolio(valued_df):
+    """Portfolio totals from a value_portfolio() result"""
+    if valued_df is None or valued_df.empty:
+        return {}
+
+    total_invested = valued_df['invested_value'].sum()
+    total_current = valued_df['current_value'].sum()
+    total_pnl = valued_df['pnl'].sum()
+    day_change = valued_df['day_change'].sum()
+    prev_value = total_current - day_change
+
+    return {
+        'invested': total_invested,
+        'current': total_current,
+        'pnl': total_pnl,
+        'pnl_pct': (total_pnl / total_invested * 100) if total_invested > 0 else 0,
+        'day_change': day_change,
+        'day_change_pct': (day_change / prev_value * 100) if prev_value > 0 else 0,
+    }
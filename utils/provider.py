@@ -0,0 +1,115 @@
+import os
+import threading
+import time
+from types import SimpleNamespace
+import pandas as pd
+from utils.constants import REPLAY_DIR
+from utils.tracing import span
+
+# Every call to an external data provider goes through here so it can be
+# counted (load tests, diagnostics) and, when STOCK_APP_REPLAY_DIR is set,
+# answered from recorded files instead of the network:
+#   <replay dir>/bars/<symbol>.parquet   daily OHLCV + actions (Date index)
+#   <replay dir>/http/<file name>        raw responses, keyed by URL file name
+
+_stats = {}  # name -> {'calls', 'symbols', 'seconds'}
+_stats_lock = threading.Lock()
+
+_replay_bars = {}  # symbol -> DataFrame (None when not recorded)
+_replay_lock = threading.Lock()
+
+def record_call(name, symbols=0, seconds=0.0):
+    """Count one provider call"""
+    with _stats_lock:
+        entry = _stats.setdefault(name, {'calls': 0, 'symbols': 0, 'seconds': 0.0})
+        entry['calls'] += 1
+        entry['symbols'] += symbols
+        entry['seconds'] += seconds
+
+def get_provider_stats():
+    """Copy of the per-provider call counters"""
+    with _stats_lock:
+        return {name: dict(entry) for name, entry in _stats.items()}
+
+def reset_provider_stats():
+    """Zero the call counters"""
+    with _stats_lock:
+        _stats.clear()
+
+def download(tickers, **kwargs):
+    """yf.download() (same arguments and result shape), or its offline replay"""
+    symbols = tickers.split() if isinstance(tickers, str) else list(tickers)
+    started = time.perf_counter()
+    try:
+        with span("provider.download") as record:
+            record['rows'] = len(symbols)
+            if REPLAY_DIR:
+                return _replay_download(symbols, **kwargs)
+            import yfinance as yf # Deferred: costs more to import than a page takes to render
+            return yf.download(" ".join(symbols), **kwargs)
+    finally:
+        record_call('yfinance.download', len(symbols), time.perf_counter() - started)
+
+def http_get(url, headers=None, timeout=10):
+    """requests.get(), or a recorded response (404 when none was recorded)"""
+    started = time.perf_counter()
+    try:
+        if REPLAY_DIR:
+            path = replay_http_path(url)
+            if not os.path.exists(path):
+                return SimpleNamespace(status_code=404, content=b'', headers={})
+            with open(path, 'rb') as f:
+                return SimpleNamespace(status_code=200, content=f.read(), headers={})
+        import requests
+        return requests.get(url, headers=headers, timeout=timeout)
+    finally:
+        record_call('http.get', 1, time.perf_counter() - started)
+
+def replay_bars_path(symbol, replay_dir=None):
+    return os.path.join(replay_dir or REPLAY_DIR, "bars", f"{symbol}.parquet")
+
+def replay_http_path(url, replay_dir=None):
+    return os.path.join(replay_dir or REPLAY_DIR, "http", url.rstrip('/').rsplit('/', 1)[-1])
+
+def _load_replay_bars(symbol):
+    """Recorded bars for a symbol (read once per process)"""
+    with _replay_lock:
+        if symbol not in _replay_bars:
+            path = replay_bars_path(symbol)
+            _replay_bars[symbol] = pd.read_parquet(path) if os.path.exists(path) else None
+        return _replay_bars[symbol]
+
+def _period_offset(period):
+    """DateOffset for a yfinance period string ('5d', '6mo', '2y'); None for 'max'"""
+    if not period or period == 'max':
+        return None
+    for unit, make in (('mo', lambda n: pd.DateOffset(months=n)), ('d', lambda n: pd.DateOffset(days=n)),
+                       ('y', lambda n: pd.DateOffset(years=n))):
+        if period.endswith(unit):
+            return make(int(period[:-len(unit)]))
+    return None
+
+def _replay_download(symbols, period=None, start=None, group_by='column', interval='1d', **kwargs):
+    """Recorded bars shaped like yf.download(): MultiIndex columns, missing symbols left out"""
+    if interval != '1d':
+        return pd.DataFrame() # Only daily bars are recorded
+    frames = {}
+    for sym in symbols:
+        bars = _load_replay_bars(sym)
+        if bars is None or bars.empty:
+            continue
+        if start is not None:
+            bars = bars[bars.index >= pd.Timestamp(start)]
+        else:
+            offset = _period_offset(period or '1mo')
+            if offset is not None:
+                bars = bars[bars.index > bars.index.max() - offset]
+        frames[sym] = bars
+
+    if not frames:
+        return pd.DataFrame()
+
+    data = pd.concat(frames, axis=1, names=['Ticker', 'Price'])
+    if group_by != 'ticker':
+        data = data.swaplevel(axis=1).sort_index(axis=1, level=0, sort_remaining=False)
+    return data
@@ -0,0 +1,77 @@
+import threading
+from concurrent.futures import Future
+from utils.constants import QUOTE_BATCH_WINDOW_SECONDS, QUOTE_BATCH_MAX_SYMBOLS, QUOTE_BATCH_TIMEOUT_SECONDS
+
+class QuoteBatcher:
+    """Single-flight, micro-batching front for a bulk quote fetch function.
+
+    Lookups for the same symbol share one in-flight Future, and every symbol
+    requested within `window` seconds goes out in a single bulk call to
+    `fetch_fn(symbols) -> {symbol: quote}`.
+    """
+
+    def __init__(self, fetch_fn, window=QUOTE_BATCH_WINDOW_SECONDS, max_batch=QUOTE_BATCH_MAX_SYMBOLS):
+        self.fetch_fn = fetch_fn
+        self.window = window
+        self.max_batch = max_batch
+        self._lock = threading.Lock()
+        self._inflight = {}  # symbol -> Future (pending or being fetched)
+        self._pending = []   # symbols waiting for the next flush
+        self._timer = None
+
+    def submit(self, symbols):
+        """Return symbol -> Future, joining any request already in flight"""
+        futures = {}
+        flush_now = False
+
+        with self._lock:
+            for symbol in dict.fromkeys(symbols):
+                future = self._inflight.get(symbol)
+                if future is None:
+                    future = Future()
+                    self._inflight[symbol] = future
+                    self._pending.append(symbol)
+                futures[symbol] = future
+
+            if len(self._pending) >= self.max_batch:
+                flush_now = True
+            elif self._pending and self._timer is None:
+                self._timer = threading.Timer(self.window, self._flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+        if flush_now:
+            self._flush()
+        return futures
+
+    def get_many(self, symbols, timeout=QUOTE_BATCH_TIMEOUT_SECONDS):
+        """Blocking lookup; symbols that fail or time out map to None"""
+        results = {}
+        for symbol, future in self.submit(symbols).items():
+            try:
+                results[symbol] = future.result(timeout=timeout)
+            except Exception:
+                results[symbol] = None
+        return results
+
+    def _flush(self):
+        with self._lock:
+            batch, self._pending = self._pending, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+        if not batch:
+            return
+
+        try:
+            fetched = self.fetch_fn(batch) or {}
+        except Exception as e:
+            print(f"Batched quote fetch error: {e}")
+            fetched = {}
+
+        with self._lock:
+            for symbol in batch:
+                future = self._inflight.pop(symbol, None)
+                if future is not None:
+                    future.set_result(fetched.get(symbol))
@@ -0,0 +1,185 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from utils.constants import (
+    QUOTE_CACHE_FILE, QUOTE_TTL_SECONDS, QUOTE_MISS_TTL_SECONDS, QUOTE_MEMORY_ENTRIES
+)
+
+# Quotes live in two tiers:
+#   1. an in-process LRU (OrderedDict) for repeated reads within one worker
+#   2. a SQLite file shared by every Streamlit worker and the batch job
+# SQLite (WAL mode) is used for the shared tier instead of DuckDB because
+# DuckDB holds an exclusive lock on its file per writer process.
+
+class QuoteCache:
+    """Per-symbol quote cache with an LRU memory tier and a shared disk tier"""
+
+    def __init__(self, path=QUOTE_CACHE_FILE, max_entries=QUOTE_MEMORY_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._memory = OrderedDict()  # symbol -> (expires_at, quote)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._init_disk()
+
+    # --- Disk tier ---------------------------------------------------------
+
+    def _connect(self):
+        """One SQLite connection per thread"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_disk(self):
+        try:
+            self._connect().execute("""
+                CREATE TABLE IF NOT EXISTS quotes (
+                    symbol TEXT PRIMARY KEY,
+                    price REAL,
+                    change REAL,
+                    pct REAL,
+                    fetched_at REAL,
+                    expires_at REAL
+                )
+            """)
+        except sqlite3.Error as e:
+            print(f"Quote cache disk tier unavailable: {e}")
+
+    def _read_disk(self, symbols, now):
+        if not symbols:
+            return {}
+        placeholders = ",".join("?" for _ in symbols)
+        try:
+            rows = self._connect().execute(
+                f"SELECT symbol, price, change, pct, expires_at FROM quotes "
+                f"WHERE symbol IN ({placeholders}) AND expires_at > ?",
+                [*symbols, now]
+            ).fetchall()
+        except sqlite3.Error as e:
+            print(f"Quote cache read error: {e}")
+            return {}
+
+        found = {}
+        for symbol, price, change, pct, expires_at in rows:
+            quote = None if price is None else {"price": price, "change": change, "pct": pct}
+            found[symbol] = (expires_at, quote)
+        return found
+
+    def _write_disk(self, entries, now):
+        rows = []
+        for symbol, (expires_at, quote) in entries.items():
+            if quote is None:
+                rows.append((symbol, None, None, None, now, expires_at))
+            else:
+                rows.append((
+                    symbol, float(quote["price"]), float(quote.get("change", 0.0)),
+                    float(quote.get("pct", 0.0)), now, expires_at
+                ))
+        conn = None
+        try:
+            conn = self._connect()
+            conn.execute("BEGIN")
+            conn.executemany(
+                "INSERT OR REPLACE INTO quotes (symbol, price, change, pct, fetched_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            print(f"Quote cache write error: {e}")
+            # The connection is reused by this thread; a dangling transaction would fail every later BEGIN
+            if conn is not None and conn.in_transaction:
+                conn.rollback()
+
+    # --- Memory tier -------------------------------------------------------
+
+    def _remember(self, symbol, entry):
+        self._memory[symbol] = entry
+        self._memory.move_to_end(symbol)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    # --- Public API --------------------------------------------------------
+
+    def get_many(self, symbols):
+        """Return (hits, missing) for a list of symbols.
+
+        hits maps symbol -> quote dict, or None for a cached negative lookup.
+        """
+        now = time.time()
+        hits = {}
+        pending = []
+
+        with self._lock:
+            for symbol in dict.fromkeys(symbols):
+                entry = self._memory.get(symbol)
+                if entry and entry[0] > now:
+                    self._memory.move_to_end(symbol)
+                    hits[symbol] = entry[1]
+                else:
+                    pending.append(symbol)
+
+        if pending:
+            from_disk = self._read_disk(pending, now)
+            with self._lock:
+                for symbol, entry in from_disk.items():
+                    self._remember(symbol, entry)
+                    hits[symbol] = entry[1]
+
+        missing = [s for s in pending if s not in hits]
+        return hits, missing
+
+    def put_many(self, quotes, ttl=QUOTE_TTL_SECONDS, miss_ttl=QUOTE_MISS_TTL_SECONDS):
+        """Store quotes (symbol -> quote dict or None) in both tiers"""
+        if not quotes:
+            return
+        now = time.time()
+        entries = {
+            symbol: (now + (ttl if quote else miss_ttl), quote)
+            for symbol, quote in quotes.items()
+        }
+        with self._lock:
+            for symbol, entry in entries.items():
+                self._remember(symbol, entry)
+        self._write_disk(entries, now)
+
+    def invalidate(self, symbols):
+        """Drop the given symbols from both tiers, leaving other sessions' quotes alone"""
+        symbols = list(dict.fromkeys(symbols))
+        if not symbols:
+            return
+        with self._lock:
+            for symbol in symbols:
+                self._memory.pop(symbol, None)
+        placeholders = ",".join("?" for _ in symbols)
+        try:
+            self._connect().execute(f"DELETE FROM quotes WHERE symbol IN ({placeholders})", symbols)
+        except sqlite3.Error as e:
+            print(f"Quote cache invalidate error: {e}")
+
+    def clear(self):
+        """Drop every cached quote from both tiers (shared by all workers; admin only)"""
+        with self._lock:
+            self._memory.clear()
+        try:
+            self._connect().execute("DELETE FROM quotes")
+        except sqlite3.Error as e:
+            print(f"Quote cache clear error: {e}")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_quote_cache():
+    """Process-wide QuoteCache instance"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = QuoteCache()
+    return _cache
@@ -0,0 +1,88 @@
+import threading
+import time
+from utils.constants import GLOBAL_INDICES, QUOTE_POLL_INTERVAL_SECONDS
+from utils.market_data import refresh_live_prices, format_ticker
+from utils.db import get_watchlist, get_portfolio_db
+from utils.alerts import get_alert_engine
+
+class QuotePoller:
+    """Background thread that keeps a shared snapshot of live quotes.
+
+    One poller runs per server process. Each cycle refreshes GLOBAL_INDICES
+    plus every portfolio and watchlist ticker, so page fragments only read
+    memory and fetch volume does not grow with the number of sessions.
+    """
+
+    def __init__(self, interval=QUOTE_POLL_INTERVAL_SECONDS):
+        self.interval = interval
+        self._snapshot = {}  # symbol -> quote
+        self._updated_at = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._ready = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="quote-poller", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll_once()
+            except Exception as e:
+                print(f"Quote poller error: {e}")
+            self._stop.wait(self.interval)
+
+    def poll_once(self):
+        """Refresh every tracked symbol in one bulk request"""
+        quotes = refresh_live_prices(get_tracked_tickers())
+        with self._lock:
+            # Keep the last known quote when the provider skips a symbol
+            self._snapshot.update({sym: q for sym, q in quotes.items() if q})
+            self._updated_at = time.time()
+        self._ready.set()
+
+    def wait_ready(self, timeout=None):
+        """Block until the first poll has completed (or timeout)"""
+        return self._ready.wait(timeout)
+
+    def get_quotes(self, tickers):
+        """Snapshot quotes for tickers, keyed by formatted symbol (None if not polled yet)"""
+        with self._lock:
+            return {sym: self._snapshot.get(sym) for sym in (format_ticker(t) for t in tickers)}
+
+    @property
+    def updated_at(self):
+        return self._updated_at
+
+
+def get_tracked_tickers():
+    """Indices, portfolio, watchlist and alert-rule tickers the poller keeps fresh"""
+    tickers = list(GLOBAL_INDICES.values())
+    try:
+        tickers += get_watchlist()['ticker'].tolist()
+        tickers += get_portfolio_db()['ticker'].tolist()
+        tickers += get_alert_engine().tickers()
+    except Exception as e:
+        print(f"Quote poller could not read tickers: {e}")
+    return list(dict.fromkeys(tickers))
+
+
+_poller = None
+_poller_lock = threading.Lock()
+
+def get_quote_poller():
+    """Process-wide QuotePoller, started on first use"""
+    global _poller
+    if _poller is None:
+        with _poller_lock:
+            if _poller is None:
+                _poller = QuotePoller()
+                _poller.start()
+    return _poller
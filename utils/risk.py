@@ -0,0 +1,196 @@
+import threading
+from collections import deque, OrderedDict
+from statistics import NormalDist
+import numpy as np
+import pandas as pd
+from utils.constants import (
+    RISK_WINDOW_DAYS, RISK_REBUILD_BARS, RISK_ENGINES, RISK_ROLLING_VOL_DAYS, TRADING_DAYS_PER_YEAR
+)
+from utils.history import get_close_matrix
+from utils.db import get_history_frame
+
+# Portfolio risk from the stored daily closes. The covariance of holdings'
+# returns over the trailing window is maintained online: each new bar adds
+# one return vector and drops the oldest (Welford updates, O(holdings^2) per
+# bar) instead of re-estimating the whole window. Engines are shared across
+# sessions, one per set of symbols, and rebuilt from scratch every
+# RISK_REBUILD_BARS bars to shed accumulated rounding.
+
+class RollingCovariance:
+    """Mean and covariance of the last `window` return vectors, updated one bar at a time"""
+
+    def __init__(self, symbols, window=RISK_WINDOW_DAYS):
+        self.symbols = list(symbols)
+        self.window = window
+        self.dates = deque()
+        self.rows = deque()
+        self.mean = np.zeros(len(self.symbols))
+        self.comoment = np.zeros((len(self.symbols), len(self.symbols)))
+        self.as_of = None
+        self.last_close = None  # Filled-forward closes at as_of, the base for the next bar's returns
+        self.pushes = 0
+        self.lock = threading.Lock()
+
+    def push(self, date, returns):
+        """Add one bar's return vector (NaN counts as no move), dropping the oldest past the window"""
+        row = np.nan_to_num(np.asarray(returns, dtype=float))
+        self.dates.append(date)
+        self.rows.append(row)
+        n = len(self.rows)
+        delta = row - self.mean
+        self.mean += delta / n
+        self.comoment += np.outer(delta, row - self.mean)
+
+        if n > self.window:
+            old = self.rows.popleft()
+            self.dates.popleft()
+            n -= 1
+            delta = old - self.mean
+            self.mean -= delta / n
+            self.comoment -= np.outer(delta, old - self.mean)
+
+        self.as_of = date
+        self.pushes += 1
+
+    def update(self, close_matrix):
+        """Push every bar in a close matrix (date x symbol) newer than as_of; returns bars added"""
+        closes = close_matrix.reindex(columns=self.symbols).sort_index()
+        if self.as_of is not None:
+            closes = closes[closes.index > self.as_of]
+            if closes.empty:
+                return 0
+            closes = pd.concat([self.last_close.to_frame(self.as_of).T, closes])
+        closes = closes.ffill()
+        returns = closes.pct_change(fill_method=None).iloc[1:]
+        if self.as_of is None:
+            returns = returns.tail(self.window)
+        for date, row in zip(returns.index, returns.to_numpy()):
+            self.push(date, row)
+        self.last_close = closes.iloc[-1]
+        return len(returns)
+
+    @property
+    def count(self):
+        return len(self.rows)
+
+    def covariance(self):
+        """Sample covariance of daily returns over the window"""
+        if self.count < 2:
+            return np.full_like(self.comoment, np.nan)
+        return self.comoment / (self.count - 1)
+
+    def window_returns(self):
+        """Return vectors currently in the window (bars x symbols)"""
+        return pd.DataFrame(list(self.rows), index=list(self.dates), columns=self.symbols)
+
+    def snapshot(self):
+        """Consistent (window_returns, covariance, mean, as_of) taken under the lock; safe to use after it is released"""
+        with self.lock:
+            return self.window_returns(), self.covariance(), self.mean.copy(), self.as_of
+
+_engines = OrderedDict()  # tuple(symbols) -> RollingCovariance, least recently used first
+_engines_lock = threading.Lock()
+
+def get_rolling_covariance(symbols):
+    """Shared covariance engine for a set of symbols, brought up to date with stored closes"""
+    key = tuple(sorted(set(symbols)))
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None or engine.pushes >= engine.window + RISK_REBUILD_BARS:
+            engine = RollingCovariance(key)
+            _engines[key] = engine
+        _engines.move_to_end(key)
+        while len(_engines) > RISK_ENGINES:
+            _engines.popitem(last=False)
+
+    with engine.lock:
+        if engine.as_of is None:
+            # Enough calendar history to fill the window (missing symbols are downloaded once)
+            closes = get_close_matrix(list(key), "2y")
+        else:
+            # Only stored bars since the last push; the batch job keeps them synced
+            bars = get_history_frame(list(key), start=engine.as_of)
+            closes = bars.pivot(index='date', columns='ticker', values='close') if not bars.empty else pd.DataFrame()
+        if not closes.empty:
+            engine.update(closes)
+    return engine
+
+def portfolio_risk(valued_df, confidence=0.95):
+    """
+    One-day risk of the current holdings.
+
+    Weights are current market values of holdings with stored history;
+    holdings without it are left out and reported as uncovered.
+
+    Returns:
+        dict: value, covered_value, volatility (annualized), var_parametric,
+        var_historical, cvar_historical (rupees, one day), holdings (DataFrame
+        per symbol: value, weight, volatility, mcr, contribution_pct),
+        correlation (DataFrame) and rolling_volatility (Series). None when
+        there is too little history.
+    """
+    if valued_df is None or valued_df.empty:
+        return None
+    values = valued_df.groupby('symbol')['current_value'].sum()
+    values = values[values > 0]
+    if values.empty:
+        return None
+
+    # One snapshot; another session may push bars into the shared engine meanwhile
+    returns, full_cov, full_mean, as_of = get_rolling_covariance(values.index).snapshot()
+    if len(returns) < 2:
+        return None
+
+    covered = returns.columns[(returns != 0).any()] # Symbols with any stored movement
+    symbols = list(covered.intersection(values.index))
+    if not symbols:
+        return None
+
+    idx = [returns.columns.get_loc(s) for s in symbols]
+    cov = full_cov[np.ix_(idx, idx)]
+    mean = full_mean[idx]
+    covered_value = values[symbols].sum()
+    w = (values[symbols] / covered_value).to_numpy()
+
+    # Portfolio moments and marginal contribution to risk (d sigma / d w)
+    sigma = np.sqrt(w @ cov @ w)
+    mcr = cov @ w / sigma if sigma > 0 else np.zeros(len(w))
+    z = NormalDist().inv_cdf(confidence)
+    var_parametric = (z * sigma - w @ mean) * covered_value
+
+    # Historical: revalue today's weights over the window's returns
+    portfolio_returns = returns[symbols].to_numpy() @ w
+    cutoff = np.quantile(portfolio_returns, 1 - confidence)
+    var_historical = -cutoff * covered_value
+    cvar_historical = -portfolio_returns[portfolio_returns <= cutoff].mean() * covered_value
+
+    annualize = np.sqrt(TRADING_DAYS_PER_YEAR)
+    vols = np.sqrt(np.diag(cov))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        correlation = cov / np.outer(vols, vols)
+
+    holdings = pd.DataFrame({
+        'value': values[symbols].to_numpy(),
+        'weight': w * 100,
+        'volatility': vols * annualize * 100,
+        'mcr': mcr * annualize * 100,
+        'contribution_pct': (w * mcr / sigma * 100) if sigma > 0 else 0.0,
+    }, index=pd.Index(symbols, name='symbol')).sort_values('contribution_pct', ascending=False)
+
+    rolling_volatility = (
+        pd.Series(portfolio_returns, index=returns.index).rolling(RISK_ROLLING_VOL_DAYS).std() * annualize * 100
+    ).dropna()
+
+    return {
+        'value': values.sum(),
+        'covered_value': covered_value,
+        'volatility': sigma * annualize * 100,
+        'var_parametric': var_parametric,
+        'var_historical': var_historical,
+        'cvar_historical': cvar_historical,
+        'holdings': holdings,
+        'correlation': pd.DataFrame(correlation, index=symbols, columns=symbols),
+        'rolling_volatility': rolling_volatility,
+        'bars': len(returns),
+        'as_of': as_of,
+    }
@@ -0,0 +1,85 @@
+import threading
+import time
+import pandas as pd
+from utils.constants import SYMBOL_MAP_TTL_SECONDS
+
+# Canonical symbols are provider-ready tickers ("ITC.NS", "^NSEI", "GC=F").
+# Known NSE symbols come from the `symbols` master table; anything else
+# falls back to the suffix heuristic below.
+
+NSE_KEYWORDS = ['HDFC', 'RELI', 'ITC', 'LICI', 'NIFTY', 'BANK', 'SGB', 'GOLDBEES', 'SILVER', 'TATVA']
+
+_symbol_map = None
+_symbol_map_loaded_at = 0.0
+_symbol_map_lock = threading.Lock()
+
+def heuristic_symbol(ticker):
+    """Ensure NSE tickers have .NS suffix (used when the master has no entry)"""
+    ticker = str(ticker).strip().upper()
+
+    if not ticker.endswith('.NS') and not ticker.endswith('.BO') and not '=' in ticker and not ticker.startswith('^'):
+        # Heuristic: if it looks like an Indian stock, add .NS
+        if any(k in ticker for k in NSE_KEYWORDS) or len(ticker) < 10: # Assuming short tickers are likely symbols
+             return f"{ticker}.NS"
+
+    return ticker
+
+def _get_symbol_map():
+    """Memoized raw -> canonical map built from the symbols master table"""
+    global _symbol_map, _symbol_map_loaded_at
+
+    if _symbol_map is not None and time.time() - _symbol_map_loaded_at < SYMBOL_MAP_TTL_SECONDS:
+        return _symbol_map
+
+    with _symbol_map_lock:
+        if _symbol_map is None or time.time() - _symbol_map_loaded_at >= SYMBOL_MAP_TTL_SECONDS:
+            # Imported here because utils.db canonicalizes through this module
+            from utils.db import get_symbol_master
+
+            try:
+                master = get_symbol_master()
+            except Exception as e:
+                print(f"Error opening symbol master: {e}")
+                master = None
+            if master is None:
+                # Not cached, so the next lookup retries; keep serving the last good map meanwhile
+                return _symbol_map if _symbol_map is not None else {}
+
+            mapping = {}
+            if not master.empty:
+                mapping.update(zip(master['base'], master['symbol']))
+                mapping.update(zip(master['symbol'], master['symbol']))
+            _symbol_map = mapping
+            _symbol_map_loaded_at = time.time()
+    return _symbol_map
+
+def invalidate_symbol_map():
+    """Force the next lookup to reload the master table"""
+    global _symbol_map
+    with _symbol_map_lock:
+        _symbol_map = None
+
+def resolve_symbols(tickers):
+    """Resolve a Series (or list) of raw tickers to canonical symbols.
+
+    Normalization and lookup run over the distinct values only, so a column
+    with many repeated tickers costs one resolution per unique ticker.
+    """
+    series = tickers if isinstance(tickers, pd.Series) else pd.Series(list(tickers), dtype=object)
+    if series.empty:
+        return series.astype(object)
+
+    normalized = series.astype(str).str.strip().str.upper()
+    uniques = pd.Series(normalized.unique())
+
+    resolved = uniques.map(_get_symbol_map()).astype(object)
+    unknown = resolved.isna()
+    if unknown.any():
+        resolved[unknown] = uniques[unknown].map(heuristic_symbol)
+
+    return normalized.map(dict(zip(uniques, resolved)))
+
+def resolve_symbol(ticker):
+    """Canonical symbol for a single raw ticker"""
+    normalized = str(ticker).strip().upper()
+    return _get_symbol_map().get(normalized) or heuristic_symbol(normalized)
@@ -0,0 +1,117 @@
+import functools
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+import pandas as pd
+from utils.constants import TRACE_ENABLED, TRACE_BUFFER_SPANS
+
+# Lightweight spans: wall time, row count and cache hits/misses per call,
+# kept in a per-process ring buffer (the Diagnostics page reads it). A span
+# costs two perf_counter() calls and a deque append. persist_spans() copies
+# new spans into DuckDB, which is how the batch job's spans reach the page.
+
+_spans = deque(maxlen=TRACE_BUFFER_SPANS)
+_spans_lock = threading.Lock()
+_seq = itertools.count(1)
+_persisted_seq = 0
+_local = threading.local()
+PROCESS = f"{os.path.basename(sys.argv[0]) or 'python'}:{os.getpid()}"
+
+SPAN_COLUMNS = [
+    'seq', 'process', 'name', 'category', 'parent', 'started_at', 'ms',
+    'rows', 'cache_hits', 'cache_misses', 'error', 'thread'
+]
+
+def _count_rows(result):
+    """Rows in a call's result (frames, arrays, containers; first item of a tuple), else None"""
+    if isinstance(result, tuple) and result:
+        result = result[0]
+    if isinstance(result, (pd.DataFrame, pd.Series, list, dict)):
+        return len(result)
+    shape = getattr(result, 'shape', None)
+    return shape[0] if shape else None
+
+@contextmanager
+def span(name, category=None):
+    """
+    Time the enclosed block as one span.
+
+    Yields a dict; set 'rows', 'cache_hits' or 'cache_misses' on it to
+    record them. Spans opened inside it on the same thread name it as parent.
+    """
+    if not TRACE_ENABLED:
+        yield {}
+        return
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    record = {
+        'name': name, 'category': category or name.split('.', 1)[0],
+        'parent': stack[-1] if stack else None,
+        'rows': None, 'cache_hits': None, 'cache_misses': None, 'error': None,
+    }
+    stack.append(name)
+    wall = time.time()
+    started = time.perf_counter()
+    try:
+        yield record
+    except BaseException as e:
+        record['error'] = type(e).__name__
+        raise
+    finally:
+        record['ms'] = (time.perf_counter() - started) * 1000
+        stack.pop()
+        record['started_at'] = wall
+        record['thread'] = threading.current_thread().name
+        record['process'] = PROCESS
+        with _spans_lock:
+            record['seq'] = next(_seq)
+            _spans.append(record)
+
+def traced(name=None):
+    """Decorator recording a span per call, named module.function unless given; rows come from the result"""
+    def decorate(func):
+        label = name or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(label) as record:
+                result = func(*args, **kwargs)
+                if record:
+                    record['rows'] = _count_rows(result)
+                return result
+        return wrapper
+
+    if callable(name):  # Bare @traced
+        func, name = name, None
+        return decorate(func)
+    return decorate
+
+def get_spans():
+    """Spans in this process's buffer, oldest first"""
+    with _spans_lock:
+        spans = list(_spans)
+    frame = pd.DataFrame(spans, columns=SPAN_COLUMNS)
+    frame['started_at'] = pd.to_datetime(frame['started_at'], unit='s')
+    return frame
+
+def clear_spans():
+    with _spans_lock:
+        _spans.clear()
+
+def persist_spans():
+    """Append spans recorded since the last call to the trace_spans table; returns rows written"""
+    global _persisted_seq
+    from utils.db import save_trace_spans # Deferred: db.py is itself traced
+    spans = get_spans()
+    spans = spans[spans['seq'] > _persisted_seq]
+    if spans.empty:
+        return 0
+    if save_trace_spans(spans):
+        _persisted_seq = int(spans['seq'].max())
+        return len(spans)
+    return 0
@@ -0,0 +1,202 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from utils.constants import CSV_BLOCK_SIZE, CSV_STAGE_BYTES
+from utils.data_handler import read_csv_header, find_column, clean_numeric, iter_csv_batches, source_size
+from utils.db import get_connection
+
+# FIFO lot accounting without a per-trade Python loop.
+#
+# Within a ticker, buys and sells are laid out on a cumulative-quantity
+# axis: buy lot i covers [cum_buy[i-1], cum_buy[i]) and sell j covers
+# [cum_sell[j-1], cum_sell[j]). FIFO pairs are exactly the overlaps of those
+# intervals, so the matched pieces are the gaps between the union of all
+# interval end points. Tickers are placed side by side on one axis (each
+# shifted by its own offset) so a single np.searchsorted matches everything.
+
+TRADE_COLUMNS = ['ticker', 'trade_date', 'trade_time', 'side', 'quantity', 'price']
+
+def iter_trades(source, block_size=CSV_BLOCK_SIZE):
+    """Stream cleaned trades (dates still as text) from a broker tradebook as Arrow tables"""
+    header = read_csv_header(source)
+    ticker_col = find_column(header, 'symbol', 'instrument')
+    date_col = find_column(header, 'trade_date', 'date')
+    side_col = find_column(header, 'trade_type', 'type', 'side', 'action')
+    qty_col = find_column(header, 'qty', 'quantity')
+    price_col = find_column(header, 'price', 'rate')
+    time_col = find_column(header, 'execution_time', 'time')
+
+    if not all([ticker_col, date_col, side_col, qty_col, price_col]):
+        raise ValueError(f"Required tradebook columns not found. Found: {header}")
+
+    columns = [c for c in dict.fromkeys([ticker_col, date_col, side_col, qty_col, price_col, time_col]) if c]
+    for batch in iter_csv_batches(source, columns, block_size):
+        side_text = pc.utf8_lower(pc.utf8_trim_whitespace(pc.fill_null(batch.column(side_col), '')))
+        side = pc.if_else(
+            pc.starts_with(side_text, 'b'), 1,
+            pc.if_else(pc.starts_with(side_text, 's'), -1, pa.scalar(None, pa.int8()))
+        )
+        table = pa.table({
+            'ticker': pc.utf8_upper(pc.utf8_trim(pc.fill_null(batch.column(ticker_col), ''), '" ')),
+            'trade_date': batch.column(date_col),
+            'trade_time': batch.column(time_col) if time_col and time_col != date_col else batch.column(date_col),
+            'side': side,
+            'quantity': clean_numeric(batch.column(qty_col)),
+            'price': clean_numeric(batch.column(price_col)),
+        })
+        valid = pc.and_(
+            pc.and_(pc.greater(pc.utf8_length(table['ticker']), 0), pc.is_valid(table['side'])),
+            pc.and_(pc.greater(table['quantity'], 0), pc.greater_equal(table['price'], 0))
+        )
+        yield table.filter(pc.fill_null(valid, False))
+
+def stage_tradebook_csv(source, block_size=CSV_BLOCK_SIZE):
+    """Stream a large tradebook through DuckDB, one Arrow batch at a time.
+
+    Executions sharing a ticker, timestamp and side (one order filled in
+    pieces) are merged in SQL into one trade at their quantity-weighted
+    price, which leaves FIFO matching unchanged; only the merged trades
+    are returned.
+    """
+    conn = get_connection()
+    try:
+        conn.execute("""
+            CREATE OR REPLACE TEMP TABLE trades_staging (
+                ticker VARCHAR, trade_date VARCHAR, trade_time VARCHAR, side TINYINT, quantity DOUBLE, price DOUBLE
+            )
+        """)
+        for table in iter_trades(source, block_size):
+            conn.register('trades_batch', table)
+            conn.execute("INSERT INTO trades_staging SELECT * FROM trades_batch")
+            conn.unregister('trades_batch')
+        return conn.execute("""
+            SELECT ticker, trade_date, trade_time, side,
+                   SUM(quantity) AS quantity, SUM(quantity * price) / SUM(quantity) AS price
+            FROM trades_staging
+            GROUP BY ticker, trade_date, trade_time, side
+            ORDER BY ticker, trade_date, trade_time, side DESC
+        """).fetchdf()
+    finally:
+        conn.close() # Temporary tables go with the connection
+
+def parse_tradebook_csv(source):
+    """Parse a broker tradebook into ticker, trade_date, side (+1/-1), quantity, price.
+
+    Files of CSV_STAGE_BYTES or more are staged in DuckDB (stage_tradebook_csv)
+    instead of being collected in memory.
+    """
+    size = source_size(source)
+    if size is not None and size >= CSV_STAGE_BYTES:
+        trades = stage_tradebook_csv(source)
+    else:
+        tables = list(iter_trades(source))
+        if not tables:
+            return pd.DataFrame(columns=TRADE_COLUMNS)
+        trades = pa.concat_tables(tables).to_pandas()
+
+    if trades.empty:
+        return pd.DataFrame(columns=TRADE_COLUMNS)
+    trades['trade_date'] = _parse_dates(trades['trade_date'])
+    trades['trade_time'] = _parse_dates(trades['trade_time'])
+    return trades.dropna(subset=['trade_date']).reset_index(drop=True)
+
+def _parse_dates(values):
+    """ISO dates first; fall back to day-first formats (DD-MM-YYYY) used by brokers"""
+    parsed = pd.to_datetime(values, errors='coerce', format='ISO8601')
+    if parsed.isna().mean() > 0.5:
+        parsed = pd.to_datetime(values, errors='coerce', dayfirst=True, format='mixed')
+    return parsed
+
+def fifo_match(trades):
+    """Match sells against buys FIFO per ticker.
+
+    Returns (open_lots, realized, unmatched_sells):
+      open_lots       ticker, buy_date, quantity, price
+      realized        ticker, buy_date, sell_date, quantity, buy_price, sell_price, pnl, holding_days
+      unmatched_sells ticker, quantity (sold beyond the buys present in the tradebook)
+    """
+    trades = trades.sort_values(['ticker', 'trade_date', 'trade_time'], kind='stable') \
+        if 'trade_time' in trades else trades.sort_values(['ticker', 'trade_date'], kind='stable')
+
+    # A sell larger than the inventory held at that moment (holdings bought
+    # before the tradebook starts) is only partly matchable. The running
+    # shortfall is the cumulative max of the negative net position, and its
+    # increments are the unmatched quantities; they are removed up front so
+    # no sell can reach forward to a later buy.
+    signed = trades['side'] * trades['quantity']
+    net = signed.groupby(trades['ticker']).cumsum()
+    shortfall = (-net).clip(lower=0).groupby(trades['ticker']).cummax()
+    unmatched_qty = shortfall - shortfall.groupby(trades['ticker']).shift(fill_value=0)
+    trades = trades.assign(quantity=trades['quantity'] - unmatched_qty, unmatched=unmatched_qty)
+
+    buys = trades[trades['side'] > 0].reset_index(drop=True)
+    sells = trades[(trades['side'] < 0) & (trades['quantity'] > 0)].reset_index(drop=True)
+
+    tickers = pd.Index(sorted(set(trades['ticker'])))
+    total_buy = buys.groupby('ticker')['quantity'].sum().reindex(tickers, fill_value=0).to_numpy()
+    total_sell = sells.groupby('ticker')['quantity'].sum().reindex(tickers, fill_value=0).to_numpy()
+    matched_total = np.minimum(total_buy, total_sell)
+
+    # Lay every ticker out on one axis, separated by a gap wider than any ticker's volume
+    span = float(max(total_buy.max(initial=0), total_sell.max(initial=0))) + 1.0
+    offsets = np.arange(len(tickers)) * span
+
+    buy_code = tickers.get_indexer(buys['ticker'])
+    sell_code = tickers.get_indexer(sells['ticker'])
+    buy_end = buys.groupby('ticker')['quantity'].cumsum().to_numpy() + offsets[buy_code]
+    sell_end = sells.groupby('ticker')['quantity'].cumsum().to_numpy() + offsets[sell_code]
+    buy_start = buy_end - buys['quantity'].to_numpy()
+
+    # Matched pieces: consecutive break points within [offset, offset + matched_total]
+    limit = offsets + matched_total
+    points = np.unique(np.concatenate([
+        offsets,
+        np.minimum(buy_end, limit[buy_code]),
+        np.minimum(sell_end, limit[sell_code]),
+    ]))
+    point_code = np.searchsorted(offsets, points, side='right') - 1
+    same_ticker = point_code[1:] == point_code[:-1]
+    seg_start = points[:-1][same_ticker]
+    seg_qty = (points[1:] - points[:-1])[same_ticker]
+
+    buy_idx = np.searchsorted(buy_end, seg_start, side='right')
+    sell_idx = np.searchsorted(sell_end, seg_start, side='right')
+
+    realized = pd.DataFrame({
+        'ticker': buys['ticker'].to_numpy()[buy_idx],
+        'buy_date': buys['trade_date'].to_numpy()[buy_idx],
+        'sell_date': sells['trade_date'].to_numpy()[sell_idx],
+        'quantity': seg_qty,
+        'buy_price': buys['price'].to_numpy()[buy_idx],
+        'sell_price': sells['price'].to_numpy()[sell_idx],
+    })
+    realized['pnl'] = realized['quantity'] * (realized['sell_price'] - realized['buy_price'])
+    realized['holding_days'] = (realized['sell_date'] - realized['buy_date']).dt.days
+
+    # Whatever part of each buy lot lies beyond the matched total is still open
+    remaining = np.clip(buy_end - np.maximum(buy_start, limit[buy_code]), 0, None)
+    open_lots = pd.DataFrame({
+        'ticker': buys['ticker'],
+        'buy_date': buys['trade_date'],
+        'quantity': remaining,
+        'price': buys['price'],
+    })
+    open_lots = open_lots[open_lots['quantity'] > 0].reset_index(drop=True)
+
+    unmatched = trades.groupby('ticker', as_index=False)['unmatched'].sum() \
+        .rename(columns={'unmatched': 'quantity'})
+    unmatched = unmatched[unmatched['quantity'] > 0].reset_index(drop=True)
+
+    return open_lots, realized, unmatched
+
+def holdings_from_lots(open_lots):
+    """Aggregate open lots into holdings rows (ticker, shares, buy_price, asset_type)"""
+    if open_lots.empty:
+        return pd.DataFrame(columns=['ticker', 'shares', 'buy_price', 'asset_type'])
+
+    lots = open_lots.assign(cost=open_lots['quantity'] * open_lots['price'])
+    holdings = lots.groupby('ticker', as_index=False).agg(shares=('quantity', 'sum'), cost=('cost', 'sum'))
+    holdings['buy_price'] = holdings['cost'] / holdings['shares']
+    holdings['asset_type'] = np.where(holdings['ticker'].str.contains('SGB', regex=False), 'SGB', 'EQUITY')
+    return holdings[['ticker', 'shares', 'buy_price', 'asset_type']]
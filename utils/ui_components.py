@@ -1,5 +1,7 @@
 import streamlit.components.v1 as components
 import json
+import os
+from utils.constants import DATA_VIEW_PAGE_SIZE
 
 def render_tradingview_ticker(symbols: list, title: str = None):
     """
@@ -36,3 +38,109 @@ def render_tradingview_ticker(symbols: list, title: str = None):
     """
     
     components.html(html_code, height=70)
+
+def render_date_window(first_date, last_date, key, default_days=None):
+    """
+    Render a date-range slider for the visible chart window.
+    
+    Streamlit does not report Plotly zoom events back to Python, so zooming
+    is done here: the page re-queries bars for the chosen window, which come
+    back at full resolution once the window is small enough.
+    
+    Args:
+        default_days (int, optional): Initial window length; the full range if omitted.
+    
+    Returns:
+        tuple: (start, end) as pandas Timestamps; end is the last instant of its day.
+    """
+    import streamlit as st
+    import pandas as pd
+    
+    first_date = pd.Timestamp(first_date).date()
+    last_date = pd.Timestamp(last_date).date()
+    if first_date < last_date:
+        default_start = first_date
+        if default_days:
+            default_start = max(first_date, last_date - pd.Timedelta(days=default_days))
+        start, end = st.slider(
+            "Chart Window",
+            min_value=first_date,
+            max_value=last_date,
+            value=(default_start, last_date),
+            format="YYYY-MM-DD",
+            key=key
+        )
+    else:
+        start, end = first_date, last_date
+    return pd.Timestamp(start), pd.Timestamp(end) + pd.Timedelta(days=1) - pd.Timedelta(microseconds=1)
+
+def _set_page(key, page):
+    import streamlit as st
+    st.session_state[key] = page
+
+def render_paginated_table(fetch_page, key, page_size=DATA_VIEW_PAGE_SIZE, date_column='date', date_format='%Y-%m-%d',
+                           **dataframe_kwargs):
+    """
+    Render one page of a server-side paginated table with previous/next controls.
+    
+    Only the requested page is fetched and formatted, so the cost of a rerun
+    does not grow with the length of the underlying history.
+    
+    Args:
+        fetch_page (callable): fetch_page(limit, offset) -> (DataFrame, total_rows).
+        key (str): Session state key holding the current page.
+        page_size (int): Rows per page.
+        date_column (str): Datetime column formatted for display.
+        date_format (str): strftime format for date_column.
+        **dataframe_kwargs: Passed through to st.dataframe.
+    """
+    import streamlit as st
+    
+    page = st.session_state.get(key, 0)
+    df, total = fetch_page(page_size, page * page_size)
+    last_page = max((total - 1) // page_size, 0)
+    if page > last_page:
+        # The table shrank (e.g. a narrower window); show its last page
+        page = last_page
+        st.session_state[key] = page
+        df, total = fetch_page(page_size, page * page_size)
+    
+    if date_column in df:
+        df[date_column] = df[date_column].dt.strftime(date_format)
+    st.dataframe(df, hide_index=True, **dataframe_kwargs)
+    
+    c1, c2, c3 = st.columns([1, 2, 1])
+    c1.button("◀", key=f"{key}_prev", disabled=page == 0, on_click=_set_page, args=(key, page - 1))
+    if total:
+        c2.caption(f"Rows {page * page_size + 1:,}–{page * page_size + len(df):,} of {total:,}")
+    else:
+        c2.caption("No rows")
+    c3.button("▶", key=f"{key}_next", disabled=page >= last_page, on_click=_set_page, args=(key, page + 1))
+
+def load_cached_json(url: str, cache_file: str, timeout: float = 5):
+    """
+    Load a static JSON asset, downloading it only if there is no local copy.
+    
+    Returns:
+        dict | None: Parsed JSON, or None if it is neither cached nor downloadable.
+    """
+    if os.path.exists(cache_file):
+        try:
+            with open(cache_file, 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Error reading {cache_file}: {e}")
+    
+    try:
+        from utils.provider import http_get
+        r = http_get(url, timeout=timeout)
+        if r.status_code != 200:
+            return None
+        data = json.loads(r.content)
+    except Exception as e:
+        print(f"Error downloading {url}: {e}")
+        return None
+    
+    with open(cache_file, 'w') as f:
+        json.dump(data, f)
+    return data